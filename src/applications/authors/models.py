@@ -2,11 +2,16 @@ from django.db import models
 from applications.jwt_auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from applications.common.counters import CounterFieldsMixin
 
 
-class Author(models.Model):
+class Author(CounterFieldsMixin, models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='author_data')
     bio = models.CharField(max_length=1000)
+    updated = models.DateTimeField(auto_now=True)
+    # Published posts; maintained by applications.posts.signals.
+    post_count = models.PositiveIntegerField(default=0)
+    counter_fields = ('post_count',)
 
     def __str__(self):
         return f"{self.user.get_full_name()}"
@@ -1,4 +1,6 @@
 from rest_framework import serializers
+
+from applications.common.sparse import SparseFieldsMixin
 from applications.jwt_auth.models import User
 from .models import Author
 
@@ -10,10 +12,14 @@ class UserSerializerForAuthor(serializers.ModelSerializer):
         fields = ['id', 'email', 'first_name', 'last_name']
 
 
-class AuthorSerializer(serializers.ModelSerializer):
-    user = UserSerializerForAuthor(read_only=True)
+class AuthorSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    user = serializers.PrimaryKeyRelatedField(read_only=True)
+
+    expandable_fields = {
+        'user': lambda: UserSerializerForAuthor(read_only=True),
+    }
 
     class Meta:
         model = Author
-        fields = ['id', 'user', 'bio', 'posts']
+        fields = ['id', 'user', 'bio', 'posts', 'post_count']
 
@@ -1,8 +1,13 @@
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.reverse import reverse
 from rest_framework.test import APITestCase
 
+from applications.categories.models import Category
 from applications.jwt_auth.models import User
+from applications.posts.models import Post
 from .models import Author
 
 
@@ -34,6 +39,7 @@ class AuthorAPITestCase(APITestCase):
                     },
                     "bio": self.author.bio,
                     "posts": [],
+                    "post_count": 0,
                 }
             ]
         )
@@ -54,6 +60,7 @@ class AuthorAPITestCase(APITestCase):
                 },
                 "bio": self.author.bio,
                 "posts": [],
+                "post_count": 0,
             }
         )
 
@@ -83,3 +90,49 @@ class AuthorAPITestCase(APITestCase):
         invalid_detail_url = reverse("author-detail", args=[999])
         response = self.client.get(invalid_detail_url)
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_query_count_does_not_grow_with_authors(self):
+        """Тест, что число запросов списка авторов не зависит от числа авторов и постов"""
+        category = Category.objects.create(name="Category")
+
+        def add_authors(count):
+            for i in range(count):
+                user = User.objects.create_user(email=f"author{count}-{i}@gmail.com", password="user123")
+                Post.objects.create(header="Post", body="Body", author=user.author_data, category=category)
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(self.list_url).status_code, status.HTTP_200_OK)
+            return len(queries)
+
+        add_authors(1)
+        expected = count_queries()
+        add_authors(5)
+        self.assertEqual(count_queries(), expected)
+
+    def test_sparse_fields_and_expand(self):
+        """Тест выбора полей через ?fields= и сворачивания пользователя через ?expand="""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.list_url, {"fields": "id,post_count"})
+        self.assertEqual(response.json(), [{"id": self.author.id, "post_count": 0}])
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"bio"', queries[0]["sql"])
+        response = self.client.get(self.detail_url, {"fields": "id,user", "expand": ""})
+        self.assertEqual(response.json(), {"id": self.author.id, "user": self.regular_user.id})
+        response = self.client.get(self.detail_url, {"fields": "user"})
+        self.assertEqual(response.json()["user"]["email"], self.regular_user.email)
+
+    def test_fast_list_matches_serializer(self):
+        """Тест, что быстрый путь списка авторов отдает тот же ответ, что и сериализатор"""
+        category = Category.objects.create(name="Category")
+        posts = [Post.objects.create(header="Post", body="Body", author=self.author, category=category) for _ in range(3)]
+        Post.objects.create(header="Other", body="Body", author=User.objects.create_user(
+            email="other@gmail.com", password="user123").author_data, category=category)
+        posts[1].delete()
+        for params in [{}, {"expand": ""}, {"fields": "id,posts"}, {"ordering": "-post_count"}]:
+            with self.subTest(params=params):
+                with override_settings(FAST_LIST_SERIALIZATION=False):
+                    expected = self.client.get(self.list_url, params)
+                response = self.client.get(self.list_url, params)
+                self.assertEqual(response.content, expected.content)
+        self.assertEqual(response.json()[0]["posts"], [posts[0].id, posts[2].id])
@@ -1,13 +1,33 @@
+from django.db.models import Prefetch
+from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import mixins
+from rest_framework.filters import OrderingFilter
 from rest_framework.permissions import AllowAny
 from rest_framework.viewsets import GenericViewSet
+from applications.common.fast_serialization import FastListMixin
+from applications.posts.models import Post
 from .models import Author
 from .serializers import AuthorSerializer
 
 
-class AuthorViewSet(mixins.ListModelMixin,
+class AuthorViewSet(FastListMixin,
+                    mixins.ListModelMixin,
                     mixins.RetrieveModelMixin,
                     GenericViewSet):
-    queryset = Author.objects.all().filter(user__is_superuser=False)
+    queryset = Author.objects.filter(user__is_superuser=False)
     serializer_class = AuthorSerializer
     permission_classes = [AllowAny]
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    ordering_fields = ['id', 'post_count']
+
+    def get_queryset(self):
+        fieldset = self.get_serializer_class().fieldset(self.request)
+        queryset = super().get_queryset()
+        if fieldset.expands('user'):
+            queryset = queryset.select_related('user')
+        if fieldset.includes('posts'):
+            # Only the ids are listed, in id order as the fast list path reads them.
+            posts = Post.objects.only('id', 'author').order_by('id')
+            queryset = queryset.prefetch_related(Prefetch('posts', queryset=posts))
+        columns = fieldset.columns(Author)
+        return queryset if columns is None else queryset.only(*columns)
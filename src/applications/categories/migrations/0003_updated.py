@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0002_name_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -1,5 +1,10 @@
 from django.db import models
+from applications.common.counters import CounterFieldsMixin
 
 
-class Category(models.Model):
-    name = models.CharField(max_length=100)
+class Category(CounterFieldsMixin, models.Model):
+    name = models.CharField(max_length=100, db_index=True)
+    updated = models.DateTimeField(auto_now=True)
+    # Published posts; maintained by applications.posts.signals.
+    post_count = models.PositiveIntegerField(default=0)
+    counter_fields = ('post_count',)
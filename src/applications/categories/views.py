@@ -1,12 +1,18 @@
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.filters import OrderingFilter
 from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework.viewsets import ModelViewSet
+
+from applications.common.conditional import ConditionalGetMixin
 from .models import Category
 from .serializers import CategorySerializer
 
 
-class CategoryViewSet(ModelViewSet):
+class CategoryViewSet(ConditionalGetMixin, ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    ordering_fields = ['id', 'name', 'post_count']
 
     def get_permissions(self):
         if self.action in ('list', 'retrieve'):
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0002_comment_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
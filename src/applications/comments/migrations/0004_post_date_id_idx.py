@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0003_updated'),
+        ('posts', '0011_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', '-date', '-id'], name='comment_post_date_id_idx'),
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 
 from applications.jwt_auth.models import User
 from applications.posts.models import Post
@@ -9,3 +9,15 @@ class Comment(models.Model):
     date = models.DateTimeField(auto_now_add=True)
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="comments")
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="comments")
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Latest comments of a post and their keyset pagination.
+            models.Index(fields=['post', '-date', '-id'], name='comment_post_date_id_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Post.comment_count is updated by post_save and must commit or roll back with the comment.
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
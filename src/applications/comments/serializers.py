@@ -1,14 +1,39 @@
 from rest_framework import serializers
 
+from applications.common.sparse import SparseFieldsMixin
+from applications.jwt_auth.models import User
+from applications.posts.models import Post
 from .models import Comment
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class UserSerializerForComment(serializers.ModelSerializer):
+
+    class Meta:
+        model = User
+        fields = ['id', 'email', 'first_name', 'last_name']
+
+
+class VisiblePostField(serializers.PrimaryKeyRelatedField):
+    """Accepts only posts the requesting user can see, so hidden posts cannot be commented on."""
+
+    def get_queryset(self):
+        request = self.context.get("request")
+        return Post.objects.visible_to(request.user if request else None)
+
+
+class CommentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    user = serializers.PrimaryKeyRelatedField(read_only=True)
+    post = VisiblePostField()
+
+    expandable_fields = {
+        "user": lambda: UserSerializerForComment(read_only=True),
+    }
+    default_expand = ()
 
     class Meta:
         model = Comment
-        fields = "__all__"
-        read_only_fields = ("user", 'date')
+        fields = ["id", "content", "date", "post", "user"]
+        read_only_fields = ('date',)
 
     def create(self, validated_data):
         request = self.context.get("request")
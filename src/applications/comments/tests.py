@@ -1,3 +1,9 @@
+import threading
+from unittest import mock
+
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.reverse import reverse
 from rest_framework.test import APITestCase
@@ -5,7 +11,10 @@ from rest_framework.test import APITestCase
 from applications.authors.models import Author
 from applications.categories.models import Category
 from applications.jwt_auth.models import User
+from applications.posts import scoring
 from applications.posts.models import Post
+from applications.posts.testing import FakeToxicityModel, patch_toxicity_model
+from applications.posts.toxicity_batcher import ToxicityBatcher
 from applications.tags.models import Tag
 from .models import Comment
 
@@ -42,6 +51,9 @@ class CommentAPITestCase(APITestCase):
         cls.list_url = reverse("comment-list")
         cls.detail_url = reverse("comment-detail", args=[cls.comment.id])
 
+    def setUp(self):
+        self.toxicity_model = patch_toxicity_model(self)
+
     def test_list_comments(self):
         """Тест получения списка комментариев"""
         response = self.client.get(self.list_url)
@@ -94,6 +106,18 @@ class CommentAPITestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertTrue(Comment.objects.filter(content="New Comment", post=self.post, user=self.regular_user_1).exists())
 
+    def test_create_comment_on_hidden_post(self):
+        """Тест, что непроверенный пост может комментировать только его автор"""
+        Post.objects.filter(id=self.post.id).update(moderation_status=Post.ModerationStatus.PENDING)
+        data = {"content": "New Comment", "post": self.post.id}
+        self.client.force_authenticate(user=self.regular_user_2)
+        response = self.client.post(self.list_url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("post", response.json())
+        self.client.force_authenticate(user=self.regular_user_1)
+        response = self.client.post(self.list_url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
     def test_update_comment_as_owner(self):
         """Тест обновления комментария владельцем"""
         self.client.force_authenticate(user=self.regular_user_1)
@@ -135,3 +159,120 @@ class CommentAPITestCase(APITestCase):
         # Проверка удаления
         delete_response = self.client.delete(self.detail_url)
         self.assertEqual(delete_response.status_code, status.HTTP_204_NO_CONTENT)
+
+    @override_settings(TOXICITY_CACHE_ENABLED=False)
+    def test_toxic_comment_is_rejected(self):
+        """Тест отклонения токсичного комментария"""
+        self.client.force_authenticate(user=self.regular_user_1)
+        checks = scoring.content_type_metrics("comment").checks.value
+        response = self.client.post(self.list_url, {"content": "toxic comment", "post": self.post.id}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()["error"], "ToxicityError")
+        self.assertFalse(Comment.objects.filter(content="toxic comment").exists())
+        self.assertEqual(scoring.content_type_metrics("comment").checks.value, checks + 1)
+
+    @override_settings(TOXICITY_CACHE_ENABLED=False, TOXICITY_OVERLOAD_POLICY="pending", TOXICITY_QUEUE_TIMEOUT_MS=0,
+                       TOXICITY_MAX_CONCURRENT=1)
+    def test_overloaded_check_rejects_comment(self):
+        """Тест отказа в создании комментария при перегрузке проверки"""
+        self.client.force_authenticate(user=self.regular_user_1)
+        limiter = threading.BoundedSemaphore(1)
+        limiter.acquire()
+        with mock.patch.object(scoring, "_limiter", limiter):
+            response = self.client.post(self.list_url, {"content": "New Comment", "post": self.post.id},
+                                        format="json")
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertIn("Retry-After", response)
+
+    def test_conditional_get(self):
+        """Тест, что запрос с совпадающим ETag или Last-Modified получает 304 без тела"""
+        for url in (self.list_url, self.detail_url):
+            response = self.client.get(url)
+            with self.assertNumQueries(1):
+                not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+            self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(not_modified.content, b"")
+            not_modified = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+            self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_conditional_get_after_delete(self):
+        """Тест, что удаление комментария меняет ETag списка"""
+        comment = Comment.objects.create(content="Second Comment", post=self.post, user=self.regular_user_2)
+        etag = self.client.get(self.list_url)["ETag"]
+        comment.delete()
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()), 1)
+
+    def test_sparse_fields_and_expand(self):
+        """Тест выбора полей через ?fields= и раскрытия пользователя через ?expand="""
+        response = self.client.get(self.list_url, {"fields": "id,content"})
+        self.assertEqual(response.json(), [{"id": self.comment.id, "content": "Test Comment"}])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.detail_url, {"expand": "user"})
+        self.assertEqual(response.json()["user"], {"id": self.regular_user_1.id, "email": self.regular_user_1.email,
+                                                   "first_name": "", "last_name": ""})
+        self.assertEqual(response.json()["post"], self.post.id)
+        # The conditional GET validator and the comment joined with its user.
+        self.assertEqual(len(queries), 2)
+
+    def test_expanded_user_changes_etag(self):
+        """Тест, что переименование пользователя меняет ETag комментария с раскрытым пользователем"""
+        url = f"{self.detail_url}?expand=user"
+        etag = self.client.get(url)["ETag"]
+        self.regular_user_1.first_name = "Renamed"
+        self.regular_user_1.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["user"]["first_name"], "Renamed")
+        response = self.client.get(f"{self.list_url}?expand=user")
+        self.assertNotIn("ETag", response)
+        self.assertEqual(response.json()[0]["user"]["first_name"], "Renamed")
+
+    def test_fields_do_not_apply_to_writes(self):
+        """Тест, что ?fields= не влияет на создание комментария"""
+        self.client.force_authenticate(user=self.regular_user_1)
+        response = self.client.post(f"{self.list_url}?fields=id", {"content": "New", "post": self.post.id},
+                                    format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(set(response.json()), {"id", "content", "date", "post", "user"})
+
+    def test_fast_list_matches_serializer(self):
+        """Тест, что быстрый путь списка комментариев отдает тот же ответ, что и сериализатор"""
+        Comment.objects.create(content="Ответ \"в кавычках\"", post=self.post, user=self.regular_user_2)
+        for params in [{}, {"expand": "user"}, {"fields": "id,date"}]:
+            with self.subTest(params=params):
+                with override_settings(FAST_LIST_SERIALIZATION=False):
+                    expected = self.client.get(self.list_url, params)
+                response = self.client.get(self.list_url, params)
+                self.assertEqual(response.content, expected.content)
+
+
+@override_settings(TOXICITY_CACHE_ENABLED=False, TOXICITY_BATCHING_ENABLED=True, TOXICITY_MAX_CONCURRENT=0)
+class CommentToxicityBurstTestCase(SimpleTestCase):
+
+    def test_concurrent_comments_share_batches_with_posts(self):
+        """Тест, что одновременные проверки комментариев и постов собираются в общие батчи"""
+        model = FakeToxicityModel()
+        batcher = ToxicityBatcher(lambda: model, max_batch_size=64, window=0.05, latency_cap=1)
+        barrier = threading.Barrier(32)
+        results = {}
+        comment_checks = scoring.content_type_metrics("comment").checks.value
+        post_checks = scoring.content_type_metrics("post").checks.value
+
+        def check(index):
+            content_type = "post" if index % 8 == 0 else "comment"
+            text = f"toxic {index}" if index % 2 else f"fine {index}"
+            barrier.wait()
+            results[index] = scoring.score_toxicity(text, timeout=5, content_type=content_type)
+
+        with mock.patch.object(scoring, "get_toxicity_batcher", return_value=batcher):
+            threads = [threading.Thread(target=check, args=(index,)) for index in range(32)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(results, {index: float(index % 2) for index in range(32)})
+        self.assertLess(len(model.calls), 32)
+        self.assertEqual(scoring.content_type_metrics("comment").checks.value - comment_checks, 28)
+        self.assertEqual(scoring.content_type_metrics("post").checks.value - post_checks, 4)
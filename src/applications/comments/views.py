@@ -1,11 +1,68 @@
+from django.conf import settings
+from rest_framework import status
+from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
 
+from applications.common.conditional import ConditionalGetMixin, lookup_value, make_etag
+from applications.common.fast_serialization import FastListMixin
+from applications.posts.scoring import (ToxicityOverloaded, overload_counter, toxicity_aspects_within_budget,
+                                        toxicity_error_response)
+from applications.posts.toxicity_model import aggregate_toxicity
 from .models import Comment
 from .permissions import IsOwnerOrAdminOrReadOnly
 from .serializers import CommentSerializer
 
 
-class CommentViewSet(ModelViewSet):
+class CommentViewSet(ConditionalGetMixin, FastListMixin, ModelViewSet):
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
     permission_classes = [IsOwnerOrAdminOrReadOnly]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in ("list", "retrieve"):
+            return queryset
+        fieldset = self.get_serializer_class().fieldset(self.request)
+        if fieldset.expands("user"):
+            queryset = queryset.select_related("user")
+        columns = fieldset.columns(Comment)
+        return queryset if columns is None else queryset.only(*columns)
+
+    def expands_user(self, request):
+        return self.get_serializer_class().fieldset(request).expands("user")
+
+    def list_validators(self, request, *args, **kwargs):
+        # Tracking the users of every listed comment would join users into a
+        # scan of the whole list, so expanded lists are not validated.
+        if self.expands_user(request):
+            return None
+        return super().list_validators(request, *args, **kwargs)
+
+    def retrieve_validators(self, request, *args, **kwargs):
+        if not self.expands_user(request):
+            return super().retrieve_validators(request, *args, **kwargs)
+        # Saving a user saves its author, whose `updated` then covers the expanded user.
+        state = self.get_queryset().filter(pk=lookup_value(self, kwargs)).values_list(
+            "updated", "user__author_data__updated").first()
+        if state is None:
+            return None
+        last_modified = max(timestamp for timestamp in state if timestamp is not None)
+        return make_etag(request, *state), last_modified
+
+    def create(self, request, *args, **kwargs):
+        if not settings.TOXICITY_CHECK_COMMENTS:
+            return super().create(request, *args, **kwargs)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            aspects = toxicity_aspects_within_budget(serializer.validated_data["content"], content_type="comment")
+        except ToxicityOverloaded as exc:
+            overload_counter(settings.TOXICITY_OVERLOAD_POLICY).inc()
+            if settings.TOXICITY_OVERLOAD_POLICY == "fail_open":
+                return super().create(request, *args, **kwargs)
+            return toxicity_error_response(exc)
+        if aggregate_toxicity(aspects) > settings.TOXICITY_THRESHOLD:
+            return toxicity_error_response()
+        self.perform_create(serializer)
+        headers = self.get_success_headers(serializer.data)
+        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
@@ -0,0 +1,73 @@
+"""
+Response compression: gzip, or brotli when it is installed, for responses of
+at least RESPONSE_COMPRESSION_MIN_SIZE bytes. Smaller ones are not worth the
+CPU and rarely shrink past the extra headers.
+"""
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def encodings():
+    """Supported content codings, most preferred first."""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def accepted_encoding(header):
+    """The supported coding of an Accept-Encoding header with the highest q-value, or None."""
+    weights = {}
+    for item in header.split(','):
+        coding, *params = [part.strip() for part in item.split(';')]
+        weight = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        if coding:
+            weights[coding.lower()] = weight
+    candidates = [(weights.get(coding, weights.get('*', 0.0)), coding) for coding in encodings()]
+    # max() keeps the first of equal weights, the preferred coding.
+    weight, coding = max(candidates, key=lambda candidate: candidate[0])
+    return coding if weight > 0 else None
+
+
+def compress(content, coding):
+    if coding == 'br':
+        return brotli.compress(content, quality=settings.RESPONSE_COMPRESSION_BROTLI_QUALITY)
+    # Random bytes in the gzip header, as in GZipMiddleware, against BREACH.
+    return compress_string(content, max_random_bytes=100)
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """GZipMiddleware with brotli and a configurable size threshold; streaming responses pass through."""
+
+    def process_response(self, request, response):
+        if not settings.RESPONSE_COMPRESSION_ENABLED or response.streaming:
+            return response
+        if len(response.content) < settings.RESPONSE_COMPRESSION_MIN_SIZE or response.has_header('Content-Encoding'):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        coding = accepted_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if coding is None:
+            return response
+        compressed = compress(response.content, coding)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        # A strong ETag names the exact bytes, which compression changes.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = coding
+        return response
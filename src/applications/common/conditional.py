@@ -0,0 +1,80 @@
+"""
+Conditional GET support for viewsets.
+
+Validators are derived from cheap aggregates over the rows a response is
+built from (latest `updated` timestamp plus row counts), so a matching
+If-None-Match or If-Modified-Since is answered with 304 before the queryset
+is evaluated or anything is serialized.
+"""
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def lookup_value(view, kwargs):
+    """
+    The detail lookup of the URL as the database compares it ('01' is 1), so
+    every spelling of an id shares one cache and validator key. Http404 when
+    it is not a valid value of the lookup field.
+    """
+    model = view.queryset.model
+    field = model._meta.pk if view.lookup_field == 'pk' else model._meta.get_field(view.lookup_field)
+    try:
+        return field.to_python(kwargs[view.lookup_url_kwarg or view.lookup_field])
+    except (ValueError, ValidationError):
+        raise Http404
+
+
+def make_etag(request, *parts):
+    """Weak ETag of the validator parts and everything else the body depends on."""
+    viewer = request.user.pk if request.user.is_authenticated else None
+    digest = hashlib.sha256(repr((
+        parts, viewer, request.scheme, request.get_host(), request.get_full_path(), request.accepted_media_type,
+    )).encode()).hexdigest()[:32]
+    return f'W/"{digest}"'
+
+
+class ConditionalGetMixin:
+    """
+    Adds ETag/Last-Modified to list and retrieve responses and answers
+    matching conditional requests with 304. The validators return
+    (etag, last_modified or None), or None to skip validation; the defaults
+    suit models with an `updated` field and no embedded relations.
+    """
+
+    def list_validators(self, request, *args, **kwargs):
+        state = self.filter_queryset(self.get_queryset()).order_by().aggregate(
+            count=Count('pk'), updated=Max('updated'),
+        )
+        return make_etag(request, state['count'], state['updated']), state['updated']
+
+    def retrieve_validators(self, request, *args, **kwargs):
+        updated = self.get_queryset().filter(pk=lookup_value(self, kwargs)).values_list('updated', flat=True).first()
+        return None if updated is None else (make_etag(request, updated), updated)
+
+    def conditional_response(self, request, validators, respond):
+        if validators is None:
+            return respond()
+        etag, last_modified = validators
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = respond()
+            if response.status_code != 200:
+                return response
+        response.headers['ETag'] = etag
+        if timestamp is not None:
+            response.headers['Last-Modified'] = http_date(timestamp)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, self.list_validators(request, *args, **kwargs),
+                                         lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, self.retrieve_validators(request, *args, **kwargs),
+                                         lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs))
@@ -0,0 +1,17 @@
+class CounterFieldsMixin:
+    """
+    For models with denormalized counters that are moved with F() updates:
+    save() of an existing row leaves counter_fields alone, so a stale
+    in-memory value cannot overwrite increments made since it was loaded.
+    """
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not (field.primary_key or field.generated or field.attname in deferred
+                        or field.name in self.counter_fields)
+            ]
+        super().save(*args, **kwargs)
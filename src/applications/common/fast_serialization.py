@@ -0,0 +1,265 @@
+"""
+Read-only fast path for list endpoints.
+
+compile_plan() turns a serializer, as configured for the current request,
+into a Plan: the .values() lookups its fields read and one precompiled
+extractor per field. Hyperlinks are filled into a URL template reversed once
+per request instead of per row, and many-relations are read with one query
+per relation. Plans reproduce the serializer's output exactly for the field
+types the list serializers use; a serializer with anything else (method
+fields, dotted sources, nested many-relations below the top level) gets no
+plan and is serialized as usual.
+"""
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db.models import ForeignObjectRel, ManyToManyField
+from rest_framework import ISO_8601, relations, serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+PK_MARKER = '__pk__'
+
+
+class Unsupported(Exception):
+    """The serializer has a field the fast path cannot reproduce."""
+
+
+class _MarkerObject:
+    pk = PK_MARKER
+
+
+def _nullable(convert):
+    # Serializer.to_representation() renders None without calling the field.
+    if convert is None:
+        return lambda value: value
+    return lambda value: None if value is None else convert(value)
+
+
+def _datetime(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def represent(value):
+        if isinstance(value, str) or value.tzinfo is None:
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return represent
+
+
+def _choice(field):
+    choices = field.choice_strings_to_values
+    return lambda value: value if value == '' else choices.get(str(value), value)
+
+
+# Fields whose to_representation() is a plain type conversion, when not overridden.
+_CONVERSIONS = (
+    (serializers.CharField, str),
+    (serializers.IntegerField, int),
+    (serializers.FloatField, float),
+)
+
+
+def _converter(field):
+    """Precompiled to_representation() of a scalar field, None for identity."""
+    if isinstance(field, serializers.DateTimeField):
+        return _datetime(field)
+    if isinstance(field, serializers.ChoiceField) and type(field).to_representation is serializers.ChoiceField.to_representation:
+        return _choice(field)
+    if type(field) is serializers.JSONField and not field.binary:
+        return None
+    for base, convert in _CONVERSIONS:
+        if isinstance(field, base) and type(field).to_representation is base.to_representation:
+            return convert
+    return field.to_representation
+
+
+def _source_field(model, field):
+    if len(field.source_attrs) != 1:
+        raise Unsupported(field.source)
+    try:
+        return model._meta.get_field(field.source_attrs[0])
+    except FieldDoesNotExist:
+        if field.source_attrs[0] != 'pk':
+            raise Unsupported(field.source)
+        return model._meta.pk
+
+
+def _pk_converter(field):
+    return None if field.pk_field is None else field.pk_field.to_representation
+
+
+def _hyperlink_template(field, context):
+    if field.lookup_field != 'pk':
+        raise Unsupported(field.field_name)
+    format = context.get('format')
+    if format and field.format and field.format != format:
+        format = field.format
+    try:
+        url = field.get_url(_MarkerObject(), field.view_name, context.get('request'), format)
+    except (ImproperlyConfigured, relations.NoReverseMatch):
+        raise Unsupported(field.field_name)
+    if url is None or url.count(PK_MARKER) != 1:
+        raise Unsupported(field.field_name)
+    prefix, suffix = url.split(PK_MARKER)
+    return lambda pk: f'{prefix}{pk}{suffix}'
+
+
+class _Compiler:
+    """Collects the lookups of one values() query and the getters reading them."""
+
+    def __init__(self, context):
+        self.context = context
+        self.lookups = []
+
+    def lookup(self, path):
+        if path not in self.lookups:
+            self.lookups.append(path)
+        return path
+
+    def compile(self, serializer, model, prefix='', many=None):
+        """Getters (name, getter(row, tables)) of the serializer's readable fields."""
+        getters = []
+        pk_lookup = self.lookup(prefix + model._meta.pk.attname)
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            getters.append((name, self.getter(field, model, prefix, pk_lookup, many)))
+        return getters
+
+    def getter(self, field, model, prefix, pk_lookup, many):
+        if isinstance(field, relations.HyperlinkedIdentityField):
+            represent = _hyperlink_template(field, self.context)
+            return lambda row, tables: represent(row[pk_lookup])
+        if isinstance(field, (relations.ManyRelatedField, serializers.ListSerializer)):
+            if many is None:
+                raise Unsupported(field.field_name)
+            many[field.field_name] = _ManyRelation(field, _source_field(model, field), self.context)
+            name = field.field_name
+            return lambda row, tables: tables[name].get(row[pk_lookup], [])
+
+        model_field = _source_field(model, field)
+        if isinstance(field, relations.PrimaryKeyRelatedField):
+            if not (model_field.many_to_one or model_field.one_to_one) or model_field.auto_created:
+                raise Unsupported(field.field_name)
+            lookup = self.lookup(prefix + model_field.attname)
+            convert = _nullable(_pk_converter(field))
+            return lambda row, tables: convert(row[lookup])
+        if isinstance(field, serializers.BaseSerializer):
+            if not (model_field.many_to_one or model_field.one_to_one) or model_field.auto_created:
+                raise Unsupported(field.field_name)
+            nested_prefix = f'{prefix}{model_field.name}__'
+            nested = self.compile(field, model_field.related_model, nested_prefix)
+            nested_pk = nested_prefix + model_field.related_model._meta.pk.attname
+            return lambda row, tables: (
+                None if row[nested_pk] is None else {name: get(row, tables) for name, get in nested}
+            )
+        if isinstance(field, (relations.RelatedField, serializers.SerializerMethodField)) or model_field.is_relation:
+            raise Unsupported(field.field_name)
+        if not model_field.concrete:
+            raise Unsupported(field.field_name)
+        lookup = self.lookup(prefix + model_field.attname)
+        convert = _nullable(_converter(field))
+        return lambda row, tables: convert(row[lookup])
+
+
+class _ManyRelation:
+    """A many-relation of the top-level rows, read with one query ordered by the related pk."""
+
+    def __init__(self, field, model_field, context):
+        child = field.child_relation if isinstance(field, relations.ManyRelatedField) else field.child
+        if isinstance(model_field, ManyToManyField):
+            # Read from the through table: (source id, target columns).
+            self.model = model_field.remote_field.through
+            source = self.model._meta.get_field(model_field.m2m_field_name())
+            target = self.model._meta.get_field(model_field.m2m_reverse_field_name())
+            self.parent_lookup = source.attname
+            self.filter = f'{source.name}__in'
+            self.ordering = target.attname
+            related_model, prefix, pk_lookup = target.related_model, f'{target.name}__', target.attname
+        elif isinstance(model_field, ForeignObjectRel) and model_field.one_to_many:
+            self.model = model_field.related_model
+            self.parent_lookup = model_field.field.attname
+            self.filter = f'{model_field.field.name}__in'
+            self.ordering = self.model._meta.pk.attname
+            related_model, prefix, pk_lookup = self.model, '', self.model._meta.pk.attname
+        else:
+            raise Unsupported(field.field_name)
+
+        compiler = _Compiler(context)
+        compiler.lookup(self.parent_lookup)
+        if isinstance(child, relations.PrimaryKeyRelatedField):
+            lookup = compiler.lookup(pk_lookup)
+            convert = _nullable(_pk_converter(child))
+            self.build = lambda row: convert(row[lookup])
+        elif isinstance(child, serializers.Serializer):
+            getters = compiler.compile(child, related_model, prefix)
+            self.build = lambda row: {name: get(row, None) for name, get in getters}
+        else:
+            raise Unsupported(field.field_name)
+        self.lookups = compiler.lookups
+
+    def fetch(self, ids):
+        """{parent id: [representations]} of the given parents."""
+        table = {}
+        rows = (self.model._default_manager.filter(**{self.filter: ids})
+                .order_by(self.ordering).values(*self.lookups))
+        for row in rows:
+            table.setdefault(row[self.parent_lookup], []).append(self.build(row))
+        return table
+
+
+class Plan:
+    """Reads the rows of a list serializer with .values() and renders them the way it would."""
+
+    def __init__(self, serializer, model):
+        compiler = _Compiler(serializer.context)
+        self.many = {}
+        self.getters = compiler.compile(serializer, model, many=self.many)
+        self.pk_lookup = model._meta.pk.attname
+        self.lookups = compiler.lookups
+
+    def values(self, queryset, extra=()):
+        """queryset as values() rows, with the extra lookups a paginator needs."""
+        lookups = self.lookups + [lookup for lookup in extra if lookup not in self.lookups]
+        return queryset.prefetch_related(None).values(*lookups)
+
+    def render(self, rows):
+        rows = list(rows)
+        tables = {}
+        if self.many and rows:
+            ids = [row[self.pk_lookup] for row in rows]
+            tables = {name: relation.fetch(ids) for name, relation in self.many.items()}
+        getters = self.getters
+        return [{name: get(row, tables) for name, get in getters} for row in rows]
+
+
+def compile_plan(serializer):
+    """Plan of a ModelSerializer instance, or None if it has fields the fast path cannot reproduce."""
+    try:
+        return Plan(serializer, serializer.Meta.model)
+    except Unsupported:
+        return None
+
+
+class FastListMixin:
+    """
+    Serves list() through compile_plan() when FAST_LIST_SERIALIZATION is on
+    and the serializer is supported, falling back to the serializer otherwise.
+    """
+
+    def fast_list_lookups(self):
+        """Lookups the paginator reads from the rows besides the serialized ones."""
+        return []
+
+    def list(self, request, *args, **kwargs):
+        plan = compile_plan(self.get_serializer()) if settings.FAST_LIST_SERIALIZATION else None
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+        rows = plan.values(self.filter_queryset(self.get_queryset()), self.fast_list_lookups())
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(plan.render(page))
+        return Response(plan.render(rows))
@@ -0,0 +1,92 @@
+import threading
+from collections import deque
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Counter:
+    def __init__(self, name):
+        self.name = name
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self._value
+
+    def snapshot(self):
+        return self._value
+
+
+class Histogram:
+    """
+    Keeps count and sum of every observation plus a bounded window of the
+    most recent ones, which is used to report percentiles.
+    """
+
+    def __init__(self, name, window=2048):
+        self.name = name
+        self._count = 0
+        self._sum = 0.0
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self._count += 1
+            self._sum += value
+            self._recent.append(value)
+
+    def percentile(self, q):
+        with self._lock:
+            values = sorted(self._recent)
+        return _percentile(values, q)
+
+    def snapshot(self):
+        with self._lock:
+            count, total, values = self._count, self._sum, sorted(self._recent)
+        return {
+            'count': count,
+            'sum': total,
+            'avg': total / count if count else None,
+            'p50': _percentile(values, 50),
+            'p95': _percentile(values, 95),
+            'p99': _percentile(values, 99),
+            'max': values[-1] if values else None,
+        }
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, name, cls):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.setdefault(name, cls(name))
+        return metric
+
+    def counter(self, name):
+        return self._get_or_create(name, Counter)
+
+    def histogram(self, name):
+        return self._get_or_create(name, Histogram)
+
+    def snapshot(self):
+        return {name: metric.snapshot() for name, metric in sorted(self._metrics.items())}
+
+
+registry = MetricsRegistry()
+counter = registry.counter
+histogram = registry.histogram
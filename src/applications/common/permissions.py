@@ -1,3 +1,6 @@
+import hmac
+
+from django.conf import settings
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 
 
@@ -12,3 +15,12 @@ class IsAdminOrReadOnly(BasePermission):
             request.user and request.user.is_authenticated and request.user.is_superuser
         )
 
+
+class HasMetricsToken(BasePermission):
+    """
+    The request sends METRICS_TOKEN in the X-Metrics-Token header, for scrapers without an account.
+    """
+
+    def has_permission(self, request, view):
+        token = request.headers.get('X-Metrics-Token', '')
+        return bool(settings.METRICS_TOKEN) and hmac.compare_digest(token.encode(), settings.METRICS_TOKEN.encode())
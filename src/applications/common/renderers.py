@@ -0,0 +1,86 @@
+"""
+Renderers and parsers of the API. orjson and msgpack are optional: without
+orjson, JSON goes through DRF's stdlib implementation; without msgpack, the
+MessagePack renderer is left out of content negotiation (see settings).
+"""
+from io import BytesIO
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Types orjson would write in its own format are passed to the encoder JSONRenderer uses.
+ORJSON_OPTIONS = 0 if orjson is None else orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+
+def use_orjson():
+    return orjson is not None and settings.API_ORJSON
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer through orjson. The output is the same compact JSON, floats
+    aside, which may spell their exponent differently (1e-7 for 1e-07).
+    Indented and ASCII-only output, and data orjson rejects (such as integers
+    beyond 64 bits), are left to JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None or not use_orjson() or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type or self.media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Escaped by JSONRenderer too: valid JSON, but not valid JavaScript.
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class ORJSONParser(JSONParser):
+    """JSONParser through orjson; bodies orjson rejects are parsed, or rejected, by JSONParser."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if not use_orjson():
+            return super().parse(stream, media_type, parser_context)
+        body = stream.read()
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if encoding.lower().replace('-', '') == 'utf8':
+            try:
+                return orjson.loads(body)
+            except orjson.JSONDecodeError:
+                pass
+        return super().parse(BytesIO(body), media_type, parser_context)
+
+
+def _msgpack_default(obj):
+    # Whatever JSONRenderer would write for it: ISO dates, decimals, lazy strings.
+    return encoders.JSONEncoder().default(obj)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """MessagePack for clients sending Accept: application/msgpack."""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_msgpack_default, datetime=False)
+
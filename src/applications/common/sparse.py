@@ -0,0 +1,86 @@
+"""
+Sparse fieldsets: ?fields=id,header keeps only the listed fields of a
+response, ?expand=author,tags lists the relations to nest. Without ?expand=
+a serializer nests what it always did; an unexpanded relation is rendered as
+its primary key. Fields a serializer omits by default, such as the post body
+on the list, are added with ?include=body or by naming them in ?fields=.
+Views read the same Fieldset to select, prefetch and load only what the
+serializer will use.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.permissions import SAFE_METHODS
+
+
+def query_names(request, param):
+    """Comma-separated names of a query parameter, or None when it is absent."""
+    if param not in request.query_params:
+        return None
+    return {name.strip() for name in request.query_params[param].split(',') if name.strip()}
+
+
+class Fieldset:
+    """The fields and expansions a request asks of a SparseFieldsMixin serializer."""
+
+    def __init__(self, fields, expand, omit=()):
+        self.fields = fields
+        self.expand = expand
+        self.omit = set(omit)
+
+    def includes(self, name):
+        if self.fields is None:
+            return name not in self.omit
+        return name in self.fields
+
+    def expands(self, name):
+        return self.includes(name) and name in self.expand
+
+    def columns(self, model, aliases=None, always=()):
+        """Concrete fields of model to load with only(), or None to load them all but the omitted ones."""
+        if self.fields is None:
+            return None
+        aliases = aliases or {}
+        columns = []
+        for name in [*self.fields, *always]:
+            try:
+                field = model._meta.get_field(aliases.get(name, name))
+            except FieldDoesNotExist:
+                continue
+            if field.concrete and not field.many_to_many:
+                columns.append(field.name)
+        return columns
+
+
+# For ModelSerializers answering reads. `expandable_fields` maps a relation
+# to a factory of its nested serializer, the declared field being the
+# collapsed form; `default_expand` are the ones nested without ?expand=
+# (all of them when None); `default_omit` are the fields left out unless
+# asked for. Fields left out are never built. A comment rather than a
+# docstring, which the API schema would show for every serializer.
+class SparseFieldsMixin:
+    expandable_fields = {}
+    default_expand = None
+    default_omit = ()
+
+    @classmethod
+    def fieldset(cls, request):
+        default_expand = set(cls.expandable_fields if cls.default_expand is None else cls.default_expand)
+        if request is None or request.method not in SAFE_METHODS:
+            # Writes validate and return every field.
+            return Fieldset(None, default_expand)
+        expand = query_names(request, 'expand')
+        omit = set(cls.default_omit) - (query_names(request, 'include') or set())
+        return Fieldset(query_names(request, 'fields'), default_expand if expand is None else expand, omit)
+
+    def get_fields(self):
+        self.requested = self.fieldset(self.context.get('request'))
+        declared = {
+            name: self.expandable_fields[name]() if self.requested.expands(name) and name in self.expandable_fields
+            else field
+            for name, field in self._declared_fields.items() if self.requested.includes(name)
+        }
+        # ModelSerializer.get_fields() copies the declared fields from here.
+        self._declared_fields = declared
+        return super().get_fields()
+
+    def get_field_names(self, declared_fields, info):
+        return [name for name in super().get_field_names(declared_fields, info) if self.requested.includes(name)]
@@ -0,0 +1,14 @@
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .metrics import registry
+from .permissions import HasMetricsToken
+
+
+class MetricsView(APIView):
+    """In-process counters and latency histograms of this worker, for admins and metrics scrapers."""
+    permission_classes = [IsAdminUser | HasMetricsToken]
+
+    def get(self, request):
+        return Response(registry.snapshot())
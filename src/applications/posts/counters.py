@@ -0,0 +1,91 @@
+"""
+Denormalized counters: Post.comment_count and the post_count of authors,
+categories and tags. Post counts include published posts only, the ones the
+API shows. Counters are moved with relative F() updates in the transaction
+of the change that causes them (see signals.py and moderation.py), and
+recount() repairs any drift.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from applications.authors.models import Author
+from applications.categories.models import Category
+from applications.comments.models import Comment
+from applications.tags.models import Tag
+from .models import Post
+
+
+def increment(model, field, deltas):
+    """Add {pk: delta} to model.field in one UPDATE. Counters are part of the row, so `updated` moves too."""
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    delta = Case(*[When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()], output_field=IntegerField())
+    model.objects.filter(pk__in=deltas).update(**{field: F(field) + delta}, updated=timezone.now())
+
+
+def _scaled(pks, sign):
+    return {pk: count * sign for pk, count in Counter(pks).items()}
+
+
+def count_posts(posts, sign):
+    """Count (sign=1) or uncount (sign=-1) published posts in their author, category and tag counters."""
+    posts = list(posts)
+    if not posts:
+        return
+    tag_ids = Post.tags.through.objects.filter(post_id__in=[post.pk for post in posts]).values_list('tag_id', flat=True)
+    increment(Author, 'post_count', _scaled((post.author_id for post in posts), sign))
+    increment(Category, 'post_count', _scaled((post.category_id for post in posts), sign))
+    increment(Tag, 'post_count', _scaled(tag_ids, sign))
+
+
+def count_status_changes(posts, published_before):
+    """Counters of posts written with bulk_update, which sends no signals; published_before holds pks."""
+    published = Post.ModerationStatus.PUBLISHED
+    count_posts([post for post in posts if post.moderation_status == published and post.pk not in published_before], 1)
+    count_posts([post for post in posts if post.moderation_status != published and post.pk in published_before], -1)
+
+
+def _count_of(model, field, related_filter):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}, **related_filter).order_by()
+        .values(field).annotate(count=Count('pk')).values('count')
+    ), 0)
+
+
+def recount_targets():
+    """(model, counter field, true value expression) of every denormalized counter."""
+    published = {'moderation_status': Post.ModerationStatus.PUBLISHED}
+    return [
+        (Post, 'comment_count', _count_of(Comment, 'post', {})),
+        (Author, 'post_count', _count_of(Post, 'author', published)),
+        (Category, 'post_count', _count_of(Post, 'category', published)),
+        (Tag, 'post_count', _count_of(Post, 'tags', published)),
+    ]
+
+
+def recount(model, field, expression, batch_size=1000):
+    """
+    Recompute model.field from expression over keyset batches of batch_size
+    rows, each in its own short transaction. Only drifted rows are written;
+    returns their primary keys.
+    """
+    fixed = []
+    last_pk = 0
+    while True:
+        pks = list(model.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return fixed
+        last_pk = pks[-1]
+        with transaction.atomic():
+            drifted = list(
+                model.objects.filter(pk__in=pks).alias(actual=expression).filter(~Q(**{field: F('actual')}))
+                .select_for_update().values_list('pk', flat=True)
+            )
+            if drifted:
+                model.objects.filter(pk__in=drifted).update(**{field: expression}, updated=timezone.now())
+        fixed.extend(drifted)
@@ -1,5 +1,10 @@
 import django_filters
-from .models import Post
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+from rest_framework.filters import OrderingFilter, SearchFilter
+
+from .models import SEARCH_CONFIG, Post
 
 
 class NumberInFilter(django_filters.BaseInFilter, django_filters.NumberFilter):
@@ -15,4 +20,36 @@ class PostFilter(django_filters.FilterSet):
 
     class Meta:
         model = Post
-        fields = ['tags', 'category', 'author']
+        fields = {
+            'tags': ['exact'],
+            'category': ['exact'],
+            'author': ['exact'],
+            'toxicity': ['lt', 'lte', 'gt', 'gte'],
+        }
+
+
+class PostSearchFilter(SearchFilter):
+    """
+    Full-text search over the GIN-indexed Post.search_vector (header weighted
+    above body). Accepts web search syntax: quoted phrases, `or`, `-word`.
+    Matches are annotated with their ts_rank as `rank`.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = request.query_params.get(self.search_param, '').strip()
+        if not terms:
+            return queryset
+        query = SearchQuery(terms, config=SEARCH_CONFIG, search_type='websearch')
+        # ts_rank is a real; as a double it round-trips through pagination cursors exactly.
+        rank = Cast(SearchRank(F('search_vector'), query), FloatField())
+        return queryset.filter(search_vector=query).annotate(rank=rank)
+
+
+class PostOrderingFilter(OrderingFilter):
+    """Orders search results by rank unless the client asks for another ordering."""
+
+    def get_ordering(self, request, queryset, view):
+        searching = request.query_params.get(PostSearchFilter.search_param, '').strip()
+        if searching and not request.query_params.get(self.ordering_param):
+            return ['-rank']
+        return super().get_ordering(request, queryset, view)
@@ -0,0 +1,75 @@
+import json
+import platform
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from applications.common import renderers
+from applications.common.compression import compress, encodings
+from applications.posts.models import Post
+from applications.posts.views import PostViewSet
+from .benchmark_serialization import list_view, seed
+
+
+def available_renderers():
+    yield 'json', JSONRenderer()
+    if renderers.orjson is not None:
+        yield 'orjson', renderers.ORJSONRenderer()
+    if renderers.msgpack is not None:
+        yield 'msgpack', renderers.MessagePackRenderer()
+
+
+def mean_ms(run, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    return round(statistics.mean(timings) * 1000, 3)
+
+
+class Command(BaseCommand):
+    help = ("Render a page of seeded posts (rolled back afterwards) with every available renderer and "
+            "content coding, and print render and compression times and bytes on the wire as JSON.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100, help="Posts on the page")
+        parser.add_argument('--body-length', type=int, default=2000, help="Characters of each post body")
+        parser.add_argument('--repeat', type=int, default=20, help="Timed runs per combination")
+        parser.add_argument('--host', default='localhost',
+                            help="Host of the hyperlinks in the responses, one of ALLOWED_HOSTS")
+        parser.add_argument('--output', default=None, help="Write the JSON report to this file")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            before = seed(options['posts'], options['body_length'])
+            view = list_view(PostViewSet, '/api/posts/', options['host'])
+            posts = view.get_queryset().filter(pk__gt=before[Post]).order_by('-date_posted', '-id')
+            # The page as the list sends it; the cursor value does not matter here.
+            page = {'next': view.request.build_absolute_uri('/api/posts/?cursor=aT0x'), 'previous': None,
+                    'results': view.get_serializer(posts, many=True).data}
+            transaction.set_rollback(True)
+
+        report = {'environment': {'python': platform.python_version()}, 'posts': options['posts'], 'results': []}
+        for name, renderer in available_renderers():
+            content = renderer.render(page)
+            render_ms = mean_ms(lambda: renderer.render(page), options['repeat'])
+            report['results'].append({'renderer': name, 'encoding': 'identity', 'render_ms': render_ms,
+                                      'compress_ms': 0, 'bytes': len(content)})
+            for coding in encodings():
+                report['results'].append({
+                    'renderer': name,
+                    'encoding': coding,
+                    'render_ms': render_ms,
+                    'compress_ms': mean_ms(lambda: compress(content, coding), options['repeat']),
+                    'bytes': len(compress(content, coding)),
+                })
+
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        self.stdout.write(output)
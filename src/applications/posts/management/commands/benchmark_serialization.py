@@ -0,0 +1,114 @@
+import json
+import platform
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from applications.authors.models import Author
+from applications.authors.views import AuthorViewSet
+from applications.categories.models import Category
+from applications.comments.models import Comment
+from applications.comments.views import CommentViewSet
+from applications.common.fast_serialization import compile_plan
+from applications.jwt_auth.models import User
+from applications.posts.models import Post
+from applications.posts.views import PostViewSet
+from applications.tags.models import Tag
+from .benchmark_toxicity import int_list, percentile, synthetic_text
+
+ENDPOINTS = (
+    ('posts', PostViewSet, Post, '/api/posts/'),
+    ('authors', AuthorViewSet, Author, '/api/authors/'),
+    ('comments', CommentViewSet, Comment, '/api/comments/'),
+)
+
+
+def list_view(viewset, path, host):
+    view = viewset(action_map={'get': 'list'}, args=(), kwargs={}, format_kwarg=None, headers={})
+    view.request = view.initialize_request(APIRequestFactory().get(path, HTTP_HOST=host))
+    return view
+
+
+def seed(size, body_length=300):
+    """size users with an author, a post and a comment each; returns the last pk of each listed table before."""
+    before = {model: model.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+              for model in (Author, Post, Comment)}
+    category = Category.objects.create(name='Benchmark')
+    tags = Tag.objects.bulk_create([Tag(name=f'Benchmark {i}') for i in range(10)])
+    # bulk_create sends no post_save, so authors are created here.
+    users = User.objects.bulk_create([
+        User(email=f'benchmark{i}@example.com', password='!', first_name='Имя', last_name=f'Фамилия {i}')
+        for i in range(size)
+    ])
+    authors = Author.objects.bulk_create([Author(user=user, bio='Benchmark author') for user in users])
+    rng = random.Random(0)
+    posts = Post.objects.bulk_create([
+        Post(header=f'Benchmark post {i}', body=synthetic_text(body_length, rng), author=author, category=category,
+             toxicity=i / size, toxicity_aspects={'insult': i / size})
+        for i, author in enumerate(authors)
+    ])
+    Post.tags.through.objects.bulk_create([
+        Post.tags.through(post=post, tag=tag) for i, post in enumerate(posts) for tag in tags[i % 8:i % 8 + 3]
+    ])
+    Comment.objects.bulk_create([
+        Comment(content=f'Benchmark comment {i}', post=post, user=user)
+        for i, (post, user) in enumerate(zip(posts, users))
+    ])
+    return before
+
+
+class Command(BaseCommand):
+    help = ("Benchmark the list serializers of posts, authors and comments against their fast values() path "
+            "over seeded rows (rolled back afterwards) and print timings as JSON.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int_list, default=[100, 1000, 10000],
+                            help="Comma-separated row counts")
+        parser.add_argument('--repeat', type=int, default=5, help="Timed runs per path and size")
+        parser.add_argument('--host', default='localhost',
+                            help="Host of the hyperlinks in the responses, one of ALLOWED_HOSTS")
+        parser.add_argument('--output', default=None, help="Write the JSON report to this file")
+
+    def handle(self, *args, **options):
+        report = {'environment': {'python': platform.python_version()}, 'results': []}
+        with transaction.atomic():
+            before = seed(max(options['sizes']))
+            for size in options['sizes']:
+                for name, viewset, model, path in ENDPOINTS:
+                    view = list_view(viewset, path, options['host'])
+                    report['results'].append(self.measure(view, name, before[model], size, options['repeat']))
+            transaction.set_rollback(True)
+
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        self.stdout.write(output)
+
+    def measure(self, view, name, after_pk, size, repeat):
+        queryset = view.get_queryset().filter(pk__gt=after_pk).order_by('pk')
+        renderer = JSONRenderer()
+
+        def serializer_path():
+            return renderer.render(view.get_serializer(queryset[:size], many=True).data)
+
+        def fast_path():
+            plan = compile_plan(view.get_serializer())
+            return renderer.render(plan.render(plan.values(queryset)[:size]))
+
+        result = {'endpoint': name, 'rows': size, 'identical': serializer_path() == fast_path()}
+        for label, run in (('serializer', serializer_path), ('fast', fast_path)):
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                run()
+                timings.append(time.perf_counter() - started)
+            result[f'{label}_ms'] = round(statistics.mean(timings) * 1000, 3)
+            result[f'{label}_p95_ms'] = round(percentile(timings, 95) * 1000, 3)
+        result['speedup'] = round(result['serializer_ms'] / result['fast_ms'], 2)
+        return result
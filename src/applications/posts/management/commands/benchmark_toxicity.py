@@ -0,0 +1,149 @@
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from applications.posts.toxicity_model import ToxicityModel
+from applications.posts.toxicity_stand_in import build_stand_in_checkpoint
+
+WORDS = (
+    'пост блог текст автор комментарий новости сегодня интересный вопрос ответ '
+    'post blog text author comment news today interesting question answer'
+).split()
+
+
+def synthetic_text(length, rng):
+    words = []
+    size = 0
+    while size < length:
+        word = rng.choice(WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return ' '.join(words)[:length]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if platform.system() == 'Darwin' else 1024), 1)
+
+
+def current_rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+    except OSError:
+        return None
+    return round(pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024), 1)
+
+
+def int_list(value):
+    return [int(item) for item in value.split(',')]
+
+
+class Command(BaseCommand):
+    help = ("Benchmark ToxicityModel.text2toxicity over synthetic Russian/English texts, sweeping batch size, "
+            "text length, torch threads and backend, and print throughput, latency percentiles and RSS as JSON.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lengths', type=int_list, default=[100, 1000, 10000],
+                            help="Comma-separated text lengths in characters")
+        parser.add_argument('--batch-sizes', type=int_list, default=[1, 8, 32])
+        parser.add_argument('--threads', type=int_list, default=[],
+                            help="Comma-separated torch thread counts (defaults to the current setting)")
+        parser.add_argument('--backends', default='torch',
+                            help="Comma-separated backends out of torch, int8, torchscript")
+        parser.add_argument('--repeat', type=int, default=10, help="Timed calls per configuration")
+        parser.add_argument('--checkpoint', default=None,
+                            help="Local checkpoint path (defaults to ToxicityModel.model_checkpoint)")
+        parser.add_argument('--stand-in', action='store_true',
+                            help="Benchmark a randomly initialised stand-in model, no download needed")
+        parser.add_argument('--chunk-overlap', type=int, default=64)
+        parser.add_argument('--max-chunks', type=int, default=32)
+        parser.add_argument('--output', default=None, help="Write the JSON report to this file")
+
+    def handle(self, *args, **options):
+        import torch
+        import transformers
+
+        report = {
+            'environment': {
+                'python': platform.python_version(),
+                'torch': torch.__version__,
+                'transformers': transformers.__version__,
+                'cpu_count': os.cpu_count(),
+                'default_threads': torch.get_num_threads(),
+            },
+            'results': [],
+        }
+        threads = options['threads'] or [torch.get_num_threads()]
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = options['checkpoint']
+            if options['stand_in']:
+                checkpoint = build_stand_in_checkpoint(directory)
+            report['checkpoint'] = checkpoint or ToxicityModel.model_checkpoint
+
+            for backend in options['backends'].split(','):
+                rss_before = current_rss_mb()
+                started = time.perf_counter()
+                model = ToxicityModel(chunk_overlap=options['chunk_overlap'], max_chunks=options['max_chunks'],
+                                      model_checkpoint=checkpoint, backend=backend)
+                rss_after = current_rss_mb()
+                report.setdefault('loads', []).append({
+                    'backend': backend,
+                    'load_seconds': round(time.perf_counter() - started, 3),
+                    'rss_mb': rss_after,
+                    'rss_growth_mb': None if rss_before is None else round(rss_after - rss_before, 1),
+                    'parity_deviation': model.parity_deviation,
+                })
+                for thread_count in threads:
+                    torch.set_num_threads(thread_count)
+                    model.text2toxicity('warm-up')
+                    report['results'].extend(self.sweep(model, backend, thread_count, options))
+                del model
+        torch.set_num_threads(report['environment']['default_threads'])
+
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        self.stdout.write(output)
+
+    def sweep(self, model, backend, thread_count, options):
+        rng = random.Random(0)
+        results = []
+        for length in options['lengths']:
+            for batch_size in options['batch_sizes']:
+                texts = [synthetic_text(length, rng) for _ in range(batch_size)]
+                _, windows = model._tokenize(texts)
+                timings = []
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    model.text2toxicity(texts)
+                    timings.append(time.perf_counter() - started)
+                total = sum(timings)
+                results.append({
+                    'backend': backend,
+                    'threads': thread_count,
+                    'length': length,
+                    'batch_size': batch_size,
+                    'chunks': len(windows),
+                    'throughput_texts_per_s': round(batch_size * len(timings) / total, 2),
+                    'mean_ms': round(statistics.mean(timings) * 1000, 3),
+                    'p50_ms': round(percentile(timings, 50) * 1000, 3),
+                    'p95_ms': round(percentile(timings, 95) * 1000, 3),
+                    'p99_ms': round(percentile(timings, 99) * 1000, 3),
+                    'peak_rss_mb': peak_rss_mb(),
+                })
+        return results
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from applications.posts import toxicity_backends
+from applications.posts.toxicity_model import ToxicityModel
+
+
+class Command(BaseCommand):
+    help = "Export the toxicity model as a quantized or TorchScript artifact loadable without network access."
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help="Artifact directory")
+        parser.add_argument('--backend', choices=['int8', 'torchscript'], default='int8')
+        parser.add_argument('--checkpoint', default=None,
+                            help="Checkpoint to export (defaults to ToxicityModel.model_checkpoint)")
+        parser.add_argument('--tolerance', type=float, default=0.05)
+
+    def handle(self, *args, **options):
+        reference_model = ToxicityModel(model_checkpoint=options['checkpoint'])
+        reference = reference_model.text2toxicity(toxicity_backends.PARITY_CORPUS, aggregate=False)
+
+        module = toxicity_backends.build_backend(reference_model.model.cpu(), reference_model.tokenizer,
+                                                 options['backend'], reference_model.max_length)
+        if options['backend'] == 'int8':
+            # Only TorchScript graphs can be saved and loaded without the model code.
+            module = toxicity_backends.trace(module, reference_model.tokenizer, reference_model.max_length)
+
+        toxicity_backends.export_artifact(options['output'], reference_model.tokenizer, module, {
+            'model_checkpoint': reference_model.model_checkpoint,
+            'backend': options['backend'],
+            'max_length': reference_model.max_length,
+            'reference': reference.tolist(),
+        })
+
+        try:
+            exported = ToxicityModel(model_checkpoint=options['checkpoint'], backend=options['backend'],
+                                     artifact_path=options['output'], parity_tolerance=options['tolerance'])
+        except toxicity_backends.ToxicityBackendParityError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {options['backend']} artifact to {options['output']} "
+            f"(max deviation from fp32 {exported.parity_deviation:.5f})"
+        ))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from applications.posts.moderation import process_moderation_batch
+
+
+class Command(BaseCommand):
+    help = "Score pending posts from the moderation queue and publish or reject them."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=64)
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help="Seconds to sleep when the queue is empty")
+        parser.add_argument('--once', action='store_true',
+                            help="Exit once the queue is empty instead of polling")
+
+    def handle(self, *args, **options):
+        total = 0
+        try:
+            while True:
+                processed = process_moderation_batch(options['batch_size'])
+                total += processed
+                if processed:
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"Processed {total} moderation jobs"))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from applications.posts import response_cache
+from applications.posts.counters import recount, recount_targets
+from applications.posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ("Recompute the denormalized comment and post counters from the rows they count, "
+            "in batches, writing only the counters that drifted.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows checked per transaction")
+
+    def handle(self, *args, **options):
+        for model, field, expression in recount_targets():
+            fixed = recount(model, field, expression, batch_size=options['batch_size'])
+            if model is Post and fixed:
+                response_cache.invalidate_posts(fixed)
+            self.stdout.write(f"{model._meta.label}.{field}: {len(fixed)} fixed")
+        self.stdout.write(self.style.SUCCESS("Counters are consistent"))
@@ -0,0 +1,65 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from applications.posts.models import RemoderationCheckpoint
+from applications.posts.moderation import remoderate_posts
+
+
+def _remoderate_shard(shard, shards, options):
+    checkpoint = remoderate_posts(batch_size=options['batch_size'], threshold=options['threshold'],
+                                  shard=shard, shards=shards, reset=options['reset'],
+                                  chunk_size=options['chunk_size'])
+    return checkpoint.processed, checkpoint.changed
+
+
+def _remoderate_shard_in_worker(shard, shards, options):
+    # The forked worker must not share the connections it inherited.
+    connections.close_all()
+    return _remoderate_shard(shard, shards, options)
+
+
+class Command(BaseCommand):
+    help = ("Re-evaluate stored posts after TOXICITY_THRESHOLD or the model changed. "
+            "Progress is checkpointed, so an interrupted run resumes where it stopped.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=512,
+                            help="Posts written per batch; scoring is split into forward passes "
+                                 "of at most TOXICITY_MAX_WINDOWS_PER_PASS windows")
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Rows fetched per cursor round trip")
+        parser.add_argument('--threshold', type=float, default=None,
+                            help="Toxicity threshold (defaults to TOXICITY_THRESHOLD)")
+        parser.add_argument('--workers', type=int, default=1,
+                            help="Processes to run, each scoring its own share of the ids; progress is "
+                                 "saved per worker count, so resuming needs the same count (or --reset)")
+        parser.add_argument('--reset', action='store_true', help="Ignore saved progress and start over")
+
+    def handle(self, *args, **options):
+        shards = options['workers']
+        # Checkpoints are per shard of a given count, another count would start over from id 0.
+        others = RemoderationCheckpoint.objects.filter(name__startswith='posts:').exclude(
+            name__regex=rf'^posts:\d+/{shards}$')
+        if options['reset']:
+            others.delete()
+        elif others.exists():
+            counts = sorted({name.rsplit('/', 1)[1] for name in others.values_list('name', flat=True)}, key=int)
+            raise CommandError(f"Saved progress is for --workers {', '.join(counts)}; resume with that count "
+                               f"or pass --reset to start over")
+        options = {key: options[key] for key in ('batch_size', 'chunk_size', 'threshold', 'reset')}
+        if shards == 1:
+            results = [_remoderate_shard(0, 1, options)]
+        else:
+            # Every worker opens its own database connection and loads its own model.
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            with ProcessPoolExecutor(max_workers=shards, mp_context=context) as executor:
+                futures = [executor.submit(_remoderate_shard_in_worker, shard, shards, options)
+                           for shard in range(shards)]
+                results = [future.result() for future in futures]
+
+        processed = sum(result[0] for result in results)
+        changed = sum(result[1] for result in results)
+        self.stdout.write(self.style.SUCCESS(f"Re-moderated {processed} posts, {changed} changed status"))
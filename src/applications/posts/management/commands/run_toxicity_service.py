@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from applications.posts.toxicity_batcher import get_toxicity_batcher
+from applications.posts.toxicity_model import warm_up
+from applications.posts.toxicity_service import ToxicityServiceServer
+
+
+class Command(BaseCommand):
+    help = "Serve toxicity scoring for all web workers over a Unix domain socket."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', default=settings.TOXICITY_SERVICE_SOCKET,
+                            help="Socket path (defaults to TOXICITY_SERVICE_SOCKET)")
+        parser.add_argument('--threads', type=int, default=None,
+                            help="Number of intra-op threads torch may use")
+
+    def handle(self, *args, **options):
+        socket_path = options['socket']
+        if not socket_path:
+            raise CommandError("Pass --socket or set TOXICITY_SERVICE_SOCKET")
+        if options['threads']:
+            import torch
+            torch.set_num_threads(options['threads'])
+
+        warm_up()
+        server = ToxicityServiceServer(socket_path, get_toxicity_batcher())
+        self.stdout.write(self.style.SUCCESS(f"Toxicity service listening on {socket_path}"))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
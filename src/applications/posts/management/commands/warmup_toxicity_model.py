@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from applications.posts.toxicity_model import ToxicityModel, warm_up
+
+
+class Command(BaseCommand):
+    help = "Download (if needed) and load the toxicity model, then run a dummy inference."
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        warm_up()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Toxicity model '{ToxicityModel.model_checkpoint}' is warm ({elapsed:.2f}s)"
+        ))
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ToxicityScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text_hash', models.CharField(max_length=64)),
+                ('model_version', models.CharField(max_length=200)),
+                ('score', models.FloatField()),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('text_hash', 'model_version'), name='unique_toxicity_score')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0002_toxicityscore'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='moderation_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('published', 'Published'), ('rejected', 'Rejected')], default='published', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='ModerationJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='moderation_job', to='posts.post')),
+            ],
+        ),
+    ]
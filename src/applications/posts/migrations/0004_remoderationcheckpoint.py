@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0003_moderation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RemoderationCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('processed', models.BigIntegerField(default=0)),
+                ('changed', models.BigIntegerField(default=0)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_remoderationcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='toxicity',
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='toxicity_aspects',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='toxicityscore',
+            name='aspects',
+            field=models.JSONField(default=list),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authors', '0001_initial'),
+        ('categories', '0001_initial'),
+        ('posts', '0005_toxicity_aspects'),
+        ('tags', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-date_posted', '-id'], name='post_date_posted_id_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:20
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_post_date_posted_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql="""
+                CREATE TEXT SEARCH CONFIGURATION ru_en (COPY = russian);
+                ALTER TEXT SEARCH CONFIGURATION ru_en
+                    ALTER MAPPING FOR asciiword, asciihword, hword_asciipart WITH english_stem;
+            """,
+            reverse_sql="DROP TEXT SEARCH CONFIGURATION ru_en;",
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('header', config='ru_en', weight='A'), '||', django.contrib.postgres.search.SearchVector('body', config='ru_en', weight='B'), django.contrib.postgres.search.SearchConfig('ru_en')), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='post_search_vector_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:22
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+# pg_trgm ships with postgresql-contrib, which not every server has. Without it
+# the index is skipped and /api/posts/suggest/ falls back to substring matches.
+CREATE_TRGM_INDEX = """
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm') THEN
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        CREATE INDEX IF NOT EXISTS post_header_trgm_idx ON posts_post USING gin (header gin_trgm_ops);
+    END IF;
+END
+$$;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_search_vector'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(CREATE_TRGM_INDEX, reverse_sql='DROP INDEX IF EXISTS post_header_trgm_idx;'),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='post',
+                    index=django.contrib.postgres.indexes.GinIndex(
+                        fields=['header'], name='post_header_trgm_idx', opclasses=['gin_trgm_ops']
+                    ),
+                ),
+            ],
+        ),
+    ]
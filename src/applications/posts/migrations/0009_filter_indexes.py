@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_header_trgm_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-date_posted', '-id'], name='post_author_date_posted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['category', '-date_posted', '-id'], name='post_category_date_posted_idx'),
+        ),
+        # The tag filters go from tag to posts; the unique (post_id, tag_id)
+        # constraint only covers the other direction. The auto-created through
+        # model cannot declare indexes, hence raw SQL.
+        migrations.RunSQL(
+            'CREATE INDEX post_tags_tag_id_post_id_idx ON posts_post_tags (tag_id) INCLUDE (post_id);',
+            reverse_sql='DROP INDEX post_tags_tag_id_post_id_idx;',
+        ),
+    ]
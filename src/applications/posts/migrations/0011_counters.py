@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:38
+
+from django.db import migrations, models
+
+# Counts of the existing rows; from here on the signals maintain them.
+BACKFILL_COUNTERS = """
+UPDATE posts_post SET comment_count = counts.count
+FROM (SELECT post_id, COUNT(*) AS count FROM comments_comment GROUP BY post_id) AS counts
+WHERE counts.post_id = posts_post.id;
+
+UPDATE authors_author SET post_count = counts.count
+FROM (SELECT author_id, COUNT(*) AS count FROM posts_post WHERE moderation_status = 'published'
+      GROUP BY author_id) AS counts
+WHERE counts.author_id = authors_author.id;
+
+UPDATE categories_category SET post_count = counts.count
+FROM (SELECT category_id, COUNT(*) AS count FROM posts_post WHERE moderation_status = 'published'
+      GROUP BY category_id) AS counts
+WHERE counts.category_id = categories_category.id;
+
+UPDATE tags_tag SET post_count = counts.count
+FROM (SELECT links.tag_id, COUNT(*) AS count FROM posts_post_tags AS links
+      JOIN posts_post ON posts_post.id = links.post_id AND posts_post.moderation_status = 'published'
+      GROUP BY links.tag_id) AS counts
+WHERE counts.tag_id = tags_tag.id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authors', '0003_counters'),
+        ('categories', '0004_counters'),
+        ('comments', '0003_updated'),
+        ('posts', '0010_updated'),
+        ('tags', '0004_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-comment_count', '-id'], name='post_comment_count_id_idx'),
+        ),
+        migrations.RunSQL(BACKFILL_COUNTERS, reverse_sql=migrations.RunSQL.noop),
+    ]
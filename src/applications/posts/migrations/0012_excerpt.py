@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:09
+
+import django.db.models.functions.text
+import django.db.models.lookups
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(django.db.models.lookups.LessThanOrEqual(django.db.models.functions.text.Length('body'), 300), then='body'), default=django.db.models.functions.text.Concat(models.Func(django.db.models.functions.text.Left('body', 299), models.Value('\\s+\\S*$'), models.Value(''), function='REGEXP_REPLACE'), models.Value('…')), output_field=models.TextField()), output_field=models.TextField()),
+        ),
+    ]
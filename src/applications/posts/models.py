@@ -1,13 +1,137 @@
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db import models, transaction
+from django.db.models import Case, Func, Q, Value, When
+from django.db.models.functions import Concat, Left, Length
+from django.db.models.lookups import LessThanOrEqual
+from django.utils import timezone
+
 from applications.authors.models import Author
 from applications.categories.models import Category
+from applications.common.counters import CounterFieldsMixin
 from applications.tags.models import Tag
+from .toxicity_model import aggregate_toxicity, aspects_as_dict
+
+# Text search configuration created in migration 0007: the russian config with
+# latin words stemmed as english, since posts mix both languages.
+SEARCH_CONFIG = 'ru_en'
+
+# Post.excerpt: the first EXCERPT_LENGTH characters of the body, cut back to
+# a word boundary and ended with an ellipsis when the body is longer.
+EXCERPT_LENGTH = 300
+
+
+def excerpt_expression(length=EXCERPT_LENGTH):
+    trimmed = Func(Left('body', length - 1), Value(r'\s+\S*$'), Value(''), function='REGEXP_REPLACE')
+    return Case(
+        When(LessThanOrEqual(Length('body'), length), then='body'),
+        default=Concat(trimmed, Value('…')),
+        output_field=models.TextField(),
+    )
+
 
+class PostQuerySet(models.QuerySet):
+
+    def visible_to(self, user):
+        """Published posts, and the user's own posts in any moderation status."""
+        visible = Q(moderation_status=Post.ModerationStatus.PUBLISHED)
+        if user is not None and user.is_authenticated:
+            visible |= Q(author__user=user)
+        return self.filter(visible)
+
+
+class Post(CounterFieldsMixin, models.Model):
+
+    class ModerationStatus(models.TextChoices):
+        PENDING = 'pending'
+        PUBLISHED = 'published'
+        REJECTED = 'rejected'
 
-class Post(models.Model):
     header = models.CharField(max_length=200)
     body = models.CharField(max_length=10000)
     date_posted = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
     author = models.ForeignKey(Author, on_delete=models.CASCADE, related_name="posts")
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name="posts")
     tags = models.ManyToManyField(Tag, related_name='posts', blank=True)
+    moderation_status = models.CharField(max_length=20, choices=ModerationStatus.choices,
+                                         default=ModerationStatus.PUBLISHED)
+    toxicity = models.FloatField(null=True, blank=True, db_index=True)
+    toxicity_aspects = models.JSONField(null=True, blank=True)
+    # Maintained by the signals in signals.py, repaired by the recount command.
+    comment_count = models.PositiveIntegerField(default=0)
+    counter_fields = ('comment_count',)
+    search_vector = models.GeneratedField(
+        expression=SearchVector('header', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('body', weight='B', config=SEARCH_CONFIG),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+    # Shown by the post list instead of the body; computed by the database on every write.
+    excerpt = models.GeneratedField(
+        expression=excerpt_expression(),
+        output_field=models.TextField(),
+        db_persist=True,
+    )
+
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the post list.
+            models.Index(fields=['-date_posted', '-id'], name='post_date_posted_id_idx'),
+            # Author and category filters on the list, in its default order.
+            models.Index(fields=['author', '-date_posted', '-id'], name='post_author_date_posted_idx'),
+            models.Index(fields=['category', '-date_posted', '-id'], name='post_category_date_posted_idx'),
+            # ?ordering=-comment_count, the most discussed posts.
+            models.Index(fields=['-comment_count', '-id'], name='post_comment_count_id_idx'),
+            GinIndex(fields=['search_vector'], name='post_search_vector_idx'),
+            # Typeahead; created by migration 0008 only where pg_trgm is available.
+            GinIndex(fields=['header'], opclasses=['gin_trgm_ops'], name='post_header_trgm_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        # The counters updated by post_save must commit or roll back with the post.
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+        if not adding:
+            # An INSERT returns the generated columns, an UPDATE does not: reload them on access.
+            for field in self._meta.concrete_fields:
+                if field.generated:
+                    self.__dict__.pop(field.attname, None)
+
+    def set_toxicity(self, aspects):
+        self.toxicity = aggregate_toxicity(aspects)
+        self.toxicity_aspects = aspects_as_dict(aspects)
+        # bulk_update() skips auto_now, and the conditional GET validators rely on it.
+        self.updated = timezone.now()
+
+
+class ToxicityScore(models.Model):
+    """Persistent tier of the toxicity score cache, shared by all workers."""
+    text_hash = models.CharField(max_length=64)
+    model_version = models.CharField(max_length=200)
+    score = models.FloatField()
+    aspects = models.JSONField(default=list)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['text_hash', 'model_version'], name='unique_toxicity_score'),
+        ]
+
+
+class ModerationJob(models.Model):
+    """A post waiting for its toxicity check, claimed by workers with SKIP LOCKED."""
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, related_name='moderation_job')
+    created = models.DateTimeField(auto_now_add=True)
+
+
+class RemoderationCheckpoint(models.Model):
+    """Last id processed by a `remoderate` run, so an interrupted run can resume."""
+    name = models.CharField(max_length=100, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    processed = models.BigIntegerField(default=0)
+    changed = models.BigIntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
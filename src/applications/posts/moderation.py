@@ -0,0 +1,123 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.functions import Mod
+from django.utils import timezone
+
+from applications.common import metrics
+from .counters import count_status_changes
+from .models import ModerationJob, Post, RemoderationCheckpoint
+from .scoring import toxicity_aspects_many
+from .signals import invalidate_posts
+
+logger = logging.getLogger(__name__)
+
+processed_jobs = metrics.counter('moderation_jobs_processed_total')
+rejected_posts = metrics.counter('moderation_posts_rejected_total')
+queue_lag = metrics.histogram('moderation_queue_lag_seconds')
+
+
+def post_text(post):
+    return f"{post.header}\n{post.body}"
+
+
+def enqueue_post(post):
+    """Mark the post as pending and queue its toxicity check."""
+    with transaction.atomic():
+        if post.moderation_status != Post.ModerationStatus.PENDING:
+            post.moderation_status = Post.ModerationStatus.PENDING
+            post.save(update_fields=['moderation_status', 'updated'])
+        ModerationJob.objects.get_or_create(post=post)
+
+
+def process_moderation_batch(batch_size=64):
+    """
+    Claim up to batch_size jobs, score their posts in one batch and publish or
+    reject them. Jobs locked by other workers are skipped, so any number of
+    workers can drain the queue concurrently. Returns the number of jobs done.
+    """
+    with transaction.atomic():
+        jobs = list(
+            ModerationJob.objects.select_for_update(skip_locked=True, of=('self',))
+            .select_related('post')
+            .order_by('id')[:batch_size]
+        )
+        if not jobs:
+            return 0
+
+        posts = [job.post for job in jobs]
+        published_before = {post.pk for post in posts if post.moderation_status == Post.ModerationStatus.PUBLISHED}
+        for post, aspects in zip(posts, toxicity_aspects_many([post_text(post) for post in posts])):
+            post.set_toxicity(aspects)
+            if post.toxicity > settings.TOXICITY_THRESHOLD:
+                post.moderation_status = Post.ModerationStatus.REJECTED
+                rejected_posts.inc()
+            else:
+                post.moderation_status = Post.ModerationStatus.PUBLISHED
+        Post.objects.bulk_update(posts, ['moderation_status', 'toxicity', 'toxicity_aspects', 'updated'])
+        count_status_changes(posts, published_before)
+        ModerationJob.objects.filter(id__in=[job.id for job in jobs]).delete()
+        invalidate_posts(post.id for post in posts)
+
+    now = timezone.now()
+    for job in jobs:
+        queue_lag.observe((now - job.created).total_seconds())
+    processed_jobs.inc(len(jobs))
+    return len(jobs)
+
+
+def _remoderate_batch(posts, threshold, checkpoint):
+    changed = 0
+    published_before = {post.pk for post in posts if post.moderation_status == Post.ModerationStatus.PUBLISHED}
+    for post, aspects in zip(posts, toxicity_aspects_many([post_text(post) for post in posts])):
+        post.set_toxicity(aspects)
+        moderation_status = (Post.ModerationStatus.REJECTED if post.toxicity > threshold
+                             else Post.ModerationStatus.PUBLISHED)
+        if post.moderation_status != moderation_status:
+            post.moderation_status = moderation_status
+            changed += 1
+    with transaction.atomic():
+        # Every post gets its fresh scores, not only the ones whose status changed.
+        Post.objects.bulk_update(posts, ['moderation_status', 'toxicity', 'toxicity_aspects', 'updated'])
+        count_status_changes(posts, published_before)
+        invalidate_posts(post.id for post in posts)
+        checkpoint.last_id = posts[-1].id
+        checkpoint.processed += len(posts)
+        checkpoint.changed += changed
+        checkpoint.save()
+
+
+def remoderate_posts(batch_size=512, threshold=None, shard=0, shards=1, reset=False, chunk_size=2000):
+    """
+    Re-score published and rejected posts against the current model and
+    threshold. Rows are streamed in id order from a server-side cursor and
+    scored batch_size at a time; each batch is written back with bulk_update
+    in its own short transaction together with the checkpoint, so a new run
+    resumes after the last finished batch. With shards > 1 only ids with
+    id % shards == shard are processed.
+    """
+    threshold = settings.TOXICITY_THRESHOLD if threshold is None else threshold
+    checkpoint, _ = RemoderationCheckpoint.objects.get_or_create(name=f'posts:{shard}/{shards}')
+    if reset:
+        checkpoint.last_id = checkpoint.processed = checkpoint.changed = 0
+        checkpoint.save()
+
+    queryset = (
+        Post.objects.filter(id__gt=checkpoint.last_id,
+                            moderation_status__in=[Post.ModerationStatus.PUBLISHED, Post.ModerationStatus.REJECTED])
+        .only('id', 'header', 'body', 'moderation_status', 'author', 'category')
+        .order_by('id')
+    )
+    if shards > 1:
+        queryset = queryset.alias(shard=Mod('id', shards)).filter(shard=shard)
+
+    batch = []
+    for post in queryset.iterator(chunk_size=chunk_size):
+        batch.append(post)
+        if len(batch) >= batch_size:
+            _remoderate_batch(batch, threshold, checkpoint)
+            batch = []
+    if batch:
+        _remoderate_batch(batch, threshold, checkpoint)
+    return checkpoint
@@ -0,0 +1,174 @@
+from base64 import b64decode, b64encode
+from urllib import parse
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, _positive_int, _reverse_ordering
+from rest_framework.utils.urls import replace_query_param
+
+
+class PostCursorPagination(CursorPagination):
+    """
+    Keyset pagination over the view's ordering with the primary key as the
+    tie-breaker. Cursors hold the (ordering value, id) of the boundary row, so
+    every page is a `WHERE (value, id) < (...) ORDER BY value, id LIMIT n`
+    index range scan, whatever the depth. Only the first ?ordering= field is
+    used; nullable fields follow PostgreSQL's NULLS LAST/FIRST placement.
+    """
+    ordering = ('-date_posted', '-id')
+    page_size = settings.POSTS_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.POSTS_MAX_PAGE_SIZE
+
+    def get_ordering(self, request, queryset, view):
+        primary = super().get_ordering(request, queryset, view)[0]
+        if primary.lstrip('-') in ('id', 'pk'):
+            return (primary,)
+        return (primary, '-id' if primary.startswith('-') else 'id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.model = queryset.model
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        current_position = None if self.cursor is None else self.cursor.position
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if current_position is not None:
+            queryset = queryset.filter(self.keyset_filter(queryset.model, current_position, reverse))
+
+        # Positions are unique, so unlike the base class no offset is ever needed.
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        following_position = None
+        if len(results) > len(self.page):
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None
+            self.has_previous = following_position is not None
+            self.next_position = current_position
+            self.previous_position = following_position
+        else:
+            self.has_next = following_position is not None
+            self.has_previous = current_position is not None
+            self.next_position = following_position
+            self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def keyset_filter(self, model, position, reverse):
+        """Rows strictly after position in the (possibly reversed) ordering."""
+        value, pk = position
+        order = self.ordering[0]
+        descending = order.startswith('-') != reverse
+        lookup = 'lt' if descending else 'gt'
+        after_pk = Q(**{f'pk__{lookup}': pk})
+        field_name = order.lstrip('-')
+        if field_name in ('id', 'pk'):
+            return after_pk
+
+        try:
+            nullable = model._meta.get_field(field_name).null
+        except FieldDoesNotExist:
+            # Annotations, such as the search rank.
+            nullable = False
+        if value is None:
+            # NULLs sort last ascending and first descending.
+            after = Q(**{f'{field_name}__isnull': True}) & after_pk
+            if descending:
+                after |= Q(**{f'{field_name}__isnull': False})
+            return after
+        # The redundant inclusive bound gives the planner an index range to scan.
+        after = Q(**{f'{field_name}__{lookup}e': value}) & (
+            Q(**{f'{field_name}__{lookup}': value}) | (Q(**{field_name: value}) & after_pk)
+        )
+        if nullable and not descending:
+            after |= Q(**{f'{field_name}__isnull': True})
+        return after
+
+    def link_after(self, url, instance):
+        """Link to the page after instance in the default ordering, for responses embedding the first page."""
+        self.base_url = url
+        position = self._get_position_from_instance(instance, self.ordering)
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        position = self._get_position_from_instance(self.page[-1], self.ordering) if self.page else self.next_position
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        position = self._get_position_from_instance(self.page[0], self.ordering) if self.page else self.previous_position
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            tokens = parse.parse_qs(b64decode(encoded.encode('ascii')).decode('ascii'), keep_blank_values=True)
+            reverse = bool(int(tokens.get('r', ['0'])[0]))
+            position = None
+            if 'i' in tokens:
+                position = (tokens.get('p', [None])[0], _positive_int(tokens['i'][0]))
+                if position[0] is not None:
+                    self.parse_position_value(position[0])
+        except (TypeError, ValueError, UnicodeDecodeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return Cursor(offset=0, reverse=reverse, position=position)
+
+    def parse_position_value(self, value):
+        """The cursor's ordering value as its field reads it; raises ValueError or ValidationError if invalid."""
+        field_name = self.ordering[0].lstrip('-')
+        if field_name in ('id', 'pk'):
+            return _positive_int(value)
+        try:
+            field = self.model._meta.get_field(field_name)
+        except FieldDoesNotExist:
+            # Annotations, such as the search rank.
+            return float(value)
+        return field.to_python(value)
+
+    def encode_cursor(self, cursor):
+        tokens = {}
+        if cursor.reverse:
+            tokens['r'] = '1'
+        if cursor.position is not None:
+            value, pk = cursor.position
+            if value is not None:
+                tokens['p'] = value
+            tokens['i'] = str(pk)
+        encoded = b64encode(parse.urlencode(tokens).encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def _get_position_from_instance(self, instance, ordering):
+        field_name = ordering[0].lstrip('-')
+        if isinstance(instance, dict):
+            value, pk = instance[field_name], instance['id']
+        else:
+            value, pk = getattr(instance, field_name), instance.pk
+        return (None if value is None else str(value), pk)
+
+
+class PostCommentCursorPagination(PostCursorPagination):
+    """Comments of a post, newest first, keyset paginated on (date, id)."""
+    ordering = ('-date', '-id')
+    page_size = settings.POSTS_COMMENTS_PAGE_SIZE
@@ -0,0 +1,144 @@
+"""
+Response cache for PostViewSet reads.
+
+Cached responses are keyed by a version token: one shared by every list
+response and one per post for its detail response. A write replaces the
+tokens it affects (see signals.py), which orphans the stale entries instead of
+deleting them one by one. On a miss only one worker recomputes a key while the
+others wait for its result.
+"""
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+from applications.common import metrics
+from applications.common.conditional import lookup_value
+
+LIST_VERSION_KEY = 'posts:version:list'
+
+hits = metrics.counter('post_response_cache_hits_total')
+misses = metrics.counter('post_response_cache_misses_total')
+coalesced = metrics.counter('post_response_cache_coalesced_total')
+invalidations = metrics.counter('post_response_cache_invalidations_total')
+
+
+def _cache():
+    return caches[settings.POSTS_CACHE_ALIAS]
+
+
+def post_version_key(pk):
+    return f'posts:version:post:{pk}'
+
+
+def _version(key):
+    version = _cache().get(key)
+    if version is None:
+        _cache().add(key, uuid.uuid4().hex, None)
+        version = _cache().get(key)
+    return version
+
+
+def invalidate_list():
+    invalidations.inc()
+    _cache().set(LIST_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def invalidate_details(pks):
+    pks = set(pks)
+    if pks:
+        invalidations.inc(len(pks))
+        _cache().set_many({post_version_key(pk): uuid.uuid4().hex for pk in pks}, None)
+
+
+def invalidate_posts(pks):
+    """Evict the detail responses of the given posts and every list response."""
+    invalidate_details(pks)
+    invalidate_list()
+
+
+def response_key(request, scope, version):
+    """
+    Key of a response: version, viewer (visibility differs per author), and
+    the scheme and host of its absolute URLs, path and sorted query.
+    """
+    viewer = f'user{request.user.pk}' if request.user.is_authenticated else 'anon'
+    query = sorted(request.query_params.lists())
+    digest = hashlib.sha256(repr((request.scheme, request.get_host(), request.path, query)).encode()).hexdigest()
+    return f'posts:response:{scope}:{version}:{viewer}:{digest}'
+
+
+def get_or_compute(key, compute):
+    """
+    Cached value of key, or compute() stored under it. Concurrent misses of the
+    same key are coalesced: the worker that takes the key's lock computes, the
+    others poll for its result until POSTS_CACHE_LOCK_TIMEOUT_MS and only then
+    compute on their own. compute() may return None for uncacheable results.
+    """
+    cache = _cache()
+    value = cache.get(key)
+    if value is not None:
+        hits.inc()
+        return value
+    misses.inc()
+
+    lock_key = f'{key}:lock'
+    lock_timeout = settings.POSTS_CACHE_LOCK_TIMEOUT_MS / 1000
+    if cache.add(lock_key, 1, max(1, int(lock_timeout + 1))):
+        try:
+            value = compute()
+            if value is not None:
+                cache.set(key, value, settings.POSTS_CACHE_TIMEOUT)
+            return value
+        finally:
+            cache.delete(lock_key)
+
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        time.sleep(settings.POSTS_CACHE_POLL_INTERVAL_MS / 1000)
+        value = cache.get(key)
+        if value is not None:
+            coalesced.inc()
+            return value
+        if cache.get(lock_key) is None:
+            # The computing worker failed or its result was not cacheable.
+            break
+    return compute()
+
+
+class CachedReadMixin:
+    """Serves list and retrieve from the post response cache."""
+
+    def cached_validators(self, request, scope, version_key, compute):
+        """Conditional GET validators, cached and evicted together with the response they describe."""
+        if not settings.POSTS_CACHE_ENABLED:
+            return compute()
+        return get_or_compute(response_key(request, f'{scope}-validators', _version(version_key)), compute)
+
+    def cached_response(self, request, scope, version_key, respond):
+        if not settings.POSTS_CACHE_ENABLED:
+            return respond()
+        response = None
+
+        def compute():
+            nonlocal response
+            response = respond()
+            if response.status_code != 200:
+                return None
+            return response.data
+
+        data = get_or_compute(response_key(request, scope, _version(version_key)), compute)
+        if response is not None:
+            return response
+        return Response(data)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, 'list', LIST_VERSION_KEY,
+                                    lambda: super(CachedReadMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, 'detail', post_version_key(lookup_value(self, kwargs)),
+                                    lambda: super(CachedReadMixin, self).retrieve(request, *args, **kwargs))
@@ -0,0 +1,187 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.response import Response
+
+from applications.common import metrics
+from .toxicity_batcher import get_toxicity_batcher
+from .toxicity_cache import get_toxicity_cache
+from .toxicity_model import aggregate_toxicity, get_toxicity_model, is_ready
+from .toxicity_service import ToxicityServiceUnavailable, get_toxicity_service_client
+
+logger = logging.getLogger(__name__)
+
+
+class ToxicityOverloaded(Exception):
+    """The toxicity check was shed: too many checks in flight or the deadline passed."""
+
+    def __init__(self, reason):
+        super().__init__(f'Toxicity check shed: {reason}')
+        self.reason = reason
+
+
+def _aspects_in_process(text, timeout=None):
+    if settings.TOXICITY_BATCHING_ENABLED:
+        return get_toxicity_batcher().score(text, timeout)
+    # A forward pass cannot be interrupted, so the deadline only applies to batched and service scoring.
+    return [float(value) for value in get_toxicity_model().text2toxicity(text, aggregate=False)]
+
+
+def _aspects_uncached(text, timeout=None):
+    if settings.TOXICITY_SERVICE_SOCKET:
+        try:
+            return get_toxicity_service_client().aspects(text, timeout)
+        except ToxicityServiceUnavailable as exc:
+            if not settings.TOXICITY_SERVICE_FALLBACK or (timeout is not None and isinstance(exc, TimeoutError)):
+                raise
+            logger.warning('Toxicity service unavailable, scoring in process', exc_info=True)
+    return _aspects_in_process(text, timeout)
+
+
+class _ContentTypeMetrics:
+    """Scorer throughput and latency of one kind of content (posts, comments)."""
+
+    def __init__(self, content_type):
+        self.checks = metrics.counter(f'toxicity_{content_type}_checks_total')
+        self.texts = metrics.counter(f'toxicity_{content_type}_texts_total')
+        self.latency = metrics.histogram(f'toxicity_{content_type}_check_seconds')
+        self.shed = metrics.counter(f'toxicity_{content_type}_shed_total')
+
+    def observe(self, texts, started):
+        self.checks.inc()
+        self.texts.inc(texts)
+        self.latency.observe(time.perf_counter() - started)
+
+
+_content_type_metrics = {}
+
+
+def content_type_metrics(content_type):
+    if content_type not in _content_type_metrics:
+        _content_type_metrics[content_type] = _ContentTypeMetrics(content_type)
+    return _content_type_metrics[content_type]
+
+
+def toxicity_aspects(text, timeout=None, content_type='post'):
+    """
+    Toxicity aspect vector of a single text (see TOXICITY_ASPECTS). Previously
+    seen texts are answered from the score cache. Others are scored by the
+    shared toxicity service when TOXICITY_SERVICE_SOCKET is set, otherwise (or
+    as a fallback) by the model loaded in this process, micro-batched with
+    concurrent callers of every content type when enabled. Raises TimeoutError
+    if the result is not ready within timeout seconds.
+    """
+    started = time.perf_counter()
+    cache = get_toxicity_cache() if settings.TOXICITY_CACHE_ENABLED else None
+    aspects = cache.get(text) if cache is not None else None
+    if aspects is None:
+        aspects = _aspects_uncached(text, timeout)
+        if cache is not None:
+            cache.set(text, aspects)
+    content_type_metrics(content_type).observe(1, started)
+    return aspects
+
+
+def score_toxicity(text, timeout=None, content_type='post'):
+    """Aggregate toxicity of a single text."""
+    return aggregate_toxicity(toxicity_aspects(text, timeout, content_type))
+
+
+def _aspects_many_uncached(texts):
+    if settings.TOXICITY_SERVICE_SOCKET:
+        try:
+            return get_toxicity_service_client().aspects_many(texts)
+        except ToxicityServiceUnavailable:
+            if not settings.TOXICITY_SERVICE_FALLBACK:
+                raise
+            logger.warning('Toxicity service unavailable, scoring in process', exc_info=True)
+    aspects = get_toxicity_model().text2toxicity(texts, aggregate=False)
+    return [[float(value) for value in vector] for vector in aspects]
+
+
+def toxicity_aspects_many(texts, content_type='post'):
+    """Aspect vectors of many texts; cache misses are scored together as one batch."""
+    started = time.perf_counter()
+    cache = get_toxicity_cache() if settings.TOXICITY_CACHE_ENABLED else None
+    results = [cache.get(text) if cache is not None else None for text in texts]
+    missing = [index for index, aspects in enumerate(results) if aspects is None]
+    if missing:
+        fresh = _aspects_many_uncached([texts[index] for index in missing])
+        for index, aspects in zip(missing, fresh):
+            results[index] = aspects
+            if cache is not None:
+                cache.set(texts[index], aspects)
+    content_type_metrics(content_type).observe(len(texts), started)
+    return results
+
+
+def score_toxicity_many(texts, content_type='post'):
+    return [aggregate_toxicity(aspects) for aspects in toxicity_aspects_many(texts, content_type)]
+
+
+shed_checks = metrics.counter('toxicity_shed_total')
+shed_by_concurrency = metrics.counter('toxicity_shed_concurrency_total')
+shed_by_deadline = metrics.counter('toxicity_shed_deadline_total')
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def _get_limiter():
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = threading.BoundedSemaphore(settings.TOXICITY_MAX_CONCURRENT)
+    return _limiter
+
+
+def toxicity_aspects_within_budget(text, content_type='post'):
+    """
+    toxicity_aspects() guarded by a per-process limit on checks in flight
+    (TOXICITY_MAX_CONCURRENT, waiting at most TOXICITY_QUEUE_TIMEOUT_MS for a
+    slot) and a scoring deadline (TOXICITY_DEADLINE_MS). Raises
+    ToxicityOverloaded when either is exceeded.
+    """
+    limiter = _get_limiter() if settings.TOXICITY_MAX_CONCURRENT else None
+    if limiter is not None and not limiter.acquire(timeout=settings.TOXICITY_QUEUE_TIMEOUT_MS / 1000):
+        shed_checks.inc()
+        shed_by_concurrency.inc()
+        content_type_metrics(content_type).shed.inc()
+        raise ToxicityOverloaded('concurrency')
+    try:
+        return toxicity_aspects(text, timeout=settings.TOXICITY_DEADLINE_MS / 1000 or None,
+                                content_type=content_type)
+    except TimeoutError:
+        shed_checks.inc()
+        shed_by_deadline.inc()
+        content_type_metrics(content_type).shed.inc()
+        raise ToxicityOverloaded('deadline')
+    finally:
+        if limiter is not None:
+            limiter.release()
+
+
+def overload_counter(policy):
+    """Checks shed under the given TOXICITY_OVERLOAD_POLICY."""
+    return metrics.counter(f'toxicity_shed_{policy}_total')
+
+
+def toxicity_error_response(exc=None):
+    """Refusal of new content: 503 with Retry-After when its check was shed (exc), 400 when it is toxic."""
+    if exc is not None:
+        return Response({'error': 'ToxicityCheckUnavailable',
+                         'message': f'Toxicity check is overloaded ({exc.reason}), retry later'},
+                        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        headers={'Retry-After': str(settings.TOXICITY_RETRY_AFTER)})
+    return Response({'error': 'ToxicityError', 'message': 'Toxicity check failed'},
+                    status=status.HTTP_400_BAD_REQUEST)
+
+
+def is_scoring_ready():
+    if settings.TOXICITY_SERVICE_SOCKET:
+        return get_toxicity_service_client().ping()
+    return is_ready()
@@ -1,8 +1,13 @@
+from django.conf import settings
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
+from rest_framework.reverse import reverse
 
+from applications.common.sparse import SparseFieldsMixin
 from applications.jwt_auth.models import User
 from applications.posts.models import Author
 from .models import Post
+from .pagination import PostCommentCursorPagination
 from ..categories.models import Category
 from ..comments.models import Comment
 from ..tags.models import Tag
@@ -44,20 +49,32 @@ class CommentSerializerForPost(serializers.ModelSerializer):
         fields = ['id', 'date', 'content', 'user']
 
 
-class PostSerializer(serializers.ModelSerializer):
-    author = AuthorSerializerForPost(read_only=True)
+class PostSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    author = serializers.PrimaryKeyRelatedField(read_only=True)
     category = serializers.PrimaryKeyRelatedField(
         queryset=Category.objects.all(), write_only=True
     )
-    category_details = CategorySerializerForPost(read_only=True, source="category")
-    tags = TagSerializerForPost(read_only=True, many=True)
-    comments = CommentSerializerForPost(read_only=True, many=True)
+    category_details = serializers.PrimaryKeyRelatedField(read_only=True, source="category")
+    tags = serializers.PrimaryKeyRelatedField(read_only=True, many=True)
+    comments = serializers.SerializerMethodField()
+    comments_next = serializers.SerializerMethodField()
+    excerpt = serializers.CharField(read_only=True)
+
+    expandable_fields = {
+        "author": lambda: AuthorSerializerForPost(read_only=True),
+        "category_details": lambda: CategorySerializerForPost(read_only=True, source="category"),
+        "tags": lambda: TagSerializerForPost(read_only=True, many=True),
+    }
 
     class Meta:
         model = Post
-        fields = '__all__'
+        exclude = ['search_vector', 'updated']
         extra_kwargs = {
             "date_posted": {"read_only": True},
+            "moderation_status": {"read_only": True},
+            "toxicity": {"read_only": True},
+            "toxicity_aspects": {"read_only": True},
+            "comment_count": {"read_only": True},
         }
 
     def create(self, validated_data):
@@ -66,18 +83,64 @@ class PostSerializer(serializers.ModelSerializer):
             validated_data["author"] = request.user.author_data
         return super().create(validated_data)
 
-
-class PostSerializerList(serializers.ModelSerializer):
-    author = AuthorSerializerForPost(read_only=True)
-    category = CategorySerializerForPost(read_only=True)
-    tags = TagSerializerForPost(read_only=True, many=True)
+    def latest_comments(self, post):
+        """The POSTS_DETAIL_COMMENTS latest comments and whether older ones exist."""
+        # One row more than embedded tells if there is a next page; the
+        # (post, -date, -id) index keeps this a short range scan however long the thread is.
+        if not hasattr(post, "_latest_comments"):
+            limit = settings.POSTS_DETAIL_COMMENTS
+            comments = list(post.comments.order_by("-date", "-id")[:limit + 1])
+            post._latest_comments = (comments[:limit], len(comments) > limit)
+        return post._latest_comments
+
+    @extend_schema_field(CommentSerializerForPost(many=True))
+    def get_comments(self, post):
+        comments, _ = self.latest_comments(post)
+        return CommentSerializerForPost(comments, many=True).data
+
+    @extend_schema_field(serializers.URLField(allow_null=True))
+    def get_comments_next(self, post):
+        """Link to the comments older than the embedded ones, on /api/posts/{id}/comments/."""
+        comments, more = self.latest_comments(post)
+        if not more:
+            return None
+        url = reverse("post-comments", args=[post.pk], request=self.context.get("request"))
+        return PostCommentCursorPagination().link_after(url, comments[-1]) if comments else url
+
+
+class PostSerializerList(SparseFieldsMixin, serializers.ModelSerializer):
+    author = serializers.PrimaryKeyRelatedField(read_only=True)
+    category = serializers.PrimaryKeyRelatedField(read_only=True)
+    tags = serializers.PrimaryKeyRelatedField(read_only=True, many=True)
+    excerpt = serializers.CharField(read_only=True)
+
+    expandable_fields = {
+        "author": lambda: AuthorSerializerForPost(read_only=True),
+        "category": lambda: CategorySerializerForPost(read_only=True),
+        "tags": lambda: TagSerializerForPost(read_only=True, many=True),
+    }
+    # Feeds show the excerpt; ?include=body adds the full text.
+    default_omit = ("body",)
 
     class Meta:
         model = Post
-        fields = "__all__"
+        exclude = ["search_vector", "updated"]
+        extra_kwargs = {
+            "moderation_status": {"read_only": True},
+            "toxicity": {"read_only": True},
+            "toxicity_aspects": {"read_only": True},
+            "comment_count": {"read_only": True},
+        }
 
     def create(self, validated_data):
         request = self.context.get("request")
         if request and hasattr(request, "user"):
             validated_data["author"] = request.user.author_data
         return super().create(validated_data)
+
+
+class PostSuggestionSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Post
+        fields = ['id', 'header']
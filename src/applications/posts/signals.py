@@ -0,0 +1,158 @@
+from types import SimpleNamespace
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from applications.authors.models import Author
+from applications.categories.models import Category
+from applications.comments.models import Comment
+from applications.tags.models import Tag
+from . import counters, response_cache
+from .models import Post
+
+
+def _now_and_on_commit(invalidate, pks):
+    # Invalidate right away and again after commit: a read running in between
+    # could otherwise cache pre-commit data under the new version.
+    pks = list(pks)
+    invalidate(pks)
+    transaction.on_commit(lambda: invalidate(pks))
+
+
+def invalidate_posts(pks):
+    _now_and_on_commit(response_cache.invalidate_posts, pks)
+
+
+@receiver([post_save, post_delete], sender=Post)
+def post_changed(sender, instance, **kwargs):
+    invalidate_posts([instance.pk])
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def post_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        pks = [instance.pk]
+    else:
+        # tag.posts.clear() does not report the posts it detached, only lists are evicted then.
+        pks = pk_set or []
+    # Tags are part of the post, so a tag change is an update for its validators.
+    Post.objects.filter(pk__in=pks).update(updated=timezone.now())
+    invalidate_posts(pks)
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    # Lists show the comment count, so they are evicted too.
+    invalidate_posts([instance.post_id])
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def tag_changed(sender, instance, created=False, **kwargs):
+    if not created:
+        invalidate_posts(Post.tags.through.objects.filter(tag_id=instance.pk).values_list('post_id', flat=True))
+
+
+@receiver([post_save, post_delete], sender=Category)
+def category_changed(sender, instance, created=False, **kwargs):
+    if not created:
+        invalidate_posts(Post.objects.filter(category_id=instance.pk).values_list('pk', flat=True))
+
+
+@receiver([post_save, post_delete], sender=Author)
+def author_changed(sender, instance, created=False, **kwargs):
+    # Also covers changes of the author's user: saving a User saves its Author.
+    if not created:
+        invalidate_posts(Post.objects.filter(author_id=instance.pk).values_list('pk', flat=True))
+
+
+def _counted_state(post):
+    """What a post adds to the post counters: nothing unless it is published."""
+    if post.moderation_status != Post.ModerationStatus.PUBLISHED:
+        return None
+    return SimpleNamespace(pk=post.pk, author_id=post.author_id, category_id=post.category_id)
+
+
+@receiver(pre_save, sender=Post)
+def remember_counted_post(sender, instance, raw=False, **kwargs):
+    instance._counted_before = None
+    if not (raw or instance._state.adding):
+        previous = Post.objects.filter(pk=instance.pk).only('moderation_status', 'author', 'category').first()
+        instance._counted_before = previous and _counted_state(previous)
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, raw=False, **kwargs):
+    before, after = getattr(instance, '_counted_before', None), _counted_state(instance)
+    if raw or before == after:
+        return
+    if before:
+        counters.count_posts([before], -1)
+    if after:
+        counters.count_posts([after], 1)
+
+
+@receiver(pre_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    # Before the delete, while the post's tags are still linked.
+    if _counted_state(instance):
+        counters.count_posts([instance], -1)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def count_post_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    published = Post.ModerationStatus.PUBLISHED
+    links = Post.tags.through.objects
+    deltas = {}
+    if action == 'post_add':
+        # pk_set only holds the newly linked objects here.
+        if reverse:
+            deltas = {instance.pk: Post.objects.filter(pk__in=pk_set, moderation_status=published).count()}
+        elif instance.moderation_status == published:
+            deltas = dict.fromkeys(pk_set, 1)
+    elif action in ('pre_remove', 'pre_clear'):
+        # Unlike on add, pk_set may hold objects that are not linked.
+        if reverse:
+            removed = links.filter(tag_id=instance.pk, post__moderation_status=published)
+            if action == 'pre_remove':
+                removed = removed.filter(post_id__in=pk_set)
+            deltas = {instance.pk: -removed.count()}
+        elif instance.moderation_status == published:
+            removed = links.filter(post_id=instance.pk)
+            if action == 'pre_remove':
+                removed = removed.filter(tag_id__in=pk_set)
+            deltas = dict.fromkeys(removed.values_list('tag_id', flat=True), -1)
+    counters.increment(Tag, 'post_count', deltas)
+
+
+@receiver(pre_save, sender=Comment)
+def remember_comment_post(sender, instance, raw=False, **kwargs):
+    instance._post_before = None
+    if not (raw or instance._state.adding):
+        instance._post_before = Comment.objects.filter(pk=instance.pk).values_list('post_id', flat=True).first()
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, raw=False, **kwargs):
+    before = getattr(instance, '_post_before', None)
+    if raw:
+        return
+    if not created and before == instance.post_id:
+        # An edit changes the post detail, which embeds the latest comments.
+        Post.objects.filter(pk=instance.post_id).update(updated=timezone.now())
+        return
+    deltas = {instance.post_id: 1}
+    if before is not None:
+        deltas[before] = -1
+    counters.increment(Post, 'comment_count', deltas)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, origin=None, **kwargs):
+    # Comments cascading from a deletion of posts (an instance or a queryset) go with their post.
+    if isinstance(origin, Post) or getattr(origin, 'model', None) is Post:
+        return
+    counters.increment(Post, 'comment_count', {instance.post_id: -1})
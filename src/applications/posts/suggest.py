@@ -0,0 +1,69 @@
+import hashlib
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import Q
+
+from applications.common import metrics
+from .models import Post
+
+_WHITESPACE = re.compile(r'\s+')
+
+cache_hits = metrics.counter('post_suggest_cache_hits_total')
+cache_misses = metrics.counter('post_suggest_cache_misses_total')
+
+_trigram_available = None
+
+
+def trigram_available():
+    """Whether pg_trgm is installed in the database; checked once per process."""
+    global _trigram_available
+    if _trigram_available is None:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _trigram_available = cursor.fetchone() is not None
+    return _trigram_available
+
+
+def normalize_query(query):
+    return _WHITESPACE.sub(' ', query).strip().lower()
+
+
+def find_suggestions(query, limit):
+    """
+    Published posts whose header best matches query, as {id, header} dicts.
+    With pg_trgm the header GIN trigram index serves both substring and
+    word-similarity matches, so misspelled and partial words are found too;
+    without it only substring matches are returned.
+    """
+    posts = Post.objects.filter(moderation_status=Post.ModerationStatus.PUBLISHED)
+    if trigram_available():
+        posts = (
+            posts.filter(Q(header__icontains=query) | Q(header__trigram_word_similar=query))
+            .annotate(similarity=TrigramWordSimilarity(query, 'header'))
+            .order_by('-similarity', '-id')
+        )
+    else:
+        posts = posts.filter(header__icontains=query).order_by('-id')
+    return list(posts.values('id', 'header')[:limit])
+
+
+def suggest(query, limit=None):
+    """find_suggestions() for the normalized query, cached in the 'suggest' cache."""
+    query = normalize_query(query)
+    limit = min(limit or settings.POSTS_SUGGEST_LIMIT, settings.POSTS_SUGGEST_LIMIT)
+    if len(query) < settings.POSTS_SUGGEST_MIN_LENGTH:
+        return []
+    cache = caches['suggest']
+    key = f'suggest:{limit}:{hashlib.sha256(query.encode()).hexdigest()}'
+    suggestions = cache.get(key)
+    if suggestions is None:
+        cache_misses.inc()
+        suggestions = find_suggestions(query, limit)
+        cache.set(key, suggestions)
+    else:
+        cache_hits.inc()
+    return suggestions
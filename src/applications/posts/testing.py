@@ -0,0 +1,35 @@
+"""
+Test support shared by the test modules of the apps: a fake toxicity model
+standing in for the checkpoint.
+"""
+from unittest import mock
+
+from . import toxicity_model
+
+
+class FakeToxicityModel:
+    """Подменяет ToxicityModel в тестах: токсичным считается текст со словом 'toxic'"""
+    model_checkpoint = 'fake/toxicity'
+
+    def __init__(self, **kwargs):
+        self.calls = []
+
+    @staticmethod
+    def score(text, aggregate):
+        toxic = 1.0 if 'toxic' in text.lower() else 0.0
+        return toxic if aggregate else [1.0 - toxic, toxic, 0.0, 0.0, 0.0]
+
+    def text2toxicity(self, text, aggregate=True):
+        self.calls.append(text)
+        if isinstance(text, str):
+            return self.score(text, aggregate)
+        return [self.score(item, aggregate) for item in text]
+
+
+def patch_toxicity_model(test_case, model=None):
+    """Подставляет фейковую модель вместо загрузки чекпойнта"""
+    model = model or FakeToxicityModel()
+    patcher = mock.patch.object(toxicity_model, '_toxicity_model', model)
+    patcher.start()
+    test_case.addCleanup(patcher.stop)
+    return model
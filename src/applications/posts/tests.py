@@ -1,12 +1,47 @@
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+from base64 import b64encode
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.reverse import reverse
 from rest_framework.test import APITestCase
 
 from applications.authors.models import Author
 from applications.categories.models import Category
+from applications.common import compression, renderers
+from applications.comments.models import Comment
 from applications.jwt_auth.models import User
 from applications.tags.models import Tag
-from .models import Post
+from . import toxicity_cache, toxicity_model
+from .models import EXCERPT_LENGTH, ModerationJob, Post, RemoderationCheckpoint, ToxicityScore
+from .filter import PostSearchFilter
+from .moderation import enqueue_post, process_moderation_batch, remoderate_posts
+from .pagination import PostCursorPagination
+from .response_cache import get_or_compute
+from .serializer import AuthorSerializerForPost, PostSerializer, PostSerializerList, TagSerializerForPost
+from .suggest import suggest as suggest_posts, trigram_available
+from . import scoring
+from .scoring import score_toxicity
+from .testing import FakeToxicityModel, patch_toxicity_model
+from .toxicity_backends import PARITY_CORPUS, ToxicityBackendParityError
+from .toxicity_batcher import ToxicityBatcher
+from .toxicity_cache import ToxicityScoreCache, text_hash
+from .toxicity_model import TOXICITY_ASPECTS, ToxicityModel
+from .toxicity_stand_in import build_stand_in_checkpoint
+from .toxicity_service import ToxicityServiceClient, ToxicityServiceServer, ToxicityServiceUnavailable
 
 
 class PostAPITestCase(APITestCase):
@@ -40,12 +75,16 @@ class PostAPITestCase(APITestCase):
         cls.list_url = reverse("post-list")
         cls.detail_url = reverse("post-detail", args=[cls.post.id])
 
+    def setUp(self):
+        self.toxicity_model = patch_toxicity_model(self)
+        caches["default"].clear()
+
     def test_list_posts(self):
         """Тест получения списка постов"""
         response = self.client.get(self.list_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.json()), 1)
-        self.assertEqual(response.json()[0]["header"], self.post.header)
+        self.assertEqual(len(response.json()["results"]), 1)
+        self.assertEqual(response.json()["results"][0]["header"], self.post.header)
 
     def test_retrieve_post(self):
         """Тест получения одного поста"""
@@ -111,13 +150,13 @@ class PostAPITestCase(APITestCase):
         """Тест фильтрации постов по тегу"""
         response = self.client.get(f"{self.list_url}?tag_ids={self.tag1.id}")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.json()), 1)
+        self.assertEqual(len(response.json()["results"]), 1)
 
     def test_search_posts(self):
         """Тест поиска постов по заголовку и тексту"""
         response = self.client.get(f"{self.list_url}?search=Test")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.json()), 1)
+        self.assertEqual(len(response.json()["results"]), 1)
 
     def test_ordering_posts(self):
         """Тест сортировки постов"""
@@ -129,4 +168,1602 @@ class PostAPITestCase(APITestCase):
         )
         response = self.client.get(f"{self.list_url}?ordering=-date_posted")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.json()[0]["header"], "Older Post")
+        self.assertEqual(response.json()["results"][0]["header"], "Older Post")
+
+    def add_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(header=f"Post {i}", body="Body", author=self.other_author,
+                                       category=Category.objects.create(name=f"Category {i}"))
+            post.tags.add(self.tag1, Tag.objects.create(name=f"Tag {i}"))
+            Comment.objects.create(content="Comment", post=post, user=self.other_user)
+            Comment.objects.create(content="Comment", post=self.post, user=self.other_user)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    def test_list_query_count_does_not_grow_with_posts(self):
+        """Тест, что число запросов списка постов не зависит от их количества"""
+        self.client.force_authenticate(user=self.regular_user)
+        self.add_posts(1)
+        expected = self.count_queries(self.list_url)
+        self.add_posts(5)
+        self.assertEqual(self.count_queries(self.list_url), expected)
+
+    def test_detail_query_count_does_not_grow_with_comments(self):
+        """Тест, что число запросов поста не зависит от числа тегов и комментариев"""
+        self.add_posts(1)
+        expected = self.count_queries(self.detail_url)
+        self.add_posts(5)
+        self.assertEqual(self.count_queries(self.detail_url), expected)
+
+    def test_create_stores_toxicity_aspects(self):
+        """Тест сохранения общей оценки и оценок по аспектам при создании поста"""
+        self.client.force_authenticate(user=self.regular_user)
+        data = {"header": "New Post", "body": "This is a new post", "category": self.category.id}
+        with override_settings(TOXICITY_CACHE_ENABLED=False):
+            response = self.client.post(self.list_url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()["toxicity"], 0.0)
+        self.assertEqual(response.json()["toxicity_aspects"]["non-toxic"], 1.0)
+        self.assertEqual(set(Post.objects.get(id=response.json()["id"]).toxicity_aspects), set(TOXICITY_ASPECTS))
+
+    def test_filter_and_order_posts_by_toxicity(self):
+        """Тест фильтрации и сортировки постов по токсичности"""
+        Post.objects.filter(id=self.post.id).update(toxicity=0.2)
+        borderline = Post.objects.create(header="Borderline", body="Body", author=self.author,
+                                         category=self.category, toxicity=0.4)
+        response = self.client.get(f"{self.list_url}?toxicity__lt=0.3")
+        self.assertEqual([post["id"] for post in response.json()["results"]], [self.post.id])
+        response = self.client.get(f"{self.list_url}?toxicity__gte=0.3")
+        self.assertEqual([post["id"] for post in response.json()["results"]], [borderline.id])
+        response = self.client.get(f"{self.list_url}?ordering=-toxicity")
+        self.assertEqual([post["id"] for post in response.json()["results"]], [borderline.id, self.post.id])
+
+
+class PostPaginationTestCase(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создает посты с одинаковой датой, чтобы проверить порядок по id"""
+        user = User.objects.create_user(email="user@gmail.com", password="user123")
+        cls.category = Category.objects.create(name="Test Category")
+        cls.other_category = Category.objects.create(name="Other Category")
+        for i in range(9):
+            Post.objects.create(header=f"Post {i}", body="needle" if i % 3 else "body", author=user.author_data,
+                                category=cls.category if i % 4 else cls.other_category,
+                                toxicity=None if i % 5 == 0 else (i % 3) / 10)
+        Post.objects.filter(id__lte=Post.objects.order_by("id")[4].id).update(date_posted=timezone.now())
+        cls.list_url = reverse("post-list")
+
+    def setUp(self):
+        caches["default"].clear()
+
+    def walk(self, url):
+        """Проходит все страницы вперед, затем обратно, и возвращает id в обоих направлениях"""
+        forward, pages = [], []
+        while url:
+            page = self.client.get(url).json()
+            pages.append(page)
+            forward.extend(post["id"] for post in page["results"])
+            url = page["next"]
+        backward = []
+        url = pages[-1]["previous"]
+        while url:
+            page = self.client.get(url).json()
+            backward = [post["id"] for post in page["results"]] + backward
+            url = page["previous"]
+        return forward, backward + [post["id"] for post in pages[-1]["results"]]
+
+    def test_default_ordering_uses_id_as_tie_breaker(self):
+        """Тест обхода страниц при одинаковой дате публикации"""
+        forward, backward = self.walk(f"{self.list_url}?page_size=2")
+        expected = list(Post.objects.order_by("-date_posted", "-id").values_list("id", flat=True))
+        self.assertEqual(forward, expected)
+        self.assertEqual(backward, expected)
+
+    def test_pagination_with_filters_search_and_nullable_ordering(self):
+        """Тест курсоров вместе с фильтрами, поиском и сортировкой по полю с NULL"""
+        for ordering in ("toxicity", "-toxicity", "id"):
+            with self.subTest(ordering=ordering):
+                forward, backward = self.walk(
+                    f"{self.list_url}?page_size=2&category={self.category.id}&search=needle&ordering={ordering}"
+                )
+                expected = list(
+                    Post.objects.filter(category=self.category, body__contains="needle")
+                    .order_by(ordering, ordering.replace("toxicity", "id"))
+                    .values_list("id", flat=True)
+                )
+                self.assertEqual(forward, expected)
+                self.assertEqual(backward, expected)
+
+    def test_page_size_is_bounded(self):
+        """Тест ограничения размера страницы"""
+        with mock.patch.object(PostCursorPagination, "max_page_size", 3):
+            response = self.client.get(f"{self.list_url}?page_size=1000")
+        self.assertEqual(len(response.json()["results"]), 3)
+        self.assertIsNone(response.json()["previous"])
+
+    def test_invalid_cursor(self):
+        """Тест ответа на поврежденный курсор"""
+        response = self.client.get(f"{self.list_url}?cursor=aT1hYmM=")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        for params in ({}, {"ordering": "toxicity"}, {"ordering": "-comment_count"}, {"search": "post"}):
+            with self.subTest(params=params):
+                cursor = b64encode(b"p=notadate&i=1").decode()
+                response = self.client.get(self.list_url, {**params, "cursor": cursor})
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+                self.assertEqual(response.json()["detail"], "Invalid cursor")
+
+
+class PostSearchTestCase(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создает посты на русском и английском языках"""
+        user = User.objects.create_user(email="user@gmail.com", password="user123")
+        cls.category = Category.objects.create(name="Test Category")
+
+        def create(header, body):
+            return Post.objects.create(header=header, body=body, author=user.author_data, category=cls.category)
+
+        cls.russian = create("Интересные статьи о программировании", "Сегодня поговорим о базах данных.")
+        cls.english = create("Weekly notes", "We were running benchmarks on the new databases.")
+        cls.body_match = create("Заметки", "Пара слов о статье, которую я прочитал.")
+        cls.unrelated = create("Погода", "Сегодня солнечно.")
+        cls.list_url = reverse("post-list")
+
+    def setUp(self):
+        caches["default"].clear()
+
+    def search(self, query, **params):
+        response = self.client.get(self.list_url, {"search": query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post["id"] for post in response.json()["results"]]
+
+    def test_russian_and_english_stemming(self):
+        """Тест поиска по словоформам на русском и английском"""
+        self.assertEqual(self.search("интересная статья"), [self.russian.id])
+        self.assertEqual(self.search("база данных"), [self.russian.id])
+        self.assertEqual(self.search("run benchmark"), [self.english.id])
+        self.assertEqual(self.search("database"), [self.english.id])
+
+    def test_header_matches_rank_first(self):
+        """Тест, что совпадение в заголовке ранжируется выше совпадения в тексте"""
+        self.assertEqual(self.search("статьи"), [self.russian.id, self.body_match.id])
+        self.assertEqual(self.search("статьи", ordering="id"), [self.russian.id, self.body_match.id])
+        self.assertEqual(self.search("статьи", ordering="-id"), [self.body_match.id, self.russian.id])
+
+    def test_ranked_results_are_paginated(self):
+        """Тест постраничного обхода результатов, отсортированных по рангу"""
+        response = self.client.get(self.list_url, {"search": "статьи", "page_size": 1})
+        first = [post["id"] for post in response.json()["results"]]
+        second = [post["id"] for post in self.client.get(response.json()["next"]).json()["results"]]
+        self.assertEqual(first + second, [self.russian.id, self.body_match.id])
+
+    def test_search_uses_gin_index(self):
+        """Тест, что поиск использует GIN-индекс"""
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            plan = PostSearchFilter().filter_queryset(
+                mock.Mock(query_params={"search": "статьи"}), Post.objects.all(), None
+            ).explain()
+        self.assertIn("post_search_vector_idx", plan)
+
+
+class PostSuggestTestCase(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создает посты для подсказок по заголовкам"""
+        user = User.objects.create_user(email="user@gmail.com", password="user123")
+        category = Category.objects.create(name="Test Category")
+
+        def create(header, **kwargs):
+            return Post.objects.create(header=header, body="Body", author=user.author_data, category=category,
+                                       **kwargs)
+
+        cls.django = create("Django REST framework tips")
+        cls.postgres = create("Postgres indexing in Django")
+        cls.russian = create("Интересные статьи о программировании")
+        create("Django draft", moderation_status=Post.ModerationStatus.PENDING)
+        cls.url = reverse("post-suggest")
+
+    def setUp(self):
+        caches["suggest"].clear()
+
+    def suggest(self, q, **params):
+        response = self.client.get(self.url, {"q": q, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_returns_only_id_and_header_of_published_posts(self):
+        """Тест формата подсказок и исключения неопубликованных постов"""
+        suggestions = self.suggest("djan")
+        self.assertEqual({item["id"] for item in suggestions}, {self.django.id, self.postgres.id})
+        self.assertEqual(set(suggestions[0]), {"id", "header"})
+        self.assertEqual(self.suggest("  ИНТЕРЕС "), [{"id": self.russian.id, "header": self.russian.header}])
+
+    def test_limit_and_short_queries(self):
+        """Тест ограничения числа подсказок и слишком коротких запросов"""
+        self.assertEqual(len(self.suggest("django", limit=1)), 1)
+        self.assertEqual(self.suggest("d"), [])
+
+    def test_hot_prefix_is_served_from_cache(self):
+        """Тест, что повторный запрос подсказок не обращается к базе"""
+        suggest_posts("django")
+        with self.assertNumQueries(0):
+            self.assertEqual(len(suggest_posts("Django ")), 2)
+
+    def test_misspelled_header_is_found(self):
+        """Тест нечеткого поиска по заголовку с опечаткой"""
+        if not trigram_available():
+            self.skipTest("pg_trgm is not installed")
+        self.assertEqual(self.suggest("postgers indexing")[0]["id"], self.postgres.id)
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            plan = Post.objects.filter(header__trigram_word_similar="postgers").explain()
+        self.assertIn("post_header_trgm_idx", plan)
+
+
+@override_settings(POSTS_CACHE_ENABLED=False)
+class PostIndexUsageTestCase(APITestCase):
+    """Планы запросов списка постов с фильтрами на заполненной базе"""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Заполняет базу достаточным для выбора индексов числом строк"""
+        users = User.objects.bulk_create(
+            User(email=f"author{i}@gmail.com", password=make_password(None)) for i in range(100)
+        )
+        authors = Author.objects.bulk_create(Author(user=user, bio="") for user in users)
+        categories = Category.objects.bulk_create(Category(name=f"Category {i}") for i in range(1000))
+        tags = Tag.objects.bulk_create(Tag(name=f"Tag {i}") for i in range(1000))
+        posts = Post.objects.bulk_create(
+            Post(header=f"Post {i}", body="Body", author=authors[i % 100], category=categories[i % 997])
+            for i in range(30000)
+        )
+        Post.tags.through.objects.bulk_create(
+            Post.tags.through(post=post, tag=tags[(i + shift) % 1000])
+            for i, post in enumerate(posts) for shift in (0, 7)
+        )
+        cls.author, cls.category, cls.tag = authors[3], categories[5], tags[11]
+        with connection.cursor() as cursor:
+            for table in ("posts_post", "posts_post_tags", "tags_tag", "categories_category", "authors_author"):
+                cursor.execute(f"ANALYZE {table}")
+        cls.list_url = reverse("post-list")
+
+    def plan(self, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.list_url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.json()["results"])
+        sql = next(query["sql"] for query in queries.captured_queries
+                   if query["sql"].startswith("SELECT") and 'FROM "posts_post"' in query["sql"]
+                   and "LIMIT" in query["sql"])
+        with connection.cursor() as cursor:
+            # SSD random read cost; the default of 4 assumes spinning disks.
+            cursor.execute("SET LOCAL random_page_cost = 1.1")
+            cursor.execute(f"EXPLAIN {sql}")
+            return "\n".join(row[0] for row in cursor.fetchall())
+
+    def assertIndexScan(self, plan, index):
+        self.assertIn(index, plan)
+        self.assertNotRegex(plan, r"Seq Scan on posts_post\b")
+
+    def test_author_filter_uses_composite_index(self):
+        """Тест фильтра по автору"""
+        self.assertIndexScan(self.plan({"author_id": self.author.id}), "post_author_date_posted_idx")
+        self.assertIndexScan(self.plan({"author": self.author.id}), "post_author_date_posted_idx")
+
+    def test_category_filters_use_composite_and_name_indexes(self):
+        """Тест фильтров по категории и ее названию"""
+        self.assertIndexScan(self.plan({"category_ids": self.category.id}), "post_category_date_posted_idx")
+        plan = self.plan({"category_name": self.category.name})
+        self.assertIndexScan(plan, "post_category_date_posted_idx")
+        self.assertIn("categories_category_name", plan)
+
+    def test_tag_filters_use_through_table_index(self):
+        """Тест фильтров по тегу и его названию"""
+        self.assertIndexScan(self.plan({"tag_ids": self.tag.id}), "post_tags_tag_id_post_id_idx")
+        plan = self.plan({"tag_name": self.tag.name})
+        self.assertIndexScan(plan, "post_tags_tag_id_post_id_idx")
+        self.assertIn("tags_tag_name", plan)
+        self.assertNotIn("Seq Scan on posts_post_tags", plan)
+
+
+class PostResponseCacheTestCase(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создает посты с тегами и категорией"""
+        cls.user = User.objects.create_user(email="user@gmail.com", password="user123")
+        cls.category = Category.objects.create(name="Test Category")
+        cls.tag = Tag.objects.create(name="Tag")
+        cls.tagged = Post.objects.create(header="Tagged", body="Body", author=cls.user.author_data,
+                                         category=cls.category)
+        cls.tagged.tags.add(cls.tag)
+        cls.untagged = Post.objects.create(header="Untagged", body="Body", author=cls.user.author_data,
+                                           category=Category.objects.create(name="Other Category"))
+        cls.list_url = reverse("post-list")
+
+    def setUp(self):
+        caches["default"].clear()
+        self.toxicity_model = patch_toxicity_model(self)
+
+    def detail_url(self, post):
+        return reverse("post-detail", args=[post.id])
+
+    def assertCached(self, url, cached=True):
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries) == 0, cached)
+        return response.json()
+
+    def test_reads_are_served_from_cache(self):
+        """Тест, что повторные запросы списка и поста не обращаются к базе"""
+        self.assertCached(self.list_url)
+        self.assertCached(f"{self.list_url}?category={self.category.id}&ordering=id")
+        self.assertCached(self.detail_url(self.tagged))
+
+    def test_cache_keeps_schemes_apart(self):
+        """Тест, что закэшированные ссылки ответа по http не отдаются клиенту по https"""
+        url = f"{self.list_url}?page_size=1"
+        self.assertTrue(self.client.get(url).json()["next"].startswith("http://"))
+        self.assertTrue(self.client.get(url, secure=True).json()["next"].startswith("https://"))
+
+    def test_non_canonical_id_is_evicted(self):
+        """Тест, что ответ по id с ведущим нулем сбрасывается вместе с каноническим"""
+        url = f"{self.list_url}0{self.tagged.id}/"
+        self.assertEqual(self.assertCached(url)["header"], "Tagged")
+        post = Post.objects.get(id=self.tagged.id)
+        post.header = "Renamed"
+        post.save()
+        self.assertEqual(self.client.get(url).json()["header"], "Renamed")
+        post.moderation_status = Post.ModerationStatus.REJECTED
+        post.save()
+        self.assertEqual(self.client.get(self.detail_url(self.tagged)).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_post_update_evicts_its_detail_and_lists(self):
+        """Тест, что изменение поста сбрасывает его страницу и списки"""
+        self.client.get(self.list_url)
+        self.client.get(self.detail_url(self.untagged))
+        Post.objects.get(id=self.tagged.id).save()
+        self.assertEqual(self.client.get(self.detail_url(self.tagged)).status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(0):
+            self.client.get(self.detail_url(self.untagged))
+        self.client.force_authenticate(user=self.user)
+        self.client.patch(self.detail_url(self.tagged), {"header": "Renamed"}, format="json")
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get(self.list_url).json()["results"][1]["header"], "Renamed")
+        self.assertEqual(self.client.get(self.detail_url(self.tagged)).json()["header"], "Renamed")
+
+    def test_comment_evicts_its_post_detail_and_lists(self):
+        """Тест, что новый комментарий сбрасывает страницу своего поста и списки со счетчиком комментариев"""
+        self.client.get(self.list_url)
+        self.client.get(self.detail_url(self.tagged))
+        self.client.get(self.detail_url(self.untagged))
+        Comment.objects.create(content="New comment", post=self.tagged, user=self.user)
+        with self.assertNumQueries(0):
+            self.client.get(self.detail_url(self.untagged))
+        self.assertEqual(self.client.get(self.list_url).json()["results"][1]["comment_count"], 1)
+        self.assertEqual(len(self.client.get(self.detail_url(self.tagged)).json()["comments"]), 1)
+
+    def test_tag_change_evicts_tagged_posts(self):
+        """Тест, что переименование тега сбрасывает только посты с этим тегом"""
+        self.client.get(self.detail_url(self.tagged))
+        self.client.get(self.detail_url(self.untagged))
+        self.tag.name = "Renamed tag"
+        self.tag.save()
+        with self.assertNumQueries(0):
+            self.client.get(self.detail_url(self.untagged))
+        self.assertEqual(self.client.get(self.detail_url(self.tagged)).json()["tags"][0]["name"], "Renamed tag")
+
+    def test_author_sees_own_pending_post_despite_cached_list(self):
+        """Тест, что кэш анонимного списка не скрывает от автора его непроверенный пост"""
+        self.assertCached(self.list_url)
+        Post.objects.create(header="Pending", body="Body", author=self.user.author_data, category=self.category,
+                            moderation_status=Post.ModerationStatus.PENDING)
+        self.assertEqual(len(self.client.get(self.list_url).json()["results"]), 2)
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(len(self.client.get(self.list_url).json()["results"]), 3)
+
+    def test_moderation_worker_evicts_moderated_posts(self):
+        """Тест, что публикация воркером модерации сбрасывает кэш списка"""
+        self.assertCached(self.list_url)
+        post = Post.objects.create(header="Queued", body="Body", author=self.user.author_data,
+                                   category=self.category)
+        enqueue_post(post)
+        self.assertEqual(len(self.client.get(self.list_url).json()["results"]), 2)
+        process_moderation_batch()
+        self.assertEqual(len(self.client.get(self.list_url).json()["results"]), 3)
+
+    def test_concurrent_misses_are_computed_once(self):
+        """Тест, что одновременные промахи по одному ключу вычисляются один раз"""
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return {"value": 42}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(get_or_compute("hot-key", compute)))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{"value": 42}] * 8)
+
+
+@override_settings(POSTS_CACHE_ENABLED=False)
+class PostSparseFieldsetTestCase(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создает посты с тегами"""
+        cls.user = User.objects.create_user(email="user@gmail.com", password="user123")
+        cls.category = Category.objects.create(name="Category")
+        cls.tag = Tag.objects.create(name="Tag")
+        cls.posts = []
+        for i in range(5):
+            post = Post.objects.create(header=f"Post {i}", body="Long body " * 100, author=cls.user.author_data,
+                                       category=cls.category)
+            post.tags.add(cls.tag)
+            cls.posts.append(post)
+        cls.list_url = reverse("post-list")
+        cls.detail_url = reverse("post-detail", args=[cls.posts[0].id])
+
+    def get(self, url, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        page = next(query["sql"] for query in queries.captured_queries
+                    if 'FROM "posts_post"' in query["sql"] and "COUNT(" not in query["sql"])
+        return response, len(queries), page
+
+    def test_fields_select_columns(self):
+        """Тест, что ?fields= сокращает ответ, запросы и загружаемые колонки"""
+        full, full_queries, _ = self.get(self.list_url, {})
+        response, queries, sql = self.get(self.list_url, {"fields": "id,header,date_posted"})
+        self.assertEqual([set(post) for post in response.json()["results"]], [{"id", "header", "date_posted"}] * 5)
+        self.assertEqual([post["header"] for post in response.json()["results"]],
+                         [post["header"] for post in full.json()["results"]])
+        self.assertLess(queries, full_queries)
+        self.assertLess(len(response.content) * 5, len(full.content))
+        self.assertNotIn('"posts_post"."body"', sql)
+        self.assertNotIn("JOIN", sql)
+
+    def test_unexpanded_relations_are_ids(self):
+        """Тест, что без раскрытия связи выводятся идентификаторами без соединений"""
+        with mock.patch.object(AuthorSerializerForPost, "to_representation") as author, \
+                mock.patch.object(TagSerializerForPost, "to_representation") as tag:
+            response, _, sql = self.get(self.list_url, {"fields": "id,author,category,tags", "expand": ""})
+        author.assert_not_called()
+        tag.assert_not_called()
+        self.assertEqual(response.json()["results"][0], {"id": self.posts[-1].id, "author": self.user.author_data.id,
+                                                         "category": self.category.id, "tags": [self.tag.id]})
+        self.assertNotIn("JOIN", sql)
+
+    def test_expand_nests_requested_relations(self):
+        """Тест, что ?expand= раскрывает только перечисленные связи"""
+        response, _, sql = self.get(self.list_url, {"expand": "tags"})
+        post = response.json()["results"][0]
+        self.assertEqual(post["tags"], [{"id": self.tag.id, "name": "Tag"}])
+        self.assertEqual((post["author"], post["category"]), (self.user.author_data.id, self.category.id))
+        self.assertIn("excerpt", post)
+        response, _, _ = self.get(self.detail_url, {"fields": "id,category_details,comments", "expand": "category_details"})
+        self.assertEqual(response.json(), {"id": self.posts[0].id, "comments": [],
+                                           "category_details": {"url": f"http://testserver/api/categories/{self.category.id}/",
+                                                                "id": self.category.id, "name": "Category"}})
+
+    def test_cursor_pagination_with_sparse_fields(self):
+        """Тест, что постраничный вывод с ?fields= не догружает колонки по строкам"""
+        _, queries, _ = self.get(self.list_url, {"fields": "id", "page_size": 1, "ordering": "-comment_count"})
+        response, more_queries, _ = self.get(self.list_url, {"fields": "id", "page_size": 4, "ordering": "-comment_count"})
+        self.assertEqual(queries, more_queries)
+        response = self.client.get(response.json()["next"])
+        self.assertEqual(response.json()["results"], [{"id": self.posts[0].id}])
+
+    def test_fields_do_not_apply_to_writes(self):
+        """Тест, что ?fields= не влияет на создание поста"""
+        patch_toxicity_model(self)
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(f"{self.list_url}?fields=id", {"header": "New", "body": "Body",
+                                                                   "category": self.category.id}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()["header"], "New")
+
+
+@override_settings(POSTS_DETAIL_COMMENTS=3)
+class PostCommentsTestCase(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создает пост с семью комментариями"""
+        cls.user = User.objects.create_user(email="user@gmail.com", password="user123")
+        cls.category = Category.objects.create(name="Category")
+        cls.post = Post.objects.create(header="Post", body="Body", author=cls.user.author_data, category=cls.category)
+        cls.comments = [Comment.objects.create(content=f"Comment {i}", post=cls.post, user=cls.user)
+                        for i in range(7)]
+        cls.detail_url = reverse("post-detail", args=[cls.post.id])
+        cls.comments_url = reverse("post-comments", args=[cls.post.id])
+
+    def setUp(self):
+        caches["default"].clear()
+
+    def newest_first(self, comments):
+        return [comment.id for comment in reversed(comments)]
+
+    def test_detail_embeds_latest_comments(self):
+        """Тест, что пост содержит только последние комментарии, их число и ссылку на остальные"""
+        data = self.client.get(self.detail_url).json()
+        self.assertEqual([comment["id"] for comment in data["comments"]], self.newest_first(self.comments)[:3])
+        self.assertEqual(data["comment_count"], 7)
+        ids = [comment["id"] for comment in data["comments"]]
+        url = data["comments_next"]
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids += [comment["id"] for comment in response.json()["results"]]
+            url = response.json()["next"]
+        self.assertEqual(ids, self.newest_first(self.comments))
+
+    def test_no_link_when_all_comments_are_embedded(self):
+        """Тест, что ссылки нет, если все комментарии уже в ответе"""
+        Comment.objects.filter(id__in=[comment.id for comment in self.comments[:4]]).delete()
+        data = self.client.get(self.detail_url).json()
+        self.assertEqual(len(data["comments"]), 3)
+        self.assertIsNone(data["comments_next"])
+
+    def test_detail_is_bounded(self):
+        """Тест, что размер ответа и число запросов поста не растут с числом комментариев"""
+        with CaptureQueriesContext(connection) as queries:
+            size = len(self.client.get(self.detail_url).content)
+        for i in range(20):
+            Comment.objects.create(content=f"Comment {i + 7}", post=self.post, user=self.user)
+        caches["default"].clear()
+        with self.assertNumQueries(len(queries)):
+            response = self.client.get(self.detail_url)
+        self.assertEqual(len(response.json()["comments"]), 3)
+        self.assertLessEqual(len(response.content), size + 10)
+
+    def test_comments_route_pagination(self):
+        """Тест постраничного вывода комментариев поста в обе стороны"""
+        response = self.client.get(self.comments_url, {"page_size": 4})
+        self.assertEqual([comment["id"] for comment in response.json()["results"]],
+                         self.newest_first(self.comments)[:4])
+        self.assertIsNone(response.json()["previous"])
+        response = self.client.get(response.json()["next"])
+        self.assertEqual([comment["id"] for comment in response.json()["results"]],
+                         self.newest_first(self.comments)[4:])
+        self.assertIsNone(response.json()["next"])
+        response = self.client.get(response.json()["previous"])
+        self.assertEqual([comment["id"] for comment in response.json()["results"]],
+                         self.newest_first(self.comments)[:4])
+
+    def test_comments_of_hidden_post(self):
+        """Тест, что комментарии непроверенного поста видит только его автор"""
+        Post.objects.filter(id=self.post.id).update(moderation_status=Post.ModerationStatus.PENDING)
+        self.assertEqual(self.client.get(self.comments_url).status_code, status.HTTP_404_NOT_FOUND)
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(len(self.client.get(self.comments_url).json()["results"]), 7)
+
+    def test_comment_edit_changes_detail(self):
+        """Тест, что правка встроенного комментария меняет ETag поста"""
+        etag = self.client.get(self.detail_url)["ETag"]
+        comment = self.comments[-1]
+        comment.content = "Edited"
+        comment.save()
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["comments"][0]["content"], "Edited")
+
+
+@override_settings(POSTS_CACHE_ENABLED=False)
+class PostConditionalGetTestCase(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создает пост с тегом и комментарием"""
+        cls.user = User.objects.create_user(email="user@gmail.com", password="user123")
+        cls.category = Category.objects.create(name="Test Category")
+        cls.tag = Tag.objects.create(name="Tag")
+        cls.post = Post.objects.create(header="Post", body="Body", author=cls.user.author_data, category=cls.category)
+        cls.post.tags.add(cls.tag)
+        Comment.objects.create(content="Comment", post=cls.post, user=cls.user)
+        cls.list_url = reverse("post-list")
+        cls.detail_url = reverse("post-detail", args=[cls.post.id])
+
+    def assertNotModified(self, url, **headers):
+        with mock.patch.object(PostSerializer, "to_representation") as detail, \
+                mock.patch.object(PostSerializerList, "to_representation") as listed:
+            response = self.client.get(url, **headers)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+        detail.assert_not_called()
+        listed.assert_not_called()
+
+    def assertModified(self, url, etag):
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        return response.json()
+
+    def test_not_modified_skips_serialization(self):
+        """Тест, что совпадающие ETag и Last-Modified дают 304 без сериализации и одним запросом"""
+        for url in (self.list_url, self.detail_url):
+            response = self.client.get(url)
+            self.assertTrue(response["ETag"].startswith('W/"'))
+            with self.assertNumQueries(1):
+                self.assertNotModified(url, HTTP_IF_NONE_MATCH=response["ETag"])
+            self.assertNotModified(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        url = f"{self.list_url}?category={self.category.id}&search=post"
+        self.assertNotModified(url, HTTP_IF_NONE_MATCH=self.client.get(url)["ETag"])
+
+    def test_invalid_id_is_not_found(self):
+        """Тест, что нечисловой id дает 404, а не ошибку валидаторов"""
+        for basename in ("post", "comment", "tag", "category", "author"):
+            with self.subTest(basename=basename):
+                response = self.client.get(reverse(f"{basename}-detail", args=["abc"]))
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_etag_depends_on_query_and_viewer(self):
+        """Тест, что ETag различается для разных параметров и пользователей"""
+        etag = self.client.get(self.list_url)["ETag"]
+        self.assertNotEqual(self.client.get(f"{self.list_url}?ordering=id")["ETag"], etag)
+        self.client.force_authenticate(user=self.user)
+        self.assertNotEqual(self.client.get(self.list_url)["ETag"], etag)
+
+    def test_embedded_changes_change_etag(self):
+        """Тест, что изменения тегов, категорий, авторов и комментариев меняют ETag"""
+        def etags():
+            return self.client.get(self.list_url)["ETag"], self.client.get(self.detail_url)["ETag"]
+
+        list_etag, detail_etag = etags()
+        self.tag.name = "Renamed tag"
+        self.tag.save()
+        self.assertEqual(self.assertModified(self.list_url, list_etag)["results"][0]["tags"][0]["name"], "Renamed tag")
+        self.assertModified(self.detail_url, detail_etag)
+
+        list_etag, detail_etag = etags()
+        self.user.first_name = "Renamed"
+        self.user.save()
+        self.assertModified(self.list_url, list_etag)
+        self.assertModified(self.detail_url, detail_etag)
+
+        list_etag, detail_etag = etags()
+        self.post.tags.remove(self.tag)
+        self.assertEqual(self.assertModified(self.list_url, list_etag)["results"][0]["tags"], [])
+        self.assertModified(self.detail_url, detail_etag)
+
+        detail_etag = self.client.get(self.detail_url)["ETag"]
+        Comment.objects.filter(post=self.post).delete()
+        self.assertEqual(self.assertModified(self.detail_url, detail_etag)["comments"], [])
+
+    def test_list_validators_read_only_the_page(self):
+        """Тест, что валидаторы списка читают только строки страницы"""
+        older = Post.objects.create(header="Older", body="Body", author=self.user.author_data, category=self.category)
+        Post.objects.filter(pk=older.pk).update(date_posted=timezone.now() - timezone.timedelta(days=1))
+        url = f"{self.list_url}?page_size=1"
+        with CaptureQueriesContext(connection) as queries:
+            etag = self.client.get(url, HTTP_IF_NONE_MATCH='W/"stale"')["ETag"]
+        posts_queries = [query["sql"] for query in queries.captured_queries if 'FROM "posts_post"' in query["sql"]]
+        self.assertTrue(posts_queries)
+        for sql in posts_queries:
+            self.assertIn("LIMIT", sql)
+        older.refresh_from_db()
+        older.header = "Older, edited"
+        older.save()
+        self.assertNotModified(url, HTTP_IF_NONE_MATCH=etag)
+        self.post.header = "Edited"
+        self.post.save()
+        self.assertModified(url, etag)
+
+    def test_moderation_changes_etag(self):
+        """Тест, что повторная модерация меняет ETag поста"""
+        patch_toxicity_model(self)
+        detail_etag = self.client.get(self.detail_url)["ETag"]
+        self.client.force_authenticate(user=self.user)
+        own_etag = self.client.get(self.detail_url)["ETag"]
+        remoderate_posts(threshold=-1)
+        self.assertEqual(self.assertModified(self.detail_url, own_etag)["moderation_status"],
+                         Post.ModerationStatus.REJECTED)
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=detail_etag).status_code,
+                         status.HTTP_404_NOT_FOUND)
+
+    @override_settings(POSTS_CACHE_ENABLED=True)
+    def test_cached_not_modified_needs_no_queries(self):
+        """Тест, что при включенном кэше ответа 304 не обращается к базе"""
+        caches["default"].clear()
+        etag = self.client.get(self.detail_url)["ETag"]
+        with self.assertNumQueries(0):
+            self.assertNotModified(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        Comment.objects.create(content="New comment", post=self.post, user=self.user)
+        self.assertEqual(len(self.assertModified(self.detail_url, etag)["comments"]), 2)
+
+
+class PostCounterTestCase(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создает автора, категорию, теги и опубликованный пост"""
+        cls.user = User.objects.create_user(email="user@gmail.com", password="user123")
+        cls.author = cls.user.author_data
+        cls.category = Category.objects.create(name="Category")
+        cls.tag = Tag.objects.create(name="Tag")
+        cls.other_tag = Tag.objects.create(name="Other tag")
+        cls.post = Post.objects.create(header="Post", body="Body", author=cls.author, category=cls.category)
+        cls.post.tags.add(cls.tag)
+
+    def setUp(self):
+        self.toxicity_model = patch_toxicity_model(self)
+
+    def assertCounts(self, author, category, tag, other_tag=0):
+        self.assertEqual(Author.objects.get(id=self.author.id).post_count, author)
+        self.assertEqual(Category.objects.get(id=self.category.id).post_count, category)
+        self.assertEqual(Tag.objects.get(id=self.tag.id).post_count, tag)
+        self.assertEqual(Tag.objects.get(id=self.other_tag.id).post_count, other_tag)
+
+    def comment_count(self, post):
+        return Post.objects.get(id=post.id).comment_count
+
+    def test_comment_count(self):
+        """Тест, что создание, перенос и удаление комментариев меняют счетчик поста"""
+        other = Post.objects.create(header="Other", body="Body", author=self.author, category=self.category)
+        comments = [Comment.objects.create(content=f"Comment {i}", post=self.post, user=self.user) for i in range(3)]
+        self.assertEqual(self.comment_count(self.post), 3)
+        comments[0].post = other
+        comments[0].save()
+        self.assertEqual((self.comment_count(self.post), self.comment_count(other)), (2, 1))
+        comments[1].delete()
+        Comment.objects.filter(id=comments[2].id).delete()
+        self.assertEqual(self.comment_count(self.post), 0)
+        other.delete()
+        self.assertFalse(Comment.objects.exists())
+
+    def test_comment_count_via_api_and_ordering(self):
+        """Тест, что счетчик комментариев виден в списке и по нему можно сортировать"""
+        quiet = Post.objects.create(header="Quiet", body="Body", author=self.author, category=self.category)
+        self.client.force_authenticate(user=self.user)
+        for _ in range(2):
+            response = self.client.post(reverse("comment-list"), {"content": "Comment", "post": self.post.id},
+                                        format="json")
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.get(reverse("post-list"), {"ordering": "-comment_count", "page_size": 1})
+        self.assertEqual([(post["id"], post["comment_count"]) for post in response.json()["results"]],
+                         [(self.post.id, 2)])
+        response = self.client.get(response.json()["next"])
+        self.assertEqual([(post["id"], post["comment_count"]) for post in response.json()["results"]],
+                         [(quiet.id, 0)])
+        response = self.client.get(reverse("tag-list"), {"ordering": "-post_count"})
+        self.assertEqual([(tag["name"], tag["post_count"]) for tag in response.json()], [("Tag", 1), ("Other tag", 0)])
+
+    def test_post_counts(self):
+        """Тест, что создание, изменение тегов и удаление постов меняют счетчики автора, категории и тегов"""
+        self.assertCounts(1, 1, 1)
+        post = Post.objects.create(header="Second", body="Body", author=self.author, category=self.category)
+        post.tags.set([self.tag, self.other_tag])
+        self.assertCounts(2, 2, 2, 1)
+        post.tags.remove(self.tag, self.tag)
+        self.other_tag.posts.add(self.post)
+        self.assertCounts(2, 2, 1, 2)
+        self.other_tag.posts.remove(post)
+        post.tags.clear()
+        self.assertCounts(2, 2, 1, 1)
+        self.other_tag.posts.clear()
+        post.category = Category.objects.create(name="Another")
+        post.save()
+        self.assertCounts(2, 1, 1)
+        post.delete()
+        self.category.delete()
+        self.assertEqual(Author.objects.get(id=self.author.id).post_count, 0)
+        self.assertEqual(Tag.objects.get(id=self.tag.id).post_count, 0)
+
+    def test_only_published_posts_are_counted(self):
+        """Тест, что непроверенные и отклоненные посты не учитываются, а модерация меняет счетчики"""
+        enqueue_post(self.post)
+        self.assertCounts(0, 0, 0)
+        pending = Post.objects.create(header="Pending", body="Body", author=self.author, category=self.category,
+                                      moderation_status=Post.ModerationStatus.PENDING)
+        pending.tags.add(self.tag)
+        enqueue_post(pending)
+        self.assertCounts(0, 0, 0)
+        process_moderation_batch()
+        self.assertCounts(2, 2, 2)
+        remoderate_posts(threshold=-1)
+        self.assertCounts(0, 0, 0)
+        pending.delete()
+        self.assertCounts(0, 0, 0)
+
+    def test_stale_instance_does_not_overwrite_counters(self):
+        """Тест, что сохранение объекта с устаревшим счетчиком не затирает его"""
+        tag = Tag.objects.get(id=self.tag.id)
+        Post.objects.create(header="Second", body="Body", author=self.author, category=self.category).tags.add(tag)
+        tag.name = "Renamed"
+        tag.save()
+        self.author.bio = "Bio"
+        self.author.save()
+        self.assertCounts(2, 2, 2)
+        self.assertEqual(Tag.objects.get(id=self.tag.id).name, "Renamed")
+
+    def test_recount_repairs_drift(self):
+        """Тест, что команда recount пересчитывает разошедшиеся счетчики пачками"""
+        Comment.objects.create(content="Comment", post=self.post, user=self.user)
+        Post.objects.update(comment_count=7)
+        Tag.objects.update(post_count=5)
+        Author.objects.update(post_count=0)
+        out = StringIO()
+        call_command("recount", batch_size=1, stdout=out)
+        self.assertEqual(self.comment_count(self.post), 1)
+        self.assertCounts(1, 1, 1)
+        self.assertIn("posts.Post.comment_count: 1 fixed", out.getvalue())
+        self.assertIn("tags.Tag.post_count: 2 fixed", out.getvalue())
+        self.assertIn("categories.Category.post_count: 0 fixed", out.getvalue())
+
+    def test_counters_cost_no_list_queries(self):
+        """Тест, что счетчики не добавляют запросов к списку постов"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("post-list"))
+        self.assertEqual(response.json()["results"][0]["comment_count"], 0)
+        # The only aggregate is the conditional GET validator, which never touches comments.
+        self.assertFalse(any("comments_comment" in query["sql"] for query in queries.captured_queries))
+        self.assertEqual(sum("COUNT(" in query["sql"] for query in queries.captured_queries), 1)
+
+
+@override_settings(POSTS_CACHE_ENABLED=False)
+class PostFastListTestCase(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создает посты с разными значениями полей, тегами и комментариями"""
+        cls.user = User.objects.create_user(email="user@gmail.com", password="user123", first_name="Имя")
+        cls.other_user = User.objects.create_user(email="other@gmail.com", password="other123")
+        cls.category = Category.objects.create(name="Category")
+        tags = [Tag.objects.create(name=f"Tag {i}") for i in range(3)]
+        for i in range(7):
+            post = Post.objects.create(
+                header=f"Post {i} \u2014 needle", body="Body \"quoted\" " * i, category=cls.category,
+                author=(cls.user if i % 2 else cls.other_user).author_data,
+                toxicity=None if i % 3 else i / 7, toxicity_aspects=None if i % 2 else {"insult": 0.1, "threat": i},
+                moderation_status=Post.ModerationStatus.PENDING if i == 5 else Post.ModerationStatus.PUBLISHED,
+            )
+            post.tags.set(tags[i % 3:][::-1])
+            for _ in range(i % 4):
+                Comment.objects.create(content="Comment", post=post, user=cls.user)
+        cls.list_url = reverse("post-list")
+
+    def assertSameContent(self, url, params=None):
+        with override_settings(FAST_LIST_SERIALIZATION=False):
+            expected = self.client.get(url, params)
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, expected.content)
+        return response
+
+    def test_list_is_byte_identical(self):
+        """Тест, что быстрый путь отдает тот же ответ, что и сериализатор"""
+        self.client.force_authenticate(user=self.user)
+        for params in [{}, {"expand": ""}, {"expand": "author,category,tags"}, {"fields": "id,header,tags"},
+                       {"fields": "id,author,toxicity_aspects", "expand": "author"}, {"ordering": "toxicity"},
+                       {"ordering": "-comment_count", "page_size": 2}, {"search": "needle"}, {"tag_name": "Tag 2"},
+                       {"include": "body"}]:
+            with self.subTest(params=params):
+                self.assertSameContent(self.list_url, params)
+        next_url = self.assertSameContent(self.list_url, {"page_size": 3}).json()["next"]
+        self.assertSameContent(next_url)
+
+    def test_list_skips_model_instances(self):
+        """Тест, что быстрый путь читает строки через values() одним запросом на теги"""
+        with override_settings(FAST_LIST_SERIALIZATION=False):
+            expected = self.client.get(self.list_url, {"expand": "tags"})
+        with mock.patch.object(Post, "__init__") as init, mock.patch.object(Tag, "__init__") as tag_init, \
+                CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.list_url, {"expand": "tags"})
+        init.assert_not_called()
+        tag_init.assert_not_called()
+        self.assertEqual(response.content, expected.content)
+        self.assertEqual(len(response.json()["results"]), 6)
+        self.assertEqual(sum(query["sql"].startswith('SELECT "posts_post_tags"') for query in queries.captured_queries), 1)
+
+    def test_unsupported_serializer_falls_back(self):
+        """Тест, что сериализатор с неподдерживаемым полем выводится обычным путем"""
+        with mock.patch("applications.common.fast_serialization.compile_plan", return_value=None) as compile_plan:
+            self.assertSameContent(self.list_url)
+        compile_plan.assert_called_once()
+
+    def test_benchmark_reports_every_size(self):
+        """Тест, что бенчмарк сериализации выдает JSON по каждому размеру и эндпоинту"""
+        stdout = StringIO()
+        call_command("benchmark_serialization", sizes=[3, 5], repeat=1, host="testserver", stdout=stdout)
+        report = json.loads(stdout.getvalue())
+        self.assertEqual([(result["endpoint"], result["rows"]) for result in report["results"]],
+                         [(endpoint, rows) for rows in (3, 5) for endpoint in ("posts", "authors", "comments")])
+        for result in report["results"]:
+            self.assertTrue(result["identical"])
+            self.assertGreater(result["serializer_ms"], 0)
+            self.assertGreater(result["fast_ms"], 0)
+        self.assertEqual(Post.objects.count(), 7)
+
+
+@override_settings(POSTS_CACHE_ENABLED=False)
+class PostExcerptTestCase(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создает посты с длинным и коротким текстом"""
+        cls.user = User.objects.create_user(email="user@gmail.com", password="user123")
+        cls.category = Category.objects.create(name="Category")
+        cls.long_body = " ".join(f"слово{i}" for i in range(1500))[:10000]
+        cls.posts = [Post.objects.create(header=f"Post {i}", body=cls.long_body, author=cls.user.author_data,
+                                         category=cls.category) for i in range(5)]
+        cls.short = Post.objects.create(header="Short", body="Короткий текст", author=cls.user.author_data,
+                                        category=cls.category)
+        cls.list_url = reverse("post-list")
+
+    def setUp(self):
+        patch_toxicity_model(self)
+
+    def assertExcerptOf(self, excerpt, body):
+        self.assertLessEqual(len(excerpt), EXCERPT_LENGTH)
+        self.assertTrue(excerpt.endswith("…"))
+        # Cut at a word boundary.
+        self.assertTrue(body.startswith(excerpt[:-1] + " "))
+
+    def test_excerpt_is_computed_on_write(self):
+        """Тест, что отрывок вычисляется при создании и любом изменении текста"""
+        self.assertExcerptOf(Post.objects.get(id=self.posts[0].id).excerpt, self.long_body)
+        self.assertEqual(Post.objects.get(id=self.short.id).excerpt, "Короткий текст")
+        Post.objects.filter(id=self.short.id).update(body="x" * 400)
+        self.assertEqual(Post.objects.get(id=self.short.id).excerpt, "x" * (EXCERPT_LENGTH - 1) + "…")
+        self.client.force_authenticate(user=self.user)
+        response = self.client.patch(reverse("post-detail", args=[self.short.id]), {"body": "Новый текст"},
+                                     format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.json()["body"], response.json()["excerpt"]), ("Новый текст", "Новый текст"))
+
+    def test_list_returns_excerpt_without_loading_body(self):
+        """Тест, что список отдает отрывок и не читает текст поста из базы"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        post = response.json()["results"][-1]
+        self.assertNotIn("body", post)
+        self.assertExcerptOf(post["excerpt"], self.long_body)
+        self.assertFalse(any('"posts_post"."body"' in query["sql"] for query in queries.captured_queries))
+        full = self.client.get(self.list_url, {"include": "body"})
+        self.assertEqual(full.json()["results"][-1]["body"], self.long_body)
+        self.assertGreater(len(full.content), 10 * len(response.content))
+        response = self.client.get(self.list_url, {"fields": "id,body"})
+        self.assertEqual(response.json()["results"][0], {"id": self.short.id, "body": "Короткий текст"})
+        response = self.client.get(reverse("post-detail", args=[self.posts[0].id]))
+        self.assertEqual(response.json()["body"], self.long_body)
+
+
+@override_settings(POSTS_CACHE_ENABLED=False, RESPONSE_COMPRESSION_MIN_SIZE=1024)
+class PostRenderingTestCase(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создает посты с длинным текстом"""
+        cls.user = User.objects.create_user(email="user@gmail.com", password="user123")
+        cls.category = Category.objects.create(name="Category")
+        for i in range(5):
+            Post.objects.create(header=f"Пост {i} \u2028", body=f"Длинный текст {i} " * 200, toxicity=i / 3,
+                                author=cls.user.author_data, category=cls.category)
+        cls.list_url = reverse("post-list")
+
+    def setUp(self):
+        patch_toxicity_model(self)
+
+    def test_orjson_output_matches_json_renderer(self):
+        """Тест, что orjson выдает те же байты, что и стандартный JSON"""
+        if renderers.orjson is None:
+            self.skipTest("orjson is not installed")
+        with override_settings(API_ORJSON=False):
+            expected = self.client.get(self.list_url, {"expand": "author"})
+        response = self.client.get(self.list_url, {"expand": "author"})
+        self.assertEqual(response.content, expected.content)
+        self.assertIn(b"\\u2028", response.content)
+        indented = self.client.get(self.list_url, {"expand": "author"}, HTTP_ACCEPT="application/json; indent=2")
+        self.assertTrue(indented.content.startswith(b'{\n  "next"'))
+        self.assertEqual(indented.json(), response.json())
+
+    def test_orjson_parser(self):
+        """Тест, что тело запроса разбирается orjson, а ошибки остаются ошибками разбора"""
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(self.list_url, {"header": "Новый", "body": "Текст", "category": self.category.id},
+                                    format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()["header"], "Новый")
+        response = self.client.post(self.list_url, b'{"header": ', content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("JSON parse error", response.json()["detail"])
+
+    def test_msgpack_is_negotiated(self):
+        """Тест, что при Accept: application/msgpack ответ кодируется в MessagePack"""
+        if renderers.msgpack is None:
+            self.skipTest("msgpack is not installed")
+        response = self.client.get(self.list_url, HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertEqual(renderers.msgpack.unpackb(response.content), self.client.get(self.list_url).json())
+
+    def test_large_responses_are_compressed(self):
+        """Тест, что большие ответы сжимаются, а маленькие отдаются как есть"""
+        plain = self.client.get(self.list_url)
+        response = self.client.get(self.list_url, HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertLess(int(response["Content-Length"]) * 5, len(plain.content))
+        response = self.client.get(self.list_url, {"fields": "id"}, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        with override_settings(RESPONSE_COMPRESSION_ENABLED=False):
+            self.assertFalse(self.client.get(self.list_url, HTTP_ACCEPT_ENCODING="gzip").has_header("Content-Encoding"))
+
+    def test_accepted_encoding(self):
+        """Тест выбора кодировки по Accept-Encoding с учетом q"""
+        self.assertIsNone(compression.accepted_encoding(""))
+        self.assertIsNone(compression.accepted_encoding("identity, gzip;q=0"))
+        self.assertEqual(compression.accepted_encoding("deflate, GZIP;q=0.5"), "gzip")
+        self.assertEqual(compression.accepted_encoding("*"), compression.encodings()[0])
+        if compression.brotli is None:
+            self.assertEqual(compression.accepted_encoding("br, gzip;q=0.1"), "gzip")
+            return
+        self.assertEqual(compression.accepted_encoding("br, gzip"), "br")
+        self.assertEqual(compression.accepted_encoding("br;q=0.4, gzip;q=0.5"), "gzip")
+        response = self.client.get(self.list_url, HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(compression.brotli.decompress(response.content), self.client.get(self.list_url).content)
+
+    def test_benchmark_reports_every_combination(self):
+        """Тест, что бенчмарк выдает время и размер по каждому сочетанию формата и сжатия"""
+        stdout = StringIO()
+        call_command("benchmark_rendering", posts=3, repeat=1, host="testserver", stdout=stdout)
+        results = json.loads(stdout.getvalue())["results"]
+        self.assertEqual(len(results), (2 + (renderers.msgpack is not None)) * (1 + len(compression.encodings())))
+        sizes = {(result["renderer"], result["encoding"]): result["bytes"] for result in results}
+        self.assertLess(sizes["json", "gzip"], sizes["json", "identity"])
+        self.assertEqual(Post.objects.count(), 5)
+
+
+class ToxicityModelLoadingTestCase(APITestCase):
+
+    def setUp(self):
+        patchers = [
+            mock.patch.object(toxicity_model, '_toxicity_model', None),
+            mock.patch.object(toxicity_model, '_toxicity_model_ready', threading.Event()),
+            mock.patch.object(toxicity_model, 'ToxicityModel', FakeToxicityModel),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.url = reverse("readiness")
+
+    def test_model_is_not_loaded_on_import(self):
+        """Тест, что модель не загружается до первого обращения"""
+        self.assertIsNone(toxicity_model._toxicity_model)
+        model = toxicity_model.get_toxicity_model()
+        self.assertIsInstance(model, FakeToxicityModel)
+        self.assertIs(toxicity_model.get_toxicity_model(), model)
+
+    @override_settings(TOXICITY_WARMUP_ON_STARTUP=True)
+    def test_readiness_before_warm_up(self):
+        """Тест, что сервис не готов до прогрева модели"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        toxicity_model.get_toxicity_model()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    @override_settings(TOXICITY_WARMUP_ON_STARTUP=False)
+    def test_readiness_without_warm_up(self):
+        """Тест, что без прогрева при старте сервис готов до загрузки модели"""
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        self.assertIsNone(toxicity_model._toxicity_model)
+
+    def test_readiness_after_warm_up(self):
+        """Тест, что прогрев выполняет пробный инференс и переводит сервис в готовность"""
+        model = toxicity_model.warm_up()
+        self.assertEqual(model.calls, [toxicity_model.WARMUP_TEXT])
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class MetricsViewTestCase(APITestCase):
+
+    def setUp(self):
+        self.url = reverse("metrics")
+
+    @override_settings(METRICS_TOKEN="")
+    def test_metrics_are_not_public(self):
+        """Тест, что метрики недоступны анонимам и обычным пользователям"""
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.client.get(self.url, HTTP_X_METRICS_TOKEN="").status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.force_authenticate(user=User.objects.create_user(email="user@gmail.com", password="user123"))
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics_for_admins_and_token(self):
+        """Тест, что метрики видят администраторы и запросы с токеном METRICS_TOKEN"""
+        self.assertEqual(self.client.get(self.url, HTTP_X_METRICS_TOKEN="wrong").status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+        response = self.client.get(self.url, HTTP_X_METRICS_TOKEN="secret")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("toxicity_shed_total", response.json())
+        self.client.force_authenticate(user=User.objects.create_superuser(email="admin@gmail.com", password="admin123"))
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+
+
+class ToxicityBatcherTestCase(SimpleTestCase):
+
+    def test_concurrent_requests_share_one_forward_pass(self):
+        """Тест, что одновременные запросы объединяются в один батч"""
+        model = FakeToxicityModel()
+        batcher = ToxicityBatcher(lambda: model, max_batch_size=8, window=0.2, latency_cap=1)
+        futures = [batcher.submit(text) for text in ["hello", "toxic words", "world"]]
+        self.assertEqual([future.result(timeout=5)[1] for future in futures], [0.0, 1.0, 0.0])
+        self.assertEqual(model.calls, [["hello", "toxic words", "world"]])
+        self.assertGreaterEqual(batcher.batch_size.snapshot()["max"], 3)
+
+    def test_batch_is_flushed_at_max_size(self):
+        """Тест, что батч не превышает максимальный размер"""
+        model = FakeToxicityModel()
+        batcher = ToxicityBatcher(lambda: model, max_batch_size=2, window=0.2, latency_cap=1)
+        futures = [batcher.submit(f"text {i}") for i in range(5)]
+        for future in futures:
+            future.result(timeout=5)
+        self.assertTrue(all(len(call) <= 2 for call in model.calls))
+        self.assertEqual(sum(len(call) for call in model.calls), 5)
+
+    def test_model_error_is_passed_to_every_caller(self):
+        """Тест, что ошибка модели передается всем ожидающим запросам"""
+        class BrokenModel:
+            def text2toxicity(self, text, aggregate=True):
+                raise RuntimeError("boom")
+
+        batcher = ToxicityBatcher(BrokenModel, max_batch_size=4, window=0.05, latency_cap=1)
+        futures = [batcher.submit("a"), batcher.submit("b")]
+        for future in futures:
+            with self.assertRaises(RuntimeError):
+                future.result(timeout=5)
+
+
+class ToxicityServiceTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.model = FakeToxicityModel()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.socket_path = os.path.join(directory.name, "toxicity.sock")
+        batcher = ToxicityBatcher(lambda: self.model, window=0.001)
+        self.server = ToxicityServiceServer(self.socket_path, batcher)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def test_client_scores_through_service(self):
+        """Тест оценки текстов через внешний процесс с переиспользованием соединения"""
+        client = ToxicityServiceClient(self.socket_path, timeout=5)
+        self.assertTrue(client.ping())
+        connection = client._local.sock
+        self.assertEqual(client.aspects("toxic text"), [0.0, 1.0, 0.0, 0.0, 0.0])
+        self.assertEqual([aspects[1] for aspects in client.aspects_many(["ok", "toxic"])], [0.0, 1.0])
+        self.assertIs(client._local.sock, connection)
+
+    def test_client_reconnects_after_server_restart(self):
+        """Тест переподключения клиента к перезапущенному сервису"""
+        client = ToxicityServiceClient(self.socket_path, timeout=5)
+        self.assertEqual(client.aspects("fine")[0], 1.0)
+        self.server.shutdown()
+        self.server.server_close()
+        client._local.sock.close()
+        server = ToxicityServiceServer(self.socket_path, ToxicityBatcher(lambda: self.model, window=0.001))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.assertEqual(client.aspects("toxic")[0], 0.0)
+
+    def test_fallback_to_in_process_model(self):
+        """Тест резервной оценки в процессе, если сервис недоступен"""
+        patch_toxicity_model(self, self.model)
+        missing = self.socket_path + ".missing"
+        with mock.patch("applications.posts.scoring.get_toxicity_service_client",
+                        return_value=ToxicityServiceClient(missing, timeout=1)):
+            with override_settings(TOXICITY_SERVICE_SOCKET=missing, TOXICITY_SERVICE_FALLBACK=True,
+                                   TOXICITY_CACHE_ENABLED=False):
+                with self.assertLogs("applications.posts.scoring", "WARNING"):
+                    self.assertEqual(score_toxicity("toxic"), 1.0)
+            with override_settings(TOXICITY_SERVICE_SOCKET=missing, TOXICITY_SERVICE_FALLBACK=False,
+                                   TOXICITY_CACHE_ENABLED=False):
+                with self.assertRaises(ToxicityServiceUnavailable):
+                    score_toxicity("toxic")
+
+
+class ToxicityScoreCacheTestCase(TestCase):
+
+    def test_hash_ignores_whitespace_differences(self):
+        """Тест, что ключ кэша не зависит от пробельных символов"""
+        self.assertEqual(text_hash("Header\nSome   body "), text_hash(" Header Some body"))
+        self.assertNotEqual(text_hash("Header\nbody"), text_hash("Header\nBody"))
+
+    def test_memory_tier_is_bounded(self):
+        """Тест вытеснения самых старых записей из LRU"""
+        cache = ToxicityScoreCache(max_size=2)
+        cache.set("a", 0.1)
+        cache.set("b", 0.2)
+        cache.get("a")
+        cache.set("c", 0.3)
+        self.assertEqual(cache.get("a"), 0.1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 0.3)
+
+    def test_persistent_tier_survives_restart(self):
+        """Тест, что оценки сохраняются в базе и доступны новому процессу"""
+        ToxicityScoreCache(persistent=True).set("same text", [0.3, 0.7, 0.0, 0.0, 0.0])
+        self.assertAlmostEqual(ToxicityScore.objects.get().score, 0.7)
+        cache = ToxicityScoreCache(persistent=True)
+        self.assertEqual(cache.get("same  text"), [0.3, 0.7, 0.0, 0.0, 0.0])
+
+    def test_row_without_aspects_is_filled_in(self):
+        """Тест, что запись без аспектов, созданная до их появления, дополняется при новой оценке"""
+        cache = ToxicityScoreCache(persistent=True)
+        ToxicityScore.objects.create(text_hash=text_hash("old text"), model_version=toxicity_cache.model_version(),
+                                     score=0.7)
+        self.assertIsNone(cache.get("old text"))
+        cache.set("old text", [0.2, 0.8, 0.0, 0.0, 0.0])
+        self.assertEqual(ToxicityScore.objects.get().aspects, [0.2, 0.8, 0.0, 0.0, 0.0])
+        self.assertEqual(ToxicityScoreCache(persistent=True).get("old text"), [0.2, 0.8, 0.0, 0.0, 0.0])
+
+    def test_checkpoint_change_invalidates_cache(self):
+        """Тест, что смена чекпойнта модели делает кэш неактуальным"""
+        cache = ToxicityScoreCache(persistent=True)
+        cache.set("text", [0.6, 0.4, 0.0, 0.0, 0.0])
+        with mock.patch.object(toxicity_model.ToxicityModel, "model_checkpoint", "other/checkpoint"):
+            self.assertIsNone(cache.get("text"))
+        self.assertEqual(cache.get("text"), [0.6, 0.4, 0.0, 0.0, 0.0])
+
+    def test_chunking_change_invalidates_cache(self):
+        """Тест, что смена разбиения длинных текстов делает кэш неактуальным"""
+        cache = ToxicityScoreCache(persistent=True)
+        cache.set("text", [0.6, 0.4, 0.0, 0.0, 0.0])
+        for changed in ({"TOXICITY_CHUNK_AGGREGATION": "mean"}, {"TOXICITY_CHUNK_OVERLAP": 16},
+                        {"TOXICITY_MAX_CHUNKS": 4}):
+            with self.subTest(**changed), override_settings(**changed):
+                self.assertIsNone(cache.get("text"))
+        self.assertEqual(cache.get("text"), [0.6, 0.4, 0.0, 0.0, 0.0])
+
+    def test_repeated_text_is_scored_once(self):
+        """Тест, что повторная оценка того же текста не вызывает модель"""
+        model = patch_toxicity_model(self)
+        cache = ToxicityScoreCache()
+        with mock.patch("applications.posts.scoring.get_toxicity_cache", return_value=cache):
+            self.assertEqual(score_toxicity("toxic post"), 1.0)
+            self.assertEqual(score_toxicity("toxic   post"), 1.0)
+        self.assertEqual(len(model.calls), 1)
+
+
+class StandInCheckpointMixin:
+    """Собирает небольшую случайную модель без обращения к сети"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.TemporaryDirectory()
+        build_stand_in_checkpoint(cls.directory.name, hidden_size=32, num_layers=1, max_position_embeddings=64)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+        super().tearDownClass()
+
+
+class ToxicityChunkingTestCase(StandInCheckpointMixin, SimpleTestCase):
+
+    def load_model(self, **kwargs):
+        return ToxicityModel(model_checkpoint=self.directory.name, **kwargs)
+
+    def test_long_text_is_scored_in_one_pass(self):
+        """Тест, что все окна длинного текста оцениваются за один прямой проход"""
+        model = self.load_model(chunk_overlap=8)
+        long_text = "очень длинный текст " * 50
+        with mock.patch.object(model.model, "forward", wraps=model.model.forward) as forward:
+            score = model.text2toxicity(long_text)
+        self.assertEqual(forward.call_count, 1)
+        self.assertGreater(forward.call_args.kwargs["input_ids"].shape[0], 1)
+        self.assertTrue(0 <= score <= 1)
+
+    def test_forward_pass_size_is_capped(self):
+        """Тест, что прямой проход получает не больше TOXICITY_MAX_WINDOWS_PER_PASS окон"""
+        model = self.load_model(chunk_overlap=8, max_windows_per_pass=3)
+        uncapped = self.load_model(chunk_overlap=8)
+        texts = ["очень длинный текст " * 50, "короткий текст", "другой длинный текст " * 40] * 3
+        with mock.patch.object(model.model, "forward", wraps=model.model.forward) as forward:
+            scores = model.text2toxicity(texts, aggregate=False)
+        self.assertGreater(forward.call_count, 1)
+        for call in forward.call_args_list:
+            self.assertLessEqual(call.kwargs["input_ids"].shape[0], 3)
+        expected = uncapped.text2toxicity(texts, aggregate=False)
+        for row, expected_row in zip(scores.tolist(), expected.tolist()):
+            for value, expected_value in zip(row, expected_row):
+                self.assertAlmostEqual(value, expected_value, places=4)
+
+    def test_max_aggregation_takes_most_toxic_window(self):
+        """Тест, что при агрегации max берется самое токсичное окно"""
+        max_model = self.load_model(chunk_overlap=8)
+        mean_model = self.load_model(chunk_overlap=8, chunk_aggregation="mean")
+        long_text = "первое окно " * 20 + "second window " * 20
+        inputs, mapping = max_model._tokenize([long_text])
+        self.assertGreater(len(mapping), 1)
+        windows = max_model.text2toxicity(
+            [max_model.tokenizer.decode(ids, skip_special_tokens=True) for ids in inputs["input_ids"]]
+        )
+        self.assertAlmostEqual(float(max_model.text2toxicity(long_text)), float(max(windows)), places=4)
+        self.assertLessEqual(float(mean_model.text2toxicity(long_text)), float(max(windows)) + 1e-6)
+
+    def test_batch_mixes_short_and_long_texts(self):
+        """Тест, что короткие тексты в батче с длинными получают свою оценку"""
+        model = self.load_model(chunk_overlap=8)
+        scores = model.text2toxicity(["короткий", "длинный текст " * 40])
+        self.assertEqual(len(scores), 2)
+        self.assertAlmostEqual(float(scores[0]), float(model.text2toxicity("короткий")), places=4)
+
+    def test_windows_are_capped(self):
+        """Тест ограничения числа окон на текст"""
+        model = self.load_model(chunk_overlap=8, max_chunks=2)
+        clipped = model.clipped_texts.value
+        inputs, mapping = model._tokenize(["слово " * 200])
+        self.assertEqual(len(mapping), 2)
+        self.assertEqual(model.clipped_texts.value, clipped + 1)
+
+
+@override_settings(TOXICITY_ASYNC_MODERATION=True, TOXICITY_CACHE_ENABLED=False)
+class AsyncModerationTestCase(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создает тестовые данные перед набором тестов"""
+        cls.user = User.objects.create_user(email="user@gmail.com", password="user123")
+        cls.other_user = User.objects.create_user(email="otheruser@gmail.com", password="other123")
+        cls.category = Category.objects.create(name="Test Category")
+        cls.list_url = reverse("post-list")
+
+    def setUp(self):
+        self.toxicity_model = patch_toxicity_model(self)
+        caches["default"].clear()
+
+    def create_post(self, header, body):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(self.list_url, {"header": header, "body": body, "category": self.category.id},
+                                    format="json")
+        self.client.force_authenticate(user=None)
+        return response
+
+    def test_create_stores_pending_post_without_inference(self):
+        """Тест, что пост сохраняется в статусе pending без вызова модели"""
+        response = self.create_post("New Post", "Body")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()["moderation_status"], Post.ModerationStatus.PENDING)
+        self.assertEqual(self.toxicity_model.calls, [])
+        self.assertTrue(ModerationJob.objects.filter(post_id=response.json()["id"]).exists())
+
+    def test_pending_post_is_visible_only_to_author(self):
+        """Тест, что непроверенный пост виден только автору"""
+        post_id = self.create_post("New Post", "Body").json()["id"]
+        detail_url = reverse("post-detail", args=[post_id])
+
+        self.assertEqual(self.client.get(self.list_url).json()["results"], [])
+        self.assertEqual(self.client.get(detail_url).status_code, status.HTTP_404_NOT_FOUND)
+        self.client.force_authenticate(user=self.other_user)
+        self.assertEqual(self.client.get(detail_url).status_code, status.HTTP_404_NOT_FOUND)
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(len(self.client.get(self.list_url).json()["results"]), 1)
+        self.assertEqual(self.client.get(detail_url).status_code, status.HTTP_200_OK)
+
+    def test_worker_publishes_and_rejects_in_one_batch(self):
+        """Тест, что воркер проверяет очередь одним батчем"""
+        clean_id = self.create_post("Clean", "Body").json()["id"]
+        toxic_id = self.create_post("Toxic", "toxic body").json()["id"]
+
+        self.assertEqual(process_moderation_batch(batch_size=10), 2)
+        self.assertEqual(len(self.toxicity_model.calls), 1)
+        self.assertEqual(Post.objects.get(id=clean_id).moderation_status, Post.ModerationStatus.PUBLISHED)
+        self.assertEqual(Post.objects.get(id=toxic_id).moderation_status, Post.ModerationStatus.REJECTED)
+        self.assertEqual(Post.objects.get(id=toxic_id).toxicity_aspects["insult"], 1.0)
+        self.assertFalse(ModerationJob.objects.exists())
+        self.assertEqual(process_moderation_batch(), 0)
+        self.assertEqual([post["id"] for post in self.client.get(self.list_url).json()["results"]], [clean_id])
+
+
+class ToxicityBackendTestCase(StandInCheckpointMixin, SimpleTestCase):
+
+    def test_backends_match_fp32_scores(self):
+        """Тест, что квантованная и TorchScript модели совпадают с fp32"""
+        reference = ToxicityModel(model_checkpoint=self.directory.name).text2toxicity(PARITY_CORPUS)
+        for backend in ("int8", "torchscript"):
+            with self.subTest(backend=backend):
+                model = ToxicityModel(model_checkpoint=self.directory.name, backend=backend)
+                self.assertIsNotNone(model.parity_deviation)
+                scores = model.text2toxicity(PARITY_CORPUS)
+                self.assertTrue(all(abs(a - b) < 0.05 for a, b in zip(scores, reference)))
+
+    def test_parity_check_rejects_deviating_backend(self):
+        """Тест, что бэкенд с расхождением больше допуска не загружается"""
+        with self.assertRaises(ToxicityBackendParityError):
+            ToxicityModel(model_checkpoint=self.directory.name, backend="int8", parity_tolerance=0)
+
+    def test_exported_artifact_loads_without_checkpoint(self):
+        """Тест загрузки экспортированного артефакта без исходного чекпойнта"""
+        with tempfile.TemporaryDirectory() as output:
+            call_command("export_toxicity_model", output, backend="int8", checkpoint=self.directory.name,
+                         stdout=StringIO())
+            with mock.patch.object(ToxicityModel, "model_checkpoint", "missing/checkpoint"):
+                model = ToxicityModel(backend="int8", artifact_path=output)
+            long_text = "длинный текст " * 30
+            reference = ToxicityModel(model_checkpoint=self.directory.name).text2toxicity(long_text)
+            self.assertAlmostEqual(float(model.text2toxicity(long_text)), float(reference), places=2)
+
+
+class ToxicityBenchmarkTestCase(StandInCheckpointMixin, SimpleTestCase):
+
+    def test_benchmark_reports_every_configuration(self):
+        """Тест, что бенчмарк выдает JSON по каждой комбинации параметров"""
+        stdout = StringIO()
+        call_command("benchmark_toxicity", checkpoint=self.directory.name, lengths=[50, 500], batch_sizes=[1, 4],
+                     threads=[1], backends="torch,int8", repeat=2, stdout=stdout)
+        report = json.loads(stdout.getvalue())
+        self.assertEqual(len(report["results"]), 8)
+        self.assertEqual([load["backend"] for load in report["loads"]], ["torch", "int8"])
+        for result in report["results"]:
+            self.assertGreater(result["throughput_texts_per_s"], 0)
+            self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+            self.assertGreater(result["peak_rss_mb"], 0)
+
+
+@override_settings(TOXICITY_CACHE_ENABLED=False, TOXICITY_RETRY_AFTER=7)
+class ToxicityLoadSheddingTestCase(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создает тестовые данные перед набором тестов"""
+        cls.user = User.objects.create_user(email="user@gmail.com", password="user123")
+        cls.category = Category.objects.create(name="Test Category")
+        cls.list_url = reverse("post-list")
+        cls.data = {"header": "New Post", "body": "Body", "category": cls.category.id}
+
+    def setUp(self):
+        self.toxicity_model = patch_toxicity_model(self)
+        self.client.force_authenticate(user=self.user)
+
+    def saturate_limiter(self):
+        limiter = threading.BoundedSemaphore(1)
+        limiter.acquire()
+        patcher = mock.patch.object(scoring, "_limiter", limiter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @override_settings(TOXICITY_OVERLOAD_POLICY="reject", TOXICITY_QUEUE_TIMEOUT_MS=0)
+    def test_reject_policy_returns_503_with_retry_after(self):
+        """Тест отказа с 503 и Retry-After при превышении лимита"""
+        self.saturate_limiter()
+        shed = scoring.shed_by_concurrency.value
+        response = self.client.post(self.list_url, self.data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response["Retry-After"], "7")
+        self.assertEqual(scoring.shed_by_concurrency.value, shed + 1)
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(TOXICITY_OVERLOAD_POLICY="pending", TOXICITY_QUEUE_TIMEOUT_MS=0)
+    def test_pending_policy_defers_check_to_queue(self):
+        """Тест отложенной проверки поста при перегрузке"""
+        self.saturate_limiter()
+        response = self.client.post(self.list_url, self.data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()["moderation_status"], Post.ModerationStatus.PENDING)
+        self.assertTrue(ModerationJob.objects.filter(post_id=response.json()["id"]).exists())
+
+    @override_settings(TOXICITY_OVERLOAD_POLICY="fail_open", TOXICITY_QUEUE_TIMEOUT_MS=0)
+    def test_fail_open_policy_publishes_post(self):
+        """Тест публикации без проверки при политике fail_open"""
+        self.saturate_limiter()
+        response = self.client.post(self.list_url, self.data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()["moderation_status"], Post.ModerationStatus.PUBLISHED)
+        self.assertEqual(self.toxicity_model.calls, [])
+
+    @override_settings(TOXICITY_OVERLOAD_POLICY="reject", TOXICITY_DEADLINE_MS=50, TOXICITY_BATCHING_ENABLED=True)
+    def test_deadline_sheds_slow_inference(self):
+        """Тест отказа при превышении времени на проверку"""
+        class SlowModel(FakeToxicityModel):
+            def text2toxicity(self, text, aggregate=True):
+                time.sleep(0.3)
+                return super().text2toxicity(text, aggregate)
+
+        batcher = ToxicityBatcher(SlowModel, window=0.001)
+        shed = scoring.shed_by_deadline.value
+        with mock.patch("applications.posts.scoring.get_toxicity_batcher", return_value=batcher):
+            response = self.client.post(self.list_url, self.data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(scoring.shed_by_deadline.value, shed + 1)
+
+
+@override_settings(TOXICITY_CACHE_ENABLED=False)
+class RemoderationTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создает тестовые данные перед набором тестов"""
+        user = User.objects.create_user(email="user@gmail.com", password="user123")
+        category = Category.objects.create(name="Test Category")
+        cls.posts = [
+            Post.objects.create(header=f"Post {i}", body="toxic body" if i % 3 == 0 else "body",
+                                author=user.author_data, category=category)
+            for i in range(7)
+        ]
+
+    def setUp(self):
+        self.toxicity_model = patch_toxicity_model(self)
+
+    def statuses(self):
+        return dict(Post.objects.values_list("id", "moderation_status"))
+
+    def test_rejects_toxic_posts_in_batches(self):
+        """Тест повторной проверки постов пакетами"""
+        checkpoint = remoderate_posts(batch_size=3, chunk_size=2)
+        self.assertEqual((checkpoint.processed, checkpoint.changed), (7, 3))
+        self.assertFalse(Post.objects.filter(toxicity__isnull=True).exists())
+        self.assertEqual([len(call) for call in self.toxicity_model.calls], [3, 3, 1])
+        rejected = [post.id for post in self.posts if "toxic" in post.body]
+        self.assertEqual(
+            sorted(post_id for post_id, moderation_status in self.statuses().items()
+                   if moderation_status == Post.ModerationStatus.REJECTED),
+            sorted(rejected),
+        )
+
+    def test_threshold_change_restores_posts(self):
+        """Тест, что повышение порога возвращает посты в публикацию"""
+        remoderate_posts(batch_size=10)
+        checkpoint = remoderate_posts(batch_size=10, threshold=1.0, reset=True)
+        self.assertEqual(checkpoint.changed, 3)
+        self.assertEqual(set(self.statuses().values()), {Post.ModerationStatus.PUBLISHED})
+
+    def test_resumes_after_interruption(self):
+        """Тест продолжения с сохраненной позиции после сбоя"""
+        calls = []
+
+        def flaky(texts):
+            calls.append(len(texts))
+            if len(calls) == 2:
+                raise RuntimeError("interrupted")
+            return [FakeToxicityModel.score(text, aggregate=False) for text in texts]
+
+        with mock.patch("applications.posts.moderation.toxicity_aspects_many", side_effect=flaky):
+            with self.assertRaises(RuntimeError):
+                remoderate_posts(batch_size=3)
+            checkpoint = RemoderationCheckpoint.objects.get(name="posts:0/1")
+            self.assertEqual(checkpoint.last_id, self.posts[2].id)
+            checkpoint = remoderate_posts(batch_size=3)
+        self.assertEqual(checkpoint.processed, 7)
+        self.assertEqual(calls, [3, 3, 3, 1])
+
+    def test_command_refuses_progress_of_other_worker_count(self):
+        """Тест, что команда не начинает заново молча при другом числе процессов"""
+        remoderate_posts(batch_size=10, shard=0, shards=2)
+        with self.assertRaisesMessage(CommandError, "--workers 2"):
+            call_command("remoderate", stdout=StringIO())
+        call_command("remoderate", reset=True, stdout=StringIO())
+        self.assertEqual(list(RemoderationCheckpoint.objects.values_list("name", flat=True)), ["posts:0/1"])
+
+    def test_shards_cover_every_post_once(self):
+        """Тест, что шарды для нескольких процессов не пересекаются"""
+        first = remoderate_posts(batch_size=10, shard=0, shards=2)
+        second = remoderate_posts(batch_size=10, shard=1, shards=2)
+        self.assertEqual(first.processed + second.processed, 7)
+        self.assertEqual(first.changed + second.changed, 3)
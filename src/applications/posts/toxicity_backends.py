@@ -0,0 +1,100 @@
+"""
+CPU inference backends for ToxicityModel.
+
+    torch        full precision PyTorch model (reference)
+    int8         linear layers quantized to int8 with dynamic quantization
+    torchscript  traced TorchScript graph of the fp32 model
+
+A backend is either built at load time from the checkpoint or loaded from an
+artifact directory written by `manage.py export_toxicity_model`, which holds
+the tokenizer, the TorchScript graph and the fp32 reference scores of
+PARITY_CORPUS, so loading it needs no network and no fp32 weights.
+"""
+import json
+import os
+
+import numpy as np
+import torch
+
+BACKENDS = ('torch', 'int8', 'torchscript')
+
+ARTIFACT_GRAPH = 'model.pt'
+ARTIFACT_METADATA = 'metadata.json'
+
+PARITY_CORPUS = [
+    'Спасибо за интересную статью, было полезно прочитать.',
+    'Какой же ты идиот, даже читать противно.',
+    'Я тебя найду и тебе не поздоровится.',
+    'Новости сегодня: в городе открылась новая библиотека.',
+    'Thanks for sharing, this is a great post.',
+    'You are a stupid idiot and nobody likes you.',
+    'Ну и бред ты написал, автор, удали это немедленно!!!',
+    'ok',
+]
+
+
+class ToxicityBackendParityError(Exception):
+    pass
+
+
+class LogitsModule(torch.nn.Module):
+    """Adapts a transformers model to a positional (input_ids, attention_mask, token_type_ids) -> logits call."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask, token_type_ids):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask,
+                          token_type_ids=token_type_ids).logits
+
+
+def quantize_int8(module):
+    return torch.ao.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def trace(module, tokenizer, max_length):
+    example = tokenizer(PARITY_CORPUS[:2], return_tensors='pt', padding=True, truncation=True,
+                        max_length=max_length, return_token_type_ids=True)
+    with torch.no_grad():
+        return torch.jit.trace(
+            module, (example['input_ids'], example['attention_mask'], example['token_type_ids']), strict=False
+        )
+
+
+def build_backend(model, tokenizer, backend, max_length):
+    """Return a positional logits callable for backend built from the fp32 model."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown toxicity backend: {backend!r}")
+    module = LogitsModule(model).eval()
+    if backend == 'int8':
+        return quantize_int8(module)
+    if backend == 'torchscript':
+        return trace(module, tokenizer, max_length)
+    return module
+
+
+def export_artifact(path, tokenizer, graph, metadata):
+    os.makedirs(path, exist_ok=True)
+    tokenizer.save_pretrained(path)
+    torch.jit.save(graph, os.path.join(path, ARTIFACT_GRAPH))
+    with open(os.path.join(path, ARTIFACT_METADATA), 'w') as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=2)
+
+
+def load_artifact(path):
+    """Return (graph, metadata) of an exported artifact."""
+    with open(os.path.join(path, ARTIFACT_METADATA)) as f:
+        metadata = json.load(f)
+    graph = torch.jit.load(os.path.join(path, ARTIFACT_GRAPH), map_location='cpu')
+    return graph.eval(), metadata
+
+
+def check_parity(scores, reference, tolerance):
+    """Raise ToxicityBackendParityError if any score deviates from the fp32 reference by more than tolerance."""
+    deviation = float(np.max(np.abs(np.asarray(scores) - np.asarray(reference))))
+    if deviation > tolerance:
+        raise ToxicityBackendParityError(
+            f"Backend scores deviate from fp32 by {deviation:.4f} (tolerance {tolerance})"
+        )
+    return deviation
@@ -0,0 +1,148 @@
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from django.conf import settings
+
+from applications.common import metrics
+from .toxicity_model import get_toxicity_model
+
+logger = logging.getLogger(__name__)
+
+
+class _Request:
+    __slots__ = ('text', 'future', 'enqueued_at')
+
+    def __init__(self, text):
+        self.text = text
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class ToxicityBatcher:
+    """
+    Collects concurrent scoring requests and runs them through the model as one
+    padded batch. A batch is flushed when it reaches max_batch_size or when the
+    oldest request has waited for the batching window. The window is shortened
+    so that waiting plus the p99 of recent forward passes stays under
+    latency_cap.
+    """
+
+    def __init__(self, model_getter=get_toxicity_model, max_batch_size=32, window=0.005,
+                 latency_cap=0.2, metrics_prefix='toxicity'):
+        self.model_getter = model_getter
+        self.max_batch_size = max_batch_size
+        self.window = window
+        self.latency_cap = latency_cap
+        self._queue = queue.Queue()
+        self._inference_times = deque(maxlen=100)
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+        self.batches = metrics.counter(f'{metrics_prefix}_batches_total')
+        self.items = metrics.counter(f'{metrics_prefix}_batch_items_total')
+        self.batch_size = metrics.histogram(f'{metrics_prefix}_batch_size')
+        self.queue_time = metrics.histogram(f'{metrics_prefix}_batch_queue_seconds')
+        self.inference_time = metrics.histogram(f'{metrics_prefix}_batch_inference_seconds')
+
+    def submit(self, text):
+        """Queue text for scoring and return a Future resolving to its toxicity aspect vector."""
+        self._ensure_worker()
+        request = _Request(text)
+        self._queue.put(request)
+        return request.future
+
+    def score(self, text, timeout=None):
+        future = self.submit(text)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            with self._worker_lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(target=self._run, name='toxicity-batcher', daemon=True)
+                    self._worker.start()
+
+    def _predicted_inference_time(self):
+        if not self._inference_times:
+            return 0.0
+        times = sorted(self._inference_times)
+        return times[min(len(times) - 1, int(0.99 * len(times)))]
+
+    def _flush_deadline(self, first):
+        window = self.window
+        if self.latency_cap:
+            window = min(window, max(0.0, self.latency_cap - self._predicted_inference_time()))
+        return first.enqueued_at + window
+
+    def _collect(self):
+        first = self._queue.get()
+        batch = [first]
+        deadline = self._flush_deadline(first)
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                self._process(batch)
+            except Exception:
+                logger.exception('Toxicity batcher failed to process a batch')
+
+    def _process(self, batch):
+        # Callers that gave up waiting have cancelled their futures, skip them.
+        batch = [request for request in batch if request.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        started = time.monotonic()
+        for request in batch:
+            self.queue_time.observe(started - request.enqueued_at)
+        self.batches.inc()
+        self.items.inc(len(batch))
+        self.batch_size.observe(len(batch))
+
+        try:
+            aspects = self.model_getter().text2toxicity([request.text for request in batch], aggregate=False)
+        except Exception as exc:
+            for request in batch:
+                request.future.set_exception(exc)
+            return
+
+        elapsed = time.monotonic() - started
+        self._inference_times.append(elapsed)
+        self.inference_time.observe(elapsed)
+        for request, vector in zip(batch, aspects):
+            request.future.set_result([float(value) for value in vector])
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_toxicity_batcher():
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = ToxicityBatcher(
+                    max_batch_size=settings.TOXICITY_BATCH_MAX_SIZE,
+                    window=settings.TOXICITY_BATCH_WINDOW_MS / 1000,
+                    latency_cap=settings.TOXICITY_BATCH_LATENCY_CAP_MS / 1000,
+                )
+    return _batcher
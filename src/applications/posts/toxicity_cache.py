@@ -0,0 +1,109 @@
+import hashlib
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+from django.conf import settings
+
+from applications.common import metrics
+from .models import ToxicityScore
+from .toxicity_model import ToxicityModel, aggregate_toxicity
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    """Canonical form used for hashing: NFC, collapsed whitespace, no surrounding blanks."""
+    return _WHITESPACE.sub(' ', unicodedata.normalize('NFC', text)).strip()
+
+
+def text_hash(text):
+    return hashlib.sha256(normalize_text(text).encode()).hexdigest()
+
+
+def model_version():
+    """
+    Identifies the scores a checkpoint, backend and chunking of long texts
+    produce; part of every cache key.
+    """
+    return (f'{ToxicityModel.model_checkpoint}:{settings.TOXICITY_BACKEND}:{settings.TOXICITY_CHUNK_AGGREGATION}'
+            f':{settings.TOXICITY_CHUNK_OVERLAP}:{settings.TOXICITY_MAX_CHUNKS}')
+
+
+class ToxicityScoreCache:
+    """
+    Two-tier cache of toxicity aspect vectors keyed by (text hash, model version):
+    a bounded in-process LRU in front of the optional ToxicityScore table.
+    """
+
+    def __init__(self, max_size=10000, persistent=False):
+        self.max_size = max_size
+        self.persistent = persistent
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.memory_hits = metrics.counter('toxicity_cache_memory_hits_total')
+        self.persistent_hits = metrics.counter('toxicity_cache_persistent_hits_total')
+        self.misses = metrics.counter('toxicity_cache_misses_total')
+
+    def _remember(self, key, aspects):
+        with self._lock:
+            self._entries[key] = aspects
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get(self, text):
+        key = (text_hash(text), model_version())
+        with self._lock:
+            aspects = self._entries.get(key)
+            if aspects is not None:
+                self._entries.move_to_end(key)
+        if aspects is not None:
+            self.memory_hits.inc()
+            return aspects
+
+        if self.persistent:
+            aspects = ToxicityScore.objects.filter(
+                text_hash=key[0], model_version=key[1]
+            ).values_list('aspects', flat=True).first()
+            if aspects:
+                self.persistent_hits.inc()
+                self._remember(key, aspects)
+                return aspects
+
+        self.misses.inc()
+        return None
+
+    def set(self, text, aspects):
+        key = (text_hash(text), model_version())
+        self._remember(key, aspects)
+        if self.persistent:
+            ToxicityScore.objects.bulk_create(
+                [ToxicityScore(text_hash=key[0], model_version=key[1], score=aggregate_toxicity(aspects),
+                               aspects=aspects)],
+                # Fills in rows without aspects, which predate them (migration 0005).
+                update_conflicts=True, unique_fields=['text_hash', 'model_version'],
+                update_fields=['score', 'aspects'],
+            )
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_toxicity_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ToxicityScoreCache(
+                    max_size=settings.TOXICITY_CACHE_SIZE,
+                    persistent=settings.TOXICITY_CACHE_PERSISTENT,
+                )
+    return _cache
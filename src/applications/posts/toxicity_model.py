@@ -1,21 +1,162 @@
-import torch
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
+import logging
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from applications.common import metrics
+
+logger = logging.getLogger(__name__)
+
+# Output labels of cointegrated/rubert-tiny-toxicity, in model order.
+TOXICITY_ASPECTS = ['non-toxic', 'insult', 'obscenity', 'threat', 'dangerous']
+
+
+def aggregate_toxicity(aspects):
+    """Collapse an aspect vector into one score, as text2toxicity(aggregate=True) does."""
+    return float(1 - aspects[0] * (1 - aspects[-1]))
+
+
+def aspects_as_dict(aspects):
+    return dict(zip(TOXICITY_ASPECTS, aspects))
 
 
 class ToxicityModel:
+    """
+    Texts longer than the model's maximum length are split into overlapping
+    token windows, scored in forward passes of at most max_windows_per_pass
+    windows (one pass for most calls), and the window results are combined
+    per text: 'max' takes the most toxic window, 'mean' averages the aspect
+    probabilities.
+
+    Inference runs on one of toxicity_backends.BACKENDS, built from the
+    checkpoint or loaded from an exported artifact. Non-reference backends are
+    checked against fp32 scores of a fixture corpus when they are loaded.
+    """
     model_checkpoint = 'cointegrated/rubert-tiny-toxicity'
 
-    def __init__(self):
-        self.tokenizer = AutoTokenizer.from_pretrained(self.model_checkpoint)
-        self.model = AutoModelForSequenceClassification.from_pretrained(self.model_checkpoint)
-        if torch.cuda.is_available():
-            self.model.cuda()
+    def __init__(self, chunk_overlap=64, max_chunks=32, chunk_aggregation='max', model_checkpoint=None,
+                 backend='torch', artifact_path=None, parity_tolerance=0.05, max_windows_per_pass=64):
+        import torch
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+        from . import toxicity_backends
+
+        if model_checkpoint:
+            self.model_checkpoint = model_checkpoint
+        if chunk_aggregation not in ('max', 'mean'):
+            raise ValueError(f"Unknown chunk aggregation: {chunk_aggregation!r}")
+        if backend not in toxicity_backends.BACKENDS:
+            raise ValueError(f"Unknown toxicity backend: {backend!r}")
+        self.chunk_overlap = chunk_overlap
+        self.max_chunks = max_chunks
+        self.chunk_aggregation = chunk_aggregation
+        self.max_windows_per_pass = max(1, max_windows_per_pass)
+
+        self.chunks_per_text = metrics.histogram('toxicity_chunks_per_text')
+        self.clipped_texts = metrics.counter('toxicity_clipped_texts_total')
+        self.forward_time = metrics.histogram('toxicity_forward_seconds')
+        self.chunked_forward_time = metrics.histogram('toxicity_chunked_forward_seconds')
+
+        if artifact_path:
+            self.tokenizer = AutoTokenizer.from_pretrained(artifact_path)
+            self.model, metadata = toxicity_backends.load_artifact(artifact_path)
+            if metadata['backend'] != backend:
+                raise ValueError(f"Artifact {artifact_path} holds backend {metadata['backend']!r}, not {backend!r}")
+            if metadata['model_checkpoint'] != self.model_checkpoint:
+                logger.warning('Artifact %s was exported from %s, expected %s',
+                               artifact_path, metadata['model_checkpoint'], self.model_checkpoint)
+            self.backend = backend
+            self.max_length = metadata['max_length']
+            self.device = torch.device('cpu')
+            reference = metadata['reference']
+        else:
+            self.tokenizer = AutoTokenizer.from_pretrained(self.model_checkpoint)
+            self.model = AutoModelForSequenceClassification.from_pretrained(self.model_checkpoint).eval()
+            self.max_length = min(self.tokenizer.model_max_length, self.model.config.max_position_embeddings)
+            self.device = torch.device('cuda' if backend == 'torch' and torch.cuda.is_available() else 'cpu')
+            self.model.to(self.device)
+            self.backend = 'torch'
+            reference = None
+            if backend != 'torch':
+                # Score the fixture corpus with the fp32 model before replacing it.
+                reference = self.text2toxicity(toxicity_backends.PARITY_CORPUS, aggregate=False)
+                self.model = toxicity_backends.build_backend(self.model, self.tokenizer, backend, self.max_length)
+                self.backend = backend
+
+        self.parity_deviation = None
+        if reference is not None:
+            self.parity_deviation = toxicity_backends.check_parity(
+                self.text2toxicity(toxicity_backends.PARITY_CORPUS, aggregate=False), reference, parity_tolerance
+            )
+            logger.info('Toxicity backend %s deviates from fp32 by at most %.5f', backend, self.parity_deviation)
+
+    def _logits(self, inputs):
+        if self.backend == 'torch':
+            return self.model(**inputs).logits
+        return self.model(inputs['input_ids'], inputs['attention_mask'], inputs['token_type_ids'])
+
+    def _tokenize(self, texts):
+        """Tokenize texts into windows, returning the inputs and the text index of each window."""
+        inputs = self.tokenizer(texts, return_tensors='pt', truncation=True, padding=True,
+                                max_length=self.max_length, stride=min(self.chunk_overlap, self.max_length // 2),
+                                return_token_type_ids=True,
+                                return_overflowing_tokens=self.tokenizer.is_fast)
+        mapping = inputs.pop('overflow_to_sample_mapping', None)
+        if mapping is None:
+            return inputs, np.arange(len(texts))
+        mapping = mapping.numpy()
+
+        keep, seen = [], {}
+        for row, index in enumerate(mapping):
+            seen[index] = seen.get(index, 0) + 1
+            if seen[index] <= self.max_chunks:
+                keep.append(row)
+        for count in seen.values():
+            self.chunks_per_text.observe(count)
+            if count > self.max_chunks:
+                self.clipped_texts.inc()
+        if len(keep) < len(mapping):
+            inputs = inputs.__class__({key: value[keep] for key, value in inputs.items()})
+            mapping = mapping[keep]
+        return inputs, mapping
+
+    def _combine(self, proba, mapping, size):
+        if len(mapping) == size:
+            return proba
+        window_toxicity = 1 - proba.T[0] * (1 - proba.T[-1])
+        combined = np.empty((size, proba.shape[1]), dtype=proba.dtype)
+        for index in range(size):
+            rows = np.flatnonzero(mapping == index)
+            if self.chunk_aggregation == 'mean':
+                combined[index] = proba[rows].mean(axis=0)
+            else:
+                combined[index] = proba[rows[np.argmax(window_toxicity[rows])]]
+        return combined
 
     def text2toxicity(self, text, aggregate=True):
         """ Calculate toxicity of a text (if aggregate=True) or a vector of toxicity aspects (if aggregate=False)"""
+        import torch
+
+        texts = [text] if isinstance(text, str) else list(text)
+        started = time.perf_counter()
+        cap = self.max_windows_per_pass
+        probas, mappings = [], []
         with torch.no_grad():
-            inputs = self.tokenizer(text, return_tensors='pt', truncation=True, padding=True).to(self.model.device)
-            proba = torch.sigmoid(self.model(**inputs).logits).cpu().numpy()
+            # Tokenized in groups of cap texts, so a batch of long texts is never
+            # held at once; each group's windows are scored cap rows at a time.
+            for first in range(0, len(texts), cap):
+                inputs, mapping = self._tokenize(texts[first:first + cap])
+                for row in range(0, len(mapping), cap):
+                    window = inputs.__class__({key: value[row:row + cap] for key, value in inputs.items()})
+                    probas.append(torch.sigmoid(self._logits(window.to(self.device))).cpu().numpy())
+                mappings.append(mapping + first)
+        proba, mapping = np.concatenate(probas), np.concatenate(mappings)
+        proba = self._combine(proba, mapping, len(texts))
+        elapsed = time.perf_counter() - started
+        (self.chunked_forward_time if len(mapping) > len(texts) else self.forward_time).observe(elapsed)
+
         if isinstance(text, str):
             proba = proba[0]
         if aggregate:
@@ -23,4 +164,53 @@ class ToxicityModel:
         return proba
 
 
-toxicity_model = ToxicityModel()
+WARMUP_TEXT = 'Прогрев модели. Model warm-up.'
+
+_toxicity_model = None
+_toxicity_model_lock = threading.Lock()
+_toxicity_model_ready = threading.Event()
+
+
+def get_toxicity_model():
+    """Return the process-wide ToxicityModel, loading it on first use."""
+    global _toxicity_model
+    if _toxicity_model is None:
+        with _toxicity_model_lock:
+            if _toxicity_model is None:
+                _toxicity_model = ToxicityModel(
+                    chunk_overlap=settings.TOXICITY_CHUNK_OVERLAP,
+                    max_chunks=settings.TOXICITY_MAX_CHUNKS,
+                    chunk_aggregation=settings.TOXICITY_CHUNK_AGGREGATION,
+                    backend=settings.TOXICITY_BACKEND,
+                    artifact_path=settings.TOXICITY_MODEL_ARTIFACT or None,
+                    parity_tolerance=settings.TOXICITY_BACKEND_TOLERANCE,
+                    max_windows_per_pass=settings.TOXICITY_MAX_WINDOWS_PER_PASS,
+                )
+    return _toxicity_model
+
+
+def warm_up():
+    """Load the model and run a dummy inference, then mark the process as ready."""
+    model = get_toxicity_model()
+    model.text2toxicity(WARMUP_TEXT)
+    _toxicity_model_ready.set()
+    return model
+
+
+def warm_up_in_background():
+    """Start warm_up() in a daemon thread so the server can bind its socket meanwhile."""
+    def run():
+        try:
+            warm_up()
+        except Exception:
+            logger.exception('Toxicity model warm-up failed')
+
+    thread = threading.Thread(target=run, name='toxicity-warm-up', daemon=True)
+    thread.start()
+    return thread
+
+
+def is_ready():
+    # Without a warm-up on startup the model loads on the first request, which
+    # a load balancer gating on readiness would never send.
+    return _toxicity_model_ready.is_set() or not settings.TOXICITY_WARMUP_ON_STARTUP
@@ -0,0 +1,178 @@
+"""
+Out-of-process toxicity scoring.
+
+One `run_toxicity_service` process owns the model and listens on a Unix domain
+socket; web workers talk to it through ToxicityServiceClient. Messages are JSON
+documents prefixed with their length as a 4-byte big-endian integer:
+
+    {"op": "score", "texts": [...]}  ->  {"aspects": [[...], ...]}
+    {"op": "ping"}                   ->  {"ready": true}
+    errors                           ->  {"error": "..."}
+"""
+import json
+import logging
+import os
+import socket
+import socketserver
+import struct
+import threading
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct('>I')
+MAX_MESSAGE_SIZE = 16 * 1024 * 1024
+
+
+class ToxicityServiceUnavailable(Exception):
+    pass
+
+
+class ToxicityServiceTimeout(ToxicityServiceUnavailable, TimeoutError):
+    pass
+
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise ConnectionError('Connection closed by peer')
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def send_message(sock, message):
+    payload = json.dumps(message, ensure_ascii=False).encode()
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def recv_message(sock):
+    (size,) = _HEADER.unpack(_recv_exactly(sock, _HEADER.size))
+    if size > MAX_MESSAGE_SIZE:
+        raise ValueError(f'Message of {size} bytes exceeds the limit')
+    return json.loads(_recv_exactly(sock, size))
+
+
+class _ToxicityRequestHandler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        # Clients keep their connection open, so serve requests until it is closed.
+        while True:
+            try:
+                message = recv_message(self.request)
+            except (ConnectionError, OSError):
+                return
+            try:
+                response = self.server.dispatch(message)
+            except Exception as exc:
+                logger.exception('Toxicity service failed to handle a request')
+                response = {'error': str(exc)}
+            try:
+                send_message(self.request, response)
+            except OSError:
+                return
+
+
+class ToxicityServiceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Scores texts from every connected worker. Each connection gets a thread and
+    all of them submit to one shared batcher, so concurrent requests from
+    different workers end up in the same forward pass.
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path, batcher):
+        self.batcher = batcher
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        super().__init__(socket_path, _ToxicityRequestHandler)
+
+    def dispatch(self, message):
+        op = message.get('op')
+        if op == 'ping':
+            return {'ready': True}
+        if op == 'score':
+            futures = [self.batcher.submit(text) for text in message['texts']]
+            return {'aspects': [future.result() for future in futures]}
+        return {'error': f'Unknown op: {op!r}'}
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+class ToxicityServiceClient:
+    """Keeps one connection per thread and reconnects once if it went stale."""
+
+    def __init__(self, socket_path, timeout):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None:
+            sock.close()
+        self._local.sock = None
+
+    def request(self, message, timeout=None):
+        timeout = self.timeout if timeout is None else min(timeout, self.timeout)
+        for attempt in range(2):
+            sock = getattr(self._local, 'sock', None)
+            reused = sock is not None
+            try:
+                if sock is None:
+                    sock = self._local.sock = self._connect()
+                sock.settimeout(timeout)
+                send_message(sock, message)
+                response = recv_message(sock)
+            except socket.timeout as exc:
+                # The reply may still arrive later, so the connection cannot be reused.
+                self._close()
+                raise ToxicityServiceTimeout('Toxicity service timed out') from exc
+            except (OSError, ValueError) as exc:
+                self._close()
+                if reused and attempt == 0:
+                    continue
+                raise ToxicityServiceUnavailable(f'Toxicity service is unreachable: {exc}') from exc
+            if 'error' in response:
+                raise ToxicityServiceUnavailable(response['error'])
+            return response
+
+    def aspects_many(self, texts, timeout=None):
+        return self.request({'op': 'score', 'texts': list(texts)}, timeout)['aspects']
+
+    def aspects(self, text, timeout=None):
+        return self.aspects_many([text], timeout)[0]
+
+    def ping(self):
+        try:
+            return self.request({'op': 'ping'}).get('ready', False)
+        except ToxicityServiceUnavailable:
+            return False
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_toxicity_service_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ToxicityServiceClient(
+                    settings.TOXICITY_SERVICE_SOCKET,
+                    timeout=settings.TOXICITY_SERVICE_TIMEOUT_MS / 1000,
+                )
+    return _client
@@ -0,0 +1,46 @@
+"""
+Builds a small randomly initialised checkpoint with the same interface as
+cointegrated/rubert-tiny-toxicity (BERT tokenizer, 5 sigmoid outputs). It
+needs no network access and is used by tests and benchmarks; its scores are
+meaningless but its cost scales with input length like the real model.
+"""
+import os
+import string
+
+LABELS = ['non-toxic', 'insult', 'obscenity', 'threat', 'dangerous']
+SPECIAL_TOKENS = ['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]']
+CYRILLIC = 'абвгдеёжзийклмнопрстуфхцчшщъыьэюя'
+
+
+def _vocabulary():
+    letters = string.ascii_lowercase + CYRILLIC + string.digits
+    return SPECIAL_TOKENS + list(letters + string.punctuation) + [f'##{letter}' for letter in letters]
+
+
+def build_stand_in_checkpoint(path, hidden_size=312, num_layers=3, max_position_embeddings=512, seed=0):
+    """Save a stand-in tokenizer and model to path and return the path."""
+    import torch
+    from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+
+    vocabulary = _vocabulary()
+    os.makedirs(path, exist_ok=True)
+    vocab_file = os.path.join(path, 'vocab.txt')
+    with open(vocab_file, 'w') as f:
+        f.write('\n'.join(vocabulary))
+    BertTokenizerFast(vocab_file, model_max_length=max_position_embeddings).save_pretrained(path)
+
+    torch.manual_seed(seed)
+    config = BertConfig(
+        vocab_size=len(vocabulary),
+        hidden_size=hidden_size,
+        num_hidden_layers=num_layers,
+        num_attention_heads=12 if hidden_size % 12 == 0 else 2,
+        intermediate_size=hidden_size * 2,
+        max_position_embeddings=max_position_embeddings,
+        num_labels=len(LABELS),
+        id2label=dict(enumerate(LABELS)),
+        label2id={label: i for i, label in enumerate(LABELS)},
+        problem_type='multi_label_classification',
+    )
+    BertForSequenceClassification(config).eval().save_pretrained(path)
+    return path
@@ -1,7 +1,12 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import PostViewSet
+from .views import PostViewSet, ReadinessView
 
 router = DefaultRouter()
 router.register('posts', PostViewSet)
 
-urlpatterns = router.urls
+urlpatterns = [
+    path('health/ready/', ReadinessView.as_view(), name='readiness'),
+]
+
+urlpatterns += router.urls
@@ -1,36 +1,197 @@
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, OuterRef, Prefetch, Subquery
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.decorators import action
+from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
 
+from applications.comments.models import Comment
+from applications.common.conditional import ConditionalGetMixin, lookup_value, make_etag
+from applications.common.fast_serialization import FastListMixin
 from applications.posts.models import Post
-from .filter import PostFilter
+from applications.tags.models import Tag
+from .filter import PostFilter, PostOrderingFilter, PostSearchFilter
+from .moderation import enqueue_post
+from .pagination import PostCommentCursorPagination, PostCursorPagination
+from .response_cache import LIST_VERSION_KEY, CachedReadMixin, post_version_key
 from .permissions import IsOwnerOrReadOnly
-from .serializer import PostSerializer, PostSerializerList
-from .toxicity_model import toxicity_model
+from .serializer import CommentSerializerForPost, PostSerializer, PostSerializerList, PostSuggestionSerializer
+from .suggest import suggest
+from .scoring import (ToxicityOverloaded, is_scoring_ready, overload_counter, toxicity_aspects_within_budget,
+                      toxicity_error_response)
+from .toxicity_model import aggregate_toxicity, aspects_as_dict
 
 
-class PostViewSet(ModelViewSet):
+class PostViewSet(ConditionalGetMixin, CachedReadMixin, FastListMixin, ModelViewSet):
     queryset = Post.objects.all()
     permission_classes = [IsOwnerOrReadOnly]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, PostSearchFilter, PostOrderingFilter]
     filterset_class = PostFilter
+    pagination_class = PostCursorPagination
+    # Searched through the full-text Post.search_vector built from these fields.
     search_fields = ["header", "body"]
-    ordering_fields = ["id", "date_posted"]
+    ordering_fields = ["id", "date_posted", "toxicity", "comment_count"]
     ordering = ["-date_posted"]
+    defer_moderation = False
+    toxicity_aspects = None
+
+    def get_queryset(self):
+        queryset = super().get_queryset().visible_to(self.request.user)
+        if self.action == "comments":
+            # Only the post's visibility is checked there.
+            return queryset.only("id")
+        queryset = queryset.defer("search_vector")
+        if self.action not in ("list", "retrieve"):
+            return queryset.select_related("author__user", "category").prefetch_related("tags")
+
+        # Join, prefetch and load only what ?fields= and ?expand= ask for.
+        fieldset = self.get_serializer_class().fieldset(self.request)
+        if fieldset.expands("author"):
+            queryset = queryset.select_related("author__user")
+        if fieldset.expands("category") or fieldset.expands("category_details"):
+            queryset = queryset.select_related("category")
+        # Tags in id order, as the fast list path reads them.
+        if fieldset.expands("tags"):
+            queryset = queryset.prefetch_related(Prefetch("tags", queryset=Tag.objects.order_by("id")))
+        elif fieldset.includes("tags"):
+            queryset = queryset.prefetch_related(Prefetch("tags", queryset=Tag.objects.only("id").order_by("id")))
+        columns = fieldset.columns(Post, aliases={"category_details": "category"}, always=self.ordering_columns())
+        if columns is not None:
+            queryset = queryset.only(*columns)
+        elif fieldset.omit:
+            queryset = queryset.defer(*fieldset.omit)
+        return queryset
+
+    def ordering_columns(self):
+        # The cursor reads the ordering field of the page's boundary rows.
+        ordering = PostOrderingFilter().get_ordering(self.request, self.queryset, self)
+        return ["id", *[name.lstrip("-") for name in ordering]]
+
+    def fast_list_lookups(self):
+        return self.ordering_columns()
+
+    def post_validators(self, request, queryset):
+        # Covers everything embedded in the response: renames bump `updated`
+        # of authors, categories and tags, deletions drop the counts, and
+        # comment changes bump the post's own `updated` (see signals.py).
+        timestamps = {
+            "posts_updated": Max("updated"),
+            "authors_updated": Max("author__updated"),
+            "categories_updated": Max("category__updated"),
+            "tags_updated": Max("tags__updated"),
+        }
+        counts = {"posts_count": Count("pk", distinct=True), "tags_count": Count("tags", distinct=True)}
+        state = queryset.order_by().aggregate(**timestamps, **counts)
+        last_modified = max((state[name] for name in timestamps if state[name] is not None), default=None)
+        return make_etag(request, sorted(state.items())), last_modified
+
+    def page_validators(self, request, queryset):
+        # The state post_validators() aggregates, read per row by the page
+        # query itself, so validating a list costs one page and not a scan
+        # of every matching post. Deletions and reorderings change the ids
+        # and positions on the page, and the links cover the next page.
+        tags = Post.tags.through.objects.filter(post_id=OuterRef("pk")).order_by().values("post_id")
+        rows = queryset.prefetch_related(None).annotate(
+            tags_updated=Subquery(tags.annotate(latest=Max("tag__updated")).values("latest")),
+            tags_count=Subquery(tags.annotate(count=Count("tag_id")).values("count")),
+        ).values("updated", "author__updated", "category__updated", "tags_updated", "tags_count",
+                 *self.ordering_columns())
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(rows, request, view=self)
+        if page is None:
+            page = list(rows)
+            links = ()
+        else:
+            links = (paginator.get_next_link(), paginator.get_previous_link())
+        timestamps = ("updated", "author__updated", "category__updated", "tags_updated")
+        last_modified = max((row[name] for row in page for name in timestamps if row[name] is not None),
+                            default=None)
+        return make_etag(request, [sorted(row.items()) for row in page], links), last_modified
+
+    def list_validators(self, request, *args, **kwargs):
+        return self.cached_validators(
+            request, "list", LIST_VERSION_KEY,
+            lambda: self.page_validators(request, self.filter_queryset(self.get_queryset())),
+        )
+
+    def retrieve_validators(self, request, *args, **kwargs):
+        pk = lookup_value(self, kwargs)
+        return self.cached_validators(
+            request, "detail", post_version_key(pk),
+            lambda: self.post_validators(request, self.get_queryset().filter(pk=pk)),
+        )
 
     def get_serializer_class(self):
         if self.action == "list":
             return PostSerializerList
+        elif self.action == "suggest":
+            return PostSuggestionSerializer
+        elif self.action == "comments":
+            return CommentSerializerForPost
         else:
             return PostSerializer
 
+    @action(detail=False, methods=["get"], serializer_class=PostSuggestionSerializer, pagination_class=None,
+            filter_backends=[])
+    def suggest(self, request):
+        """Typeahead: published post headers best matching ?q=, at most ?limit= of them."""
+        try:
+            limit = int(request.query_params.get("limit", settings.POSTS_SUGGEST_LIMIT))
+        except ValueError:
+            limit = settings.POSTS_SUGGEST_LIMIT
+        suggestions = suggest(request.query_params.get("q", ""), max(limit, 1))
+        return Response(self.get_serializer(suggestions, many=True).data)
+
+    @action(detail=True, methods=["get"], serializer_class=CommentSerializerForPost,
+            pagination_class=PostCommentCursorPagination, filter_backends=[])
+    def comments(self, request, pk=None):
+        """Comments of a visible post, newest first, keyset paginated on (date, id)."""
+        comments = Comment.objects.filter(post=self.get_object())
+        page = self.paginate_queryset(comments)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
     def create(self, request, *args, **kwargs):
-        check = toxicity_model.text2toxicity(f"{request.data['header']}\n{request.data['body']}",
-                                             aggregate=True)
-        if check > settings.TOXICITY_THRESHOLD:
-            return Response({"error": "ToxicityError",
-                             "message": "Toxicity check failed"}, status=status.HTTP_400_BAD_REQUEST)
+        if settings.TOXICITY_ASYNC_MODERATION:
+            return super().create(request, *args, **kwargs)
+        try:
+            self.toxicity_aspects = toxicity_aspects_within_budget(f"{request.data['header']}\n{request.data['body']}")
+        except ToxicityOverloaded as exc:
+            return self.create_when_overloaded(request, exc, *args, **kwargs)
+        if aggregate_toxicity(self.toxicity_aspects) > settings.TOXICITY_THRESHOLD:
+            return toxicity_error_response()
         return super().create(request, *args, **kwargs)
+
+    def create_when_overloaded(self, request, exc, *args, **kwargs):
+        overload_counter(settings.TOXICITY_OVERLOAD_POLICY).inc()
+        if settings.TOXICITY_OVERLOAD_POLICY == "pending":
+            self.defer_moderation = True
+            return super().create(request, *args, **kwargs)
+        if settings.TOXICITY_OVERLOAD_POLICY == "fail_open":
+            return super().create(request, *args, **kwargs)
+        return toxicity_error_response(exc)
+
+    def perform_create(self, serializer):
+        if not (settings.TOXICITY_ASYNC_MODERATION or self.defer_moderation):
+            if self.toxicity_aspects is None:
+                serializer.save()
+            else:
+                serializer.save(toxicity=aggregate_toxicity(self.toxicity_aspects),
+                                toxicity_aspects=aspects_as_dict(self.toxicity_aspects))
+            return
+        with transaction.atomic():
+            enqueue_post(serializer.save(moderation_status=Post.ModerationStatus.PENDING))
+
+
+class ReadinessView(APIView):
+    """Reports 503 until the toxicity model (local or the shared service) can serve inference."""
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def get(self, request):
+        if not is_scoring_ready():
+            return Response({"status": "not ready"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response({"status": "ready"})
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tags', '0003_updated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
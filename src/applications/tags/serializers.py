@@ -7,4 +7,5 @@ class TagSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Tag
-        fields = ['id', 'name']
+        fields = ['id', 'name', 'post_count']
+        read_only_fields = ['post_count']
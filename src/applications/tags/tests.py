@@ -21,13 +21,13 @@ class TagAPITestCase(APITestCase):
         """Тест получения списка тегов"""
         response = self.client.get(self.list_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.json(), [{"id": self.tag.id, "name": self.tag.name}])
+        self.assertEqual(response.json(), [{"id": self.tag.id, "name": self.tag.name, "post_count": 0}])
 
     def test_retrieve_tag(self):
         """Тест получения одного тега"""
         response = self.client.get(self.detail_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.json(), {"id": self.tag.id, "name": self.tag.name})
+        self.assertEqual(response.json(), {"id": self.tag.id, "name": self.tag.name, "post_count": 0})
 
     def test_create_tag_unauthorized(self):
         """Тест создания тега без авторизации"""
@@ -85,3 +85,29 @@ class TagAPITestCase(APITestCase):
         # Попытка удаления
         delete_response = self.client.delete(self.detail_url)
         self.assertEqual(delete_response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_conditional_get(self):
+        """Тест, что запрос с совпадающим ETag или Last-Modified получает 304 без тела"""
+        for url in (self.list_url, self.detail_url):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            with self.assertNumQueries(1):
+                not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+            self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(not_modified.content, b"")
+            self.assertEqual(not_modified["ETag"], response["ETag"])
+            not_modified = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+            self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_conditional_get_after_change(self):
+        """Тест, что изменение и создание тегов меняют ETag"""
+        etags = {url: self.client.get(url)["ETag"] for url in (self.list_url, self.detail_url)}
+        self.tag.name = "Renamed"
+        self.tag.save()
+        for url, etag in etags.items():
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIn("Renamed", response.content.decode())
+        etag = self.client.get(self.list_url)["ETag"]
+        Tag.objects.create(name="Another")
+        self.assertEqual(self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
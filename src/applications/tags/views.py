@@ -1,12 +1,18 @@
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.filters import OrderingFilter
 from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework.viewsets import ModelViewSet
+
+from applications.common.conditional import ConditionalGetMixin
 from .models import Tag
 from .serializers import TagSerializer
 
 
-class TagViewSet(ModelViewSet):
+class TagViewSet(ConditionalGetMixin, ModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    ordering_fields = ['id', 'name', 'post_count']
 
     def get_permissions(self):
         if self.action in ('list', 'retrieve'):
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 import os
+from importlib.util import find_spec
 from pathlib import Path
 from datetime import timedelta
 from dotenv import load_dotenv
@@ -42,6 +43,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework_simplejwt',
     'applications.jwt_auth.apps.JwtAuthConfig',
@@ -56,6 +58,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'applications.common.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -138,6 +141,22 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+CACHES = {
+    # Use a shared backend (e.g. django.core.cache.backends.redis.RedisCache)
+    # so that every worker sees the same post responses and invalidations.
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    },
+    # Typeahead results for hot prefixes, see applications.posts.suggest.
+    'suggest': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'post-suggest',
+        'TIMEOUT': int(os.environ.get('POSTS_SUGGEST_CACHE_TIMEOUT', 30)),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -153,9 +172,61 @@ REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_FILTER_BACKENDS': (
         'django_filters.rest_framework.DjangoFilterBackend',
-    )
+    ),
+    # See applications.common.renderers; MessagePack is negotiated only when msgpack is installed.
+    'DEFAULT_RENDERER_CLASSES': [
+        'applications.common.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        *(['applications.common.renderers.MessagePackRenderer'] if find_spec('msgpack') else []),
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'applications.common.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+# JSON is rendered and parsed with orjson when it is installed and API_ORJSON is on.
+API_ORJSON = os.environ.get('API_ORJSON', 'true').lower() == 'true'
+
+# Responses of at least RESPONSE_COMPRESSION_MIN_SIZE bytes are sent with
+# brotli (when installed) or gzip, per Accept-Encoding.
+RESPONSE_COMPRESSION_ENABLED = os.environ.get('RESPONSE_COMPRESSION_ENABLED', 'true').lower() == 'true'
+RESPONSE_COMPRESSION_MIN_SIZE = int(os.environ.get('RESPONSE_COMPRESSION_MIN_SIZE', 1024))
+RESPONSE_COMPRESSION_BROTLI_QUALITY = int(os.environ.get('RESPONSE_COMPRESSION_BROTLI_QUALITY', 5))
+
+# /api/metrics/ is served to admin users and to requests sending
+# METRICS_TOKEN in the X-Metrics-Token header (an empty token disables it).
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Page size of the cursor-paginated post list; clients may ask for up to
+# POSTS_MAX_PAGE_SIZE with ?page_size=.
+POSTS_PAGE_SIZE = int(os.environ.get('POSTS_PAGE_SIZE', 20))
+POSTS_MAX_PAGE_SIZE = int(os.environ.get('POSTS_MAX_PAGE_SIZE', 100))
+
+# The post detail embeds its POSTS_DETAIL_COMMENTS latest comments; the rest
+# are read from /api/posts/{id}/comments/, POSTS_COMMENTS_PAGE_SIZE per page.
+POSTS_DETAIL_COMMENTS = int(os.environ.get('POSTS_DETAIL_COMMENTS', 10))
+POSTS_COMMENTS_PAGE_SIZE = int(os.environ.get('POSTS_COMMENTS_PAGE_SIZE', 20))
+
+# List endpoints of posts, authors and comments serialize straight from
+# .values() rows, see applications.common.fast_serialization.
+FAST_LIST_SERIALIZATION = os.environ.get('FAST_LIST_SERIALIZATION', 'true').lower() == 'true'
+
+# Response cache of post list and detail reads, see applications.posts.response_cache.
+# Concurrent misses of a key wait up to POSTS_CACHE_LOCK_TIMEOUT_MS for the
+# worker recomputing it, polling every POSTS_CACHE_POLL_INTERVAL_MS.
+POSTS_CACHE_ENABLED = os.environ.get('POSTS_CACHE_ENABLED', 'true').lower() == 'true'
+POSTS_CACHE_ALIAS = os.environ.get('POSTS_CACHE_ALIAS', 'default')
+POSTS_CACHE_TIMEOUT = int(os.environ.get('POSTS_CACHE_TIMEOUT', 300))
+POSTS_CACHE_LOCK_TIMEOUT_MS = float(os.environ.get('POSTS_CACHE_LOCK_TIMEOUT_MS', 2000))
+POSTS_CACHE_POLL_INTERVAL_MS = float(os.environ.get('POSTS_CACHE_POLL_INTERVAL_MS', 20))
+
+# /api/posts/suggest/: queries shorter than POSTS_SUGGEST_MIN_LENGTH return
+# nothing, at most POSTS_SUGGEST_LIMIT headers are returned.
+POSTS_SUGGEST_MIN_LENGTH = int(os.environ.get('POSTS_SUGGEST_MIN_LENGTH', 2))
+POSTS_SUGGEST_LIMIT = int(os.environ.get('POSTS_SUGGEST_LIMIT', 10))
+
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=30),
@@ -205,3 +276,66 @@ SPECTACULAR_SETTINGS = {
 }
 
 TOXICITY_THRESHOLD = float(os.environ['TOXICITY_THRESHOLD'])
+
+# Load and warm up the toxicity model when a WSGI/ASGI server starts,
+# management commands such as migrate or shell never touch it. When disabled,
+# /api/health/ready/ reports ready at once and the first request loads the model.
+TOXICITY_WARMUP_ON_STARTUP = os.environ.get('TOXICITY_WARMUP_ON_STARTUP', 'true').lower() == 'true'
+
+# Micro-batching of concurrent toxicity checks: a batch is flushed after the window
+# or at the max size, and the window shrinks to keep queueing plus p99 inference
+# time under the latency cap.
+TOXICITY_BATCHING_ENABLED = os.environ.get('TOXICITY_BATCHING_ENABLED', 'true').lower() == 'true'
+TOXICITY_BATCH_MAX_SIZE = int(os.environ.get('TOXICITY_BATCH_MAX_SIZE', 32))
+TOXICITY_BATCH_WINDOW_MS = float(os.environ.get('TOXICITY_BATCH_WINDOW_MS', 5))
+TOXICITY_BATCH_LATENCY_CAP_MS = float(os.environ.get('TOXICITY_BATCH_LATENCY_CAP_MS', 200))
+
+# Optional shared inference process (manage.py run_toxicity_service). When the socket
+# is set web workers do not load the model and fall back to it only if the service
+# is unreachable and TOXICITY_SERVICE_FALLBACK is enabled.
+TOXICITY_SERVICE_SOCKET = os.environ.get('TOXICITY_SERVICE_SOCKET', '')
+TOXICITY_SERVICE_TIMEOUT_MS = float(os.environ.get('TOXICITY_SERVICE_TIMEOUT_MS', 2000))
+TOXICITY_SERVICE_FALLBACK = os.environ.get('TOXICITY_SERVICE_FALLBACK', 'true').lower() == 'true'
+
+# Toxicity score cache keyed by the normalized text hash and the model checkpoint.
+# The persistent tier stores scores in the posts_toxicityscore table.
+TOXICITY_CACHE_ENABLED = os.environ.get('TOXICITY_CACHE_ENABLED', 'true').lower() == 'true'
+TOXICITY_CACHE_SIZE = int(os.environ.get('TOXICITY_CACHE_SIZE', 10000))
+TOXICITY_CACHE_PERSISTENT = os.environ.get('TOXICITY_CACHE_PERSISTENT', 'false').lower() == 'true'
+
+# Long texts are scored as overlapping windows of the model's maximum length
+# (overlap in tokens), at most TOXICITY_MAX_CHUNKS windows per text, combined
+# with 'max' (most toxic window) or 'mean'. A forward pass scores at most
+# TOXICITY_MAX_WINDOWS_PER_PASS windows, however many texts a batch holds.
+TOXICITY_CHUNK_OVERLAP = int(os.environ.get('TOXICITY_CHUNK_OVERLAP', 64))
+TOXICITY_MAX_CHUNKS = int(os.environ.get('TOXICITY_MAX_CHUNKS', 32))
+TOXICITY_CHUNK_AGGREGATION = os.environ.get('TOXICITY_CHUNK_AGGREGATION', 'max')
+TOXICITY_MAX_WINDOWS_PER_PASS = int(os.environ.get('TOXICITY_MAX_WINDOWS_PER_PASS', 64))
+
+# Store new posts as pending and score them from the moderation queue
+# (manage.py process_moderation_queue) instead of during the request.
+TOXICITY_ASYNC_MODERATION = os.environ.get('TOXICITY_ASYNC_MODERATION', 'false').lower() == 'true'
+
+# Inference backend: 'torch' (fp32), 'int8' (dynamic quantization) or 'torchscript'.
+# TOXICITY_MODEL_ARTIFACT points to a directory written by manage.py export_toxicity_model
+# and is loaded without network access. Backends other than fp32 must stay within
+# TOXICITY_BACKEND_TOLERANCE of fp32 scores on a fixture corpus.
+TOXICITY_BACKEND = os.environ.get('TOXICITY_BACKEND', 'torch')
+TOXICITY_MODEL_ARTIFACT = os.environ.get('TOXICITY_MODEL_ARTIFACT', '')
+TOXICITY_BACKEND_TOLERANCE = float(os.environ.get('TOXICITY_BACKEND_TOLERANCE', 0.05))
+
+# Load shedding for the synchronous toxicity check: at most TOXICITY_MAX_CONCURRENT
+# checks per process (0 disables the limit), each waiting up to TOXICITY_QUEUE_TIMEOUT_MS
+# for a slot and TOXICITY_DEADLINE_MS for its score. A shed check is handled by
+# TOXICITY_OVERLOAD_POLICY: 'reject' (503 with Retry-After), 'pending' (store the
+# post for the moderation queue) or 'fail_open' (publish unchecked).
+TOXICITY_MAX_CONCURRENT = int(os.environ.get('TOXICITY_MAX_CONCURRENT', 16))
+TOXICITY_QUEUE_TIMEOUT_MS = float(os.environ.get('TOXICITY_QUEUE_TIMEOUT_MS', 50))
+TOXICITY_DEADLINE_MS = float(os.environ.get('TOXICITY_DEADLINE_MS', 1000))
+TOXICITY_OVERLOAD_POLICY = os.environ.get('TOXICITY_OVERLOAD_POLICY', 'reject')
+TOXICITY_RETRY_AFTER = int(os.environ.get('TOXICITY_RETRY_AFTER', 5))
+
+# Screen new comments against TOXICITY_THRESHOLD. Comments share the scorer,
+# batcher and concurrency limit with posts; the 'pending' overload policy
+# rejects comments, as only posts have a moderation queue.
+TOXICITY_CHECK_COMMENTS = os.environ.get('TOXICITY_CHECK_COMMENTS', 'true').lower() == 'true'
@@ -34,5 +34,6 @@ urlpatterns = [
     path('api/', include('applications.tags.urls')),
     path('api/', include('applications.posts.urls')),
     path('api/', include('applications.comments.urls')),
+    path('api/', include('applications.common.urls')),
     path('', include('applications.jwt_auth.urls')),
 ]
@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'system.settings')
 
 application = get_wsgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.TOXICITY_WARMUP_ON_STARTUP and not settings.TOXICITY_SERVICE_SOCKET:
+    from applications.posts.toxicity_model import warm_up_in_background
+
+    warm_up_in_background()